@@ -1,17 +1,33 @@
 #!/usr/bin/env python3.6
-import os
 import time
-import Logger
+import uuid
+import asyncio
+import logging
 import configparser
-import RPi.GPIO as GPIO
+from collections import deque
+from enum import Enum
+from typing import Awaitable, Callable, Dict, Optional
 
-from . import SpeechRecognition, SevenSegmentDisplay, Sound
+from . import Board, ButtonInput, EventStore, LedAnimator, Logger, SpeechRecognition, SevenSegmentDisplay, Sound, Tracing
+
+
+class GameState(Enum):
+    """The states of the game state machine."""
+
+    STANDBY = "standby"
+    SELECTING = "selecting"
+    RECORDING = "recording"
+    RECOGNIZING = "recognizing"
+    FEEDBACK = "feedback"
+    GAME_OVER = "game_over"
 
 
 class AlephGame:
     """AlephGame is the actual manager for this game. It initialize the GPIOs and taking care for the game logic - standby mode / game mode - selecting letter / updating lives according to answers.
 
     Attributes:
+        board (Board): The board backend for controlling GPIOs.
+        led_animator (LedAnimator): Plays the LEDs animations - standby demo and letter selection.
         sound (Sound): Sound instanse to play sounds as feedback to user.
         speech_recognition (SpeechRecognition): SpeechRecognition instance to call Google's speech recognition API
         letters_gpio_dict (dict): Dictionary of GPIO pin and it's alphabetical letter.
@@ -22,12 +38,24 @@ class AlephGame:
         lives (int): The current game lives count. When 0 the game is over.
         demo_sleep_timeout (int): Timeout to be used when tuggeling LEDs in demo mode.
         blink_sleep_timeout (int): Timeout for running letters GPIO LEDs after the user pressed start in the first time, and the user needs to press start again for selecting specific letter.
-
+        button_input (ButtonInput): Queues the start button presses with the time they happened, debounced by button_debounce_ms.
+        state (GameState): The current state of the game.
+        reaction_latencies_ms (deque): The latest button reaction latencies - milliseconds from the button edge until the running animation was stopped.
+        score (int): Correct answers in the current game, shown on the 7-segment display for score_display_timeout seconds after every correct answer.
+        station (str): The station name in multi-station mode, recorded with the turns. Empty for a single game.
+        session (str): Id of the current game session (run_game call), recorded with the turns.
+        tracer (Tracer): Traces the turns of this game, the station tracer in multi-station mode.
+
+    The game runs as an asyncio state machine: standby -> selecting -> recording -> recognizing -> feedback -> (game over ->) standby.
+    Button presses are queued with their timestamps by the button input and consumed by the event loop, animations are played by the LED animator and switched
+    as soon as the button is pressed - the selected letter is the one lit at the press time. Blocking audio / recognition calls run in executor threads so LEDs keep running meanwhile.
     """
 
     @Logger.log_function
     def __init__(
         self,
+        board: Board.Board,
+        led_animator: LedAnimator.LedAnimator,
         sound: Sound,
         speech_recognition: SpeechRecognition,
         letters_gpio_dict: dict,
@@ -37,13 +65,19 @@ class AlephGame:
         seven_segment: SevenSegmentDisplay,
         demo_sleep_timeout: int,
         blink_sleep_timeout: float,
+        button_debounce_ms: float = 200,
+        button_queue_size: int = 16,
     ) -> None:
         """Constructs AlephGame instance, validating all GPIOs are correctly set.
 
         Args:
             See Attributes section in class docstring
+            button_debounce_ms (float, optional): Start button edges closer than this amount of milliseconds are bounces. Defaults to 200.
+            button_queue_size (int, optional): Start button presses kept until the game consumes them. Defaults to 16.
         """
 
+        self.board = board
+        self.led_animator = led_animator
         self.sound = sound
         self.speech_recognition = speech_recognition
         self.letters_gpio_dict = letters_gpio_dict
@@ -55,47 +89,88 @@ class AlephGame:
         self.demo_sleep_timeout = demo_sleep_timeout
         self.blink_sleep_timeout = blink_sleep_timeout
 
-        self._standby = True
-        self._letter_selected = False
-        self._current_letter_gpio = -1
+        self.state = GameState.STANDBY
+        self.reaction_latencies_ms = deque(maxlen=100)
+        self.score = 0
+        self.score_display_timeout = 1.5
+        self.station = ""
+        self.session = ""
+        self.tracer = Tracing.tracer
+        self.button_input = ButtonInput.ButtonInput(
+            board, start_button_gpio, button_debounce_ms, button_queue_size
+        )
+
+        self._current_letter_gpio = next(iter(self.letters_gpio_dict))
+        self._audio_file = None
+        self._recognition_result = (False, True)
+        # time.monotonic() of the button press selecting the letter, and the milliseconds of every stage of the turn
+        self._turn_start = None
+        self._turn_stages = {}
+        self._loop = None
+        self._state_handlers: Dict[GameState, Callable[[], Awaitable[GameState]]] = {
+            GameState.STANDBY: self.run_standby,
+            GameState.SELECTING: self.run_select_letter,
+            GameState.RECORDING: self.run_recording,
+            GameState.RECOGNIZING: self.run_recognizing,
+            GameState.FEEDBACK: self.run_feedback,
+            GameState.GAME_OVER: self.run_game_over,
+        }
 
         # Init hardware
         if seven_segment:
             self.seven_segment.write_lives(lives)
         self.init_gpios()
 
+        # Compile the LEDs animations once
+        letters_pins = list(self.letters_gpio_dict.keys())
+        self._standby_animation = LedAnimator.standby_demo(
+            letters_pins, self.start_button_led_gpio_pin, self.demo_sleep_timeout
+        )
+        self._letter_chase_animation = LedAnimator.letter_chase(
+            letters_pins, self.blink_sleep_timeout
+        )
+
     @Logger.log_function
     def init_gpios(self) -> None:
         """Initialize all GPIOs in their approperiate state."""
-        # Use RPI standard GPIO legend
-        GPIO.setmode(GPIO.BOARD)
         # Set letters GPIOs to output
-        for key in self.letters_gpio_dict.keys():
-            GPIO.setup(key, GPIO.OUT)
+        self.board.setup_output(list(self.letters_gpio_dict.keys()))
 
         # Set the start button (firewalled by pull-down resistor)
-        GPIO.setup(self.start_button_gpio, GPIO.IN)
-        GPIO.setup(self.start_button_led_gpio_pin, GPIO.OUT)
+        self.board.setup_input(self.start_button_gpio)
+        self.board.setup_output([self.start_button_led_gpio_pin])
 
-    @Logger.log_function
-    def start_game_callback(self, channel: int) -> None:
-        """A callback function to be run when the user presses the start button #1st time. Signals the main loop to exit standby mode.
+    async def wait_for_button(self, since: float) -> float:
+        """Wait for the user to press the start button.
 
         Args:
-            channel (int): N/A. required by GPIO API.
+            since (float): time.monotonic() timestamp the phase started accepting presses, earlier presses are ignored.
+
+        Returns:
+            float: time.monotonic() timestamp of the button edge.
         """
-        GPIO.remove_event_detect(self.start_button_gpio)
-        self._standby = False
+        press = await self.button_input.next_press(since)
+        return press.timestamp
 
-    @Logger.log_function
-    def letter_selected_callback(self, channel: int) -> None:
-        """A callback function to be run when the user presses the start button #2nd time (selected letter).
+    def stop_animation(self, press_time: float) -> Optional[int]:
+        """Stop the running animation and record how long it took to react to the button press.
 
         Args:
-            channel (int): N/A. required by GPIO API.
+            press_time (float): time.monotonic() timestamp of the button edge.
+
+        Returns:
+            Optional[int]: The tag of the animation frame shown at the press time, or when it was stopped if the press is older than the animator history.
         """
-        GPIO.remove_event_detect(self.start_button_gpio)
-        self._letter_selected = True
+        stopped_tag = self.led_animator.stop()
+        latency_ms = (time.monotonic() - press_time) * 1000
+        self.reaction_latencies_ms.append(latency_ms)
+        tag = self.led_animator.tag_at(press_time)
+        if tag is None:
+            tag = stopped_tag
+        elif tag != stopped_tag:
+            logging.info(f"The animation moved on from frame {tag} to {stopped_tag} since the button press")
+        logging.info(f"Button reaction latency in {self.state.value}: {latency_ms:.2f} ms")
+        return tag
 
     @Logger.log_function
     def turn_all_letters_gpios(self, on: bool) -> None:
@@ -104,131 +179,205 @@ class AlephGame:
         Args:
             on (bool): The state to be set to all letters GPIOs
         """
-        GPIO.output(list(self.letters_gpio_dict.keys()), GPIO.HIGH if on else GPIO.LOW)
-
-    @Logger.log_function
-    def run_standby_demo(self) -> None:
-        """Run standby mode, tuggle LED's slowly, signaling the user we're waiting for his START signal"""
-        # Run this demo in standby mode, until the start button is pressed
-        GPIO.add_event_detect(
-            self.start_button_gpio,
-            GPIO.FALLING,
-            self.start_game_callback,
-            bouncetime=200,
-        )
-
-        while self._standby:
-            GPIO.output(self.start_button_led_gpio_pin, GPIO.LOW)
-
-            # Demo #1 - Blink all leds 3 times
-            for i in range(0, 3):
-                # User pressed start during the previous iteration.
-                if not self._standby:
-                    break
-                self.turn_all_letters_gpios(GPIO.HIGH)
-                time.sleep(self.demo_sleep_timeout * 2)
-                self.turn_all_letters_gpios(GPIO.LOW)
-
-            # Demo #2 - Turn leds on one by one
-            for key in self.letters_gpio_dict.keys():
-                if not self._standby:
-                    # Clear all GPIOs signals from demo mode, reset all letters to off - game is starting.
-                    self.turn_all_letters_gpios(GPIO.LOW)
-                    break
-                else:
-                    GPIO.output(key, GPIO.HIGH)
-                    time.sleep(self.demo_sleep_timeout)
-
-            # Demo #3 - Turn leds off one by one
-            for key in self.letters_gpio_dict.keys():
-                if not self._standby:
-                    # Clear all GPIOs signals from demo mode, reset all letters to off - game is starting.
-                    self.turn_all_letters_gpios(GPIO.LOW)
-                    break
-                else:
-                    GPIO.output(key, GPIO.LOW)
-                    time.sleep(self.demo_sleep_timeout)
-
-    @Logger.log_function
-    def run_select_letter(self) -> None:
+        self.board.output(list(self.letters_gpio_dict.keys()), on)
+
+    async def run_standby(self) -> GameState:
+        """Run standby mode until START is pressed."""
+        since = time.monotonic()
+        self.led_animator.play(self._standby_animation)
+        press_time = await self.wait_for_button(since)
+        self.stop_animation(press_time)
+        # Clear all GPIOs signals from demo mode, reset all letters to off - game is starting.
+        self.turn_all_letters_gpios(self.board.LOW)
+        return GameState.SELECTING
+
+    async def run_select_letter(self) -> GameState:
         """User pressed START, start tuggling LEDs and wait for his letter selection."""
-        self._letter_selected = False
-        GPIO.output(self.start_button_led_gpio_pin, GPIO.HIGH)
-
-        # Wait for the user to press the button again to select letter, the bounce time insures it will give a valid value
-        GPIO.add_event_detect(
-            self.start_button_gpio,
-            GPIO.FALLING,
-            self.letter_selected_callback,
-            bouncetime=200,
+        self.board.output(self.start_button_led_gpio_pin, self.board.HIGH)
+        # Don't wait for the sound, the LEDs start running while it plays
+        self.sound.play_game_sound(Sound.GameSound.START_GAME, wait=False)
+        # Connect to the recognition service while the user selects a letter
+        self.speech_recognition.warm_up()
+
+        since = time.monotonic()
+        self.led_animator.play(self._letter_chase_animation)
+        press_time = await self.wait_for_button(since)
+        selected_letter_gpio = self.stop_animation(press_time)
+        if selected_letter_gpio is not None:
+            self._current_letter_gpio = selected_letter_gpio
+        # The turn starts at the button press selecting the letter
+        self.tracer.start_turn(
+            press_time, letter=self.letters_gpio_dict[self._current_letter_gpio]
         )
-        self.sound.play_game_sound(Sound.GameSound.START_GAME)
-
-        # Run the LEDs on until user pressed the start button
-        while not self._letter_selected:
-            for key in self.letters_gpio_dict.keys():
-                if self._letter_selected:
-                    break
-                self._current_letter_gpio = key
-                GPIO.output(key, GPIO.HIGH)
-                time.sleep(self.blink_sleep_timeout)
-                GPIO.output(key, GPIO.LOW)
-                time.sleep(self.blink_sleep_timeout)
+        self._turn_start = press_time
+        self._turn_stages = {"reaction": round(self.reaction_latencies_ms[-1], 3)}
+
+        self.board.output(self.start_button_led_gpio_pin, self.board.LOW)
+        # Make sure only the chosen letter is on
+        self.turn_all_letters_gpios(self.board.LOW)
+        self.board.output(self._current_letter_gpio, self.board.HIGH)
+        return GameState.RECORDING
+
+    async def run_recording(self) -> GameState:
+        """Record the user saying the selected letter, counting down the time left on the display."""
+        stage_start = time.monotonic()
+        try:
+            self._audio_file = await self._loop.run_in_executor(
+                None,
+                self.speech_recognition.record,
+                [self.start_button_led_gpio_pin, self._current_letter_gpio],
+                self.seven_segment.start_countdown if self.seven_segment else None,
+            )
+        except Exception as ex:
+            # A failed record (mic error, no internet) ends the turn as an internal error, the game goes on
+            logging.exception(f"Record failed - {ex}")
+            # The recorder already told the user there's no internet
+            if self.speech_recognition.connectivity_monitor.connected:
+                self.sound.play_game_sound(Sound.GameSound.GOOGLE_API_REQUEST_ERROR)
+            self._audio_file = None
+            self._end_turn("error")
+            self.turn_all_letters_gpios(False)
+            return GameState.SELECTING
+        finally:
+            if self.seven_segment:
+                self.seven_segment.stop_countdown()
+        self._turn_stages["record"] = round((time.monotonic() - stage_start) * 1000, 3)
+        if self._audio_file is None:
+            # The user got sound feedback from the recorder, continue the game without updating the lives.
+            self._end_turn("no_speech")
+            self.turn_all_letters_gpios(False)
+            return GameState.SELECTING
+        return GameState.RECOGNIZING
+
+    async def run_recognizing(self) -> GameState:
+        """Recognize the recorded audio, while keeping the selected letter lit."""
+        self.board.output(self._current_letter_gpio, self.board.HIGH)
+        stage_start = time.monotonic()
+        try:
+            self._recognition_result = await self._loop.run_in_executor(
+                None,
+                self.speech_recognition.recognize,
+                self._audio_file,
+                # Send the alphabetical verb of the letter
+                self.letters_gpio_dict[self._current_letter_gpio],
+            )
+        except Exception as ex:
+            # Backend failures are handled by recognize, this is a failure of the result handling - an internal error as well
+            logging.exception(f"Recognition failed - {ex}")
+            self._recognition_result = (False, True)
+        finally:
+            self._audio_file = None
+        self._turn_stages["recognize"] = round((time.monotonic() - stage_start) * 1000, 3)
+        return GameState.FEEDBACK
+
+    async def run_feedback(self) -> GameState:
+        """Give the user feedback on his answer and update the lives."""
+        correct_ans, exception_occurred = self._recognition_result
+        stage_start = time.monotonic()
+        if exception_occurred:
+            self._end_turn("error")
+            self.turn_all_letters_gpios(False)
+            # Continue the game without updating the lives, internal fault occurred, not related to user input.
+            # The user got sound feedback from internal exceptions so nothing required here.
+            return GameState.SELECTING
+
+        # Answer was correct
+        if correct_ans:
+            with self.tracer.span("feedback"):
+                await asyncio.wrap_future(
+                    self.sound.play_game_sound(Sound.GameSound.CORRECT_ANSWER, wait=False)
+                )
+            self.score += 1
+            self._turn_stages["feedback"] = round((time.monotonic() - stage_start) * 1000, 3)
+            self._end_turn("hit")
+            if self.seven_segment:
+                self.seven_segment.write_score(self.score, self.score_display_timeout)
+            # Clean lettes LEDs, prepare to next iteration.
+            self.turn_all_letters_gpios(False)
+            return GameState.SELECTING
+
+        self.board.output(self._current_letter_gpio, self.board.HIGH)
+        # Play the correct answer right after the incorrect answer sound - help the user to learn the correct answer.
+        with self.tracer.span("feedback"):
+            await asyncio.wrap_future(
+                self.sound.play_async(
+                    [
+                        self.sound.audio_files[Sound.GameSound.INCORRECT_ANSWER.value],
+                        self.sound.correct_answer_file(
+                            self.letters_gpio_dict[self._current_letter_gpio]
+                        ),
+                    ]
+                )
+            )
+        # Clean lettes LEDs, prepare to next iteration.
+        self.turn_all_letters_gpios(False)
+        self.lives -= 1
+        self._turn_stages["feedback"] = round((time.monotonic() - stage_start) * 1000, 3)
+        self._end_turn("miss")
+        if self.seven_segment:
+            self.seven_segment.write_lives(self.lives)
+        if 0 == self.lives:
+            return GameState.GAME_OVER
+        return GameState.SELECTING
+
+    def _end_turn(self, result: str) -> None:
+        """End the traced turn, and record it in the event store.
 
-        GPIO.output(self.start_button_led_gpio_pin, GPIO.LOW)
+        Args:
+            result (str): hit / miss / error / no_speech.
+        """
+        self.tracer.end_turn(result=result)
+        recognition = self.speech_recognition.last_recognition if result in ("hit", "miss", "error") else {}
+        now = time.monotonic()
+        EventStore.store.record(
+            time=time.time() - (now - self._turn_start),
+            session=self.session,
+            station=self.station,
+            letter=self.letters_gpio_dict[self._current_letter_gpio],
+            result=result,
+            transcript=recognition.get("transcript"),
+            recognized_letter=recognition.get("recognized_letter"),
+            backend=recognition.get("backend"),
+            confidence=recognition.get("confidence"),
+            lives=self.lives,
+            score=self.score,
+            duration_ms=round((now - self._turn_start) * 1000, 3),
+            stages=self._turn_stages,
+            recording=recognition.get("recording"),
+        )
 
-    @Logger.log_function
-    def game_over(self) -> None:
+    async def run_game_over(self) -> GameState:
         """Indicate to user that game is over (lives reached to 0)"""
-        self.sound.play_game_sound(Sound.GameSound.GAME_OVER)
+        await asyncio.wrap_future(
+            self.sound.play_game_sound(Sound.GameSound.GAME_OVER, wait=False)
+        )
+        logging.info(f"LED animator frames jitter: {self.led_animator.jitter_stats()}")
         # Reset all game fields
         self.lives = self.kLives
-        self._standby = True
-        self.seven_segment.write_lives(self.lives)
+        self.score = 0
+        if self.seven_segment:
+            self.seven_segment.write_lives(self.lives)
+        return GameState.STANDBY
+
+    async def run(self) -> None:
+        """Run the game state machine forever."""
+        self._loop = asyncio.get_event_loop()
+        # Edges are detected for the whole game, the presses wait in the queue until a phase consumes them
+        self.button_input.start()
+        while True:
+            next_state = await self._state_handlers[self.state]()
+            logging.info(f"Game state {self.state.value} -> {next_state.value}")
+            self.state = next_state
 
     @Logger.log_function
     def run_game(self) -> None:
         """Main entry point to run game, running standby mode until START is pressed, tuggling all GPIO letters waiting for 2nd START signal, and detecting if user recognized selected letter correctly."""
-        while True:
-            if self._standby:
-                # Blocking call until start button is pressed
-                self.run_standby_demo()
-
-            # Wait for the user to press start button again in order to select letter
-            self.run_select_letter()
-            # Make sure the chosen letter is on
-            GPIO.output(self._current_letter_gpio, GPIO.HIGH)
-            correct_ans, exception_occurred = self.speech_recognition.recognize_letter(
-                # Send the alphabetical verb of the letter
-                self.letters_gpio_dict[self._current_letter_gpio],
-                [self.start_button_led_gpio_pin, self._current_letter_gpio],
-            )
-            if exception_occurred:
-                self.turn_all_letters_gpios(False)
-                # Continue the game without updating the lives, internal fault occurred, not related to user input.
-                # The user got sound feedback from internal exceptions so nothing required here.
-                continue
-
-            # Answer was correct
-            if correct_ans:
-                self.sound.play_game_sound(Sound.GameSound.CORRECT_ANSWER)
-                # Clean lettes LEDs, prepare to next iteration.
-                self.turn_all_letters_gpios(False)
-
-            else:
-                GPIO.output(self._current_letter_gpio, GPIO.HIGH)
-                self.sound.play_game_sound(Sound.GameSound.INCORRECT_ANSWER)
-                # Play the correct answer - help the user to learn the correct answer.
-                self.sound.play_audio_file(
-                    os.path.join(
-                        self.sound.correct_answers_folders,
-                        f"{self.letters_gpio_dict[self._current_letter_gpio]}.mp3",
-                    )
-                )
-                # Clean lettes LEDs, prepare to next iteration.
-                self.turn_all_letters_gpios(False)
-                self.lives -= 1
-                if self.seven_segment:
-                    self.seven_segment.write_lives(self.lives)
-                if 0 == self.lives:
-                    self.game_over()
+        self.session = uuid.uuid4().hex[:12]
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        try:
+            with self.tracer.session_scope():
+                loop.run_until_complete(self.run())
+        finally:
+            self.button_input.close()
+            loop.close()
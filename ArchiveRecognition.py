@@ -0,0 +1,389 @@
+#!/usr/bin/env python3
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import threading
+import configparser
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import speech_recognition as sr
+
+from . import (
+    AudioBuffer,
+    AudioPreparation,
+    ConnectivityMonitor,
+    KeywordSpotter,
+    Logger,
+    RecognitionIndex,
+    RecognizerBackend,
+)
+
+# The backend of the worker process, created by the first task it runs
+_worker_backend = None
+
+
+class RateLimiter:
+    """Token bucket limiting the rate of the requests sent to a remote backend.
+
+    Attributes:
+        rate (float): Requests per second, 0 for no limit.
+        burst (int): Requests which can be sent at once after an idle period.
+    """
+
+    def __init__(self, rate: float, burst: int = 1) -> None:
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """Wait until a request can be sent."""
+        if not self.rate:
+            return
+        with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                time.sleep((1 - self._tokens) / self.rate)
+
+
+def create_backend(options: Dict[str, str]) -> RecognizerBackend.RecognizerBackend:
+    """Create a recognizer backend from the [Speech Recognition] options.
+
+    Args:
+        options (Dict[str, str]): recognizer_backend and the options of the backend, as in the config file.
+
+    Raises:
+        ValueError: In case of an unknown backend.
+
+    Returns:
+        RecognizerBackend: The backend.
+    """
+    backend = options.get("recognizer_backend", "google")
+    if backend == "google":
+        return RecognizerBackend.GoogleBackend(
+            ConnectivityMonitor.create_session(),
+            options.get("google_recognition_language", "he-IL"),
+            options.get("google_api_key", ""),
+            float(options.get("recognition_timeout", 10)),
+            AudioPreparation.AudioPreparation(
+                int(options.get("upload_sample_rate", 16000)), options.get("upload_codec", "flac")
+            ),
+        )
+    if backend == "keyword_spotting":
+        # Templates are the correct answers only - the archived records are the ones being recognized
+        return KeywordSpotter.KeywordSpottingBackend(
+            KeywordSpotter.template_files(options["correct_answers_folders"], []),
+            float(options.get("keyword_min_confidence", 0.3)),
+        )
+    raise ValueError(f"Unknown recognizer backend - {backend}")
+
+
+def recognize_file(filepath: str, options: Dict[str, str]) -> Dict[str, Any]:
+    """Recognize an archived record, runs in a worker process.
+
+    Args:
+        filepath (str): The record file.
+        options (Dict[str, str]): The backend options, see create_backend.
+
+    Returns:
+        Dict[str, Any]: file, letter (when the backend recognizes letters) and alternatives. error instead when the recognition failed,
+        retry is set when it may succeed later (the service couldn't be reached).
+    """
+    global _worker_backend
+    if _worker_backend is None:
+        _worker_backend = create_backend(options)
+
+    record = {"file": filepath}
+    try:
+        samples, sample_rate = KeywordSpotter.load_audio_file(filepath)
+        audio_data = AudioBuffer.AudioBuffer(np.clip(samples, -32768, 32767).astype(np.int16), sample_rate)
+        result = _worker_backend.recognize(audio_data)
+    except sr.RequestError as ex:
+        record.update(error=str(ex), retry=True)
+    except sr.UnknownValueError:
+        record.update(alternatives=[], letter=None)
+    except (ImportError, OSError, RuntimeError, ValueError, EOFError) as ex:
+        record.update(error=str(ex), retry=False)
+    else:
+        record.update(alternatives=result.alternatives, letter=result.letter)
+    return record
+
+
+class ArchiveRecognition:
+    """Re-recognizes the archived records (unrecognized / misdetection folders) in parallel, and suggests new recognition options.
+
+    Records are recognized by a process pool. Requests to a remote backend are rate limited. Every result is appended to a checkpoint file,
+    so an interrupted run continues where it stopped. The expected letter of every record is parsed from its filename (*_expected_<letter>).
+
+    Attributes:
+        folders (List[str]): The archive folders.
+        options (Dict[str, str]): The backend options, see create_backend.
+        index (RecognitionIndex): The current recognition options.
+        checkpoint_path (str): JSONL file of the recognized records.
+        workers (int): Worker processes.
+        rate (float): Requests per second to a remote backend, 0 for no limit.
+    """
+
+    @Logger.log_function
+    def __init__(
+        self,
+        folders: List[str],
+        options: Dict[str, str],
+        index: RecognitionIndex.RecognitionIndex,
+        checkpoint_path: str,
+        workers: int = 4,
+        rate: float = 10,
+    ) -> None:
+        """Constructs ArchiveRecognition.
+
+        Args:
+            See Attributes section in class docstring
+        """
+        self.folders = folders
+        self.options = options
+        self.index = index
+        self.checkpoint_path = checkpoint_path
+        self.workers = workers
+        self.rate = rate
+
+    def expected_letters(self) -> Dict[str, str]:
+        """Lists the archived records.
+
+        Returns:
+            Dict[str, str]: key = record file, value = the expected letter parsed from its name.
+        """
+        return {
+            filepath: letter
+            for letter, filepaths in KeywordSpotter.template_files(os.devnull, self.folders).items()
+            for filepath in filepaths
+        }
+
+    def load_checkpoint(self) -> Dict[str, Dict[str, Any]]:
+        """Load the records recognized by previous runs.
+
+        Returns:
+            Dict[str, Dict[str, Any]]: key = record file, value = its result.
+        """
+        done = {}
+        if os.path.isfile(self.checkpoint_path):
+            with open(self.checkpoint_path, encoding="utf-8") as checkpoint:
+                for line in checkpoint:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # A line cut by an interrupted run
+                        continue
+                    done[record["file"]] = record
+        return done
+
+    @Logger.log_function
+    def run(self, progress: bool = True) -> Dict[str, Dict[str, Any]]:
+        """Recognize all the records which weren't recognized yet.
+
+        Args:
+            progress (bool, optional): Print the progress to stderr. Defaults to True.
+
+        Returns:
+            Dict[str, Dict[str, Any]]: key = record file, value = its result - including the results of previous runs.
+        """
+        expected = self.expected_letters()
+        done = self.load_checkpoint()
+        pending = [filepath for filepath in sorted(expected) if filepath not in done]
+        limiter = RateLimiter(
+            self.rate if self.options.get("recognizer_backend", "google") == "google" else 0,
+            burst=self.workers,
+        )
+        logging.info(f"Re-recognizing {len(pending)} records, {len(done)} were done by previous runs")
+
+        start = time.monotonic()
+        completed = 0
+        with ProcessPoolExecutor(self.workers) as pool, open(
+            self.checkpoint_path, "a", encoding="utf-8"
+        ) as checkpoint:
+            in_flight = set()
+            remaining = iter(pending)
+            while True:
+                # Keep every worker busy, without queueing all the records up front
+                for filepath in remaining:
+                    limiter.acquire()
+                    in_flight.add(pool.submit(recognize_file, filepath, self.options))
+                    if len(in_flight) >= self.workers * 2:
+                        break
+                if not in_flight:
+                    break
+
+                finished, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    record = future.result()
+                    record["expected"] = expected[record["file"]]
+                    if record.get("retry"):
+                        logging.warning(f"Recognition of {record['file']} failed, will be retried by the next run - {record['error']}")
+                        continue
+                    done[record["file"]] = record
+                    checkpoint.write(json.dumps(record, ensure_ascii=False) + "\n")
+                    completed += 1
+                checkpoint.flush()
+
+                if progress:
+                    elapsed = time.monotonic() - start
+                    print(
+                        f"\r{completed}/{len(pending)} records, {completed / elapsed if elapsed else 0:.1f}/s",
+                        end="",
+                        file=sys.stderr,
+                    )
+        if progress:
+            print(file=sys.stderr)
+        return done
+
+    def suggestions(self, results: Dict[str, Dict[str, Any]], min_hits: int = 2, min_purity: float = 0.8) -> List[Dict[str, Any]]:
+        """Rank the transcripts the current recognition options miss, as new aliases of the expected letters.
+
+        Args:
+            results (Dict[str, Dict[str, Any]]): The recognition results.
+            min_hits (int, optional): Aliases heard in fewer records are ignored. Defaults to 2.
+            min_purity (float, optional): Share of the alias records expecting its letter, ambiguous aliases are ignored. Defaults to 0.8.
+
+        Returns:
+            List[Dict[str, Any]]: alias, letter, hits, purity and other_letters, best first.
+        """
+        # Per normalized transcript - the records of every expected letter, and its most common spelling
+        letters = {}
+        spellings = {}
+        for record in results.values():
+            if record.get("error") or record.get("letter"):
+                continue
+            match = self.index.match([tuple(alternative) for alternative in record["alternatives"]])
+            if match and match.letter == record["expected"]:
+                continue
+            heard = set()
+            for transcript, _ in record["alternatives"]:
+                normalized = RecognitionIndex.normalize(transcript)
+                if not normalized or normalized in heard or self.index.lookup(transcript):
+                    continue
+                heard.add(normalized)
+                letters.setdefault(normalized, Counter())[record["expected"]] += 1
+                spellings.setdefault(normalized, Counter())[transcript.strip()] += 1
+
+        ranked = []
+        for normalized, counts in letters.items():
+            letter, hits = counts.most_common(1)[0]
+            purity = hits / sum(counts.values())
+            if hits >= min_hits and purity >= min_purity:
+                ranked.append(
+                    {
+                        "alias": spellings[normalized].most_common(1)[0][0],
+                        "letter": letter,
+                        "hits": hits,
+                        "purity": round(purity, 3),
+                        "other_letters": {other: count for other, count in counts.items() if other != letter},
+                    }
+                )
+        ranked.sort(key=lambda suggestion: (-suggestion["hits"], -suggestion["purity"], suggestion["alias"]))
+        return ranked
+
+    def accuracy(self, results: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, int]]:
+        """Count the records recognized as their expected letter, with the current recognition options.
+
+        Args:
+            results (Dict[str, Dict[str, Any]]): The recognition results.
+
+        Returns:
+            Dict[str, Dict[str, int]]: key = letter, value = records, recognized and failed counts.
+        """
+        counts = {}
+        for record in results.values():
+            letter_counts = counts.setdefault(record["expected"], {"records": 0, "recognized": 0, "failed": 0})
+            letter_counts["records"] += 1
+            if record.get("error"):
+                letter_counts["failed"] += 1
+                continue
+            letter = record.get("letter")
+            if not letter:
+                match = self.index.match([tuple(alternative) for alternative in record["alternatives"]])
+                letter = match.letter if match else None
+            letter_counts["recognized"] += letter == record["expected"]
+        return counts
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Re-recognition CLI - python -m AlephPi.ArchiveRecognition [folders] [--backend google] [--output suggestions.json]"""
+    parser = argparse.ArgumentParser(
+        description="Re-recognize the archived records in parallel and suggest new recognition options."
+    )
+    parser.add_argument("folders", nargs="*", help="Archive folders, default the configured unrecognized / misdetection folders.")
+    parser.add_argument("--config", default="aleph_config.ini", help="Config file of the backend options.")
+    parser.add_argument("--backend", choices=["google", "keyword_spotting"], help="Recognizer backend, default the configured one.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 4, help="Worker processes.")
+    parser.add_argument("--rate", type=float, default=10, help="Requests per second to a remote backend, 0 for no limit.")
+    parser.add_argument("--checkpoint", default="archive_recognition.jsonl", help="Results of previous runs, the run continues from it.")
+    parser.add_argument("--restart", action="store_true", help="Ignore the checkpoint of previous runs.")
+    parser.add_argument("--min-hits", type=int, default=2, help="Suggest aliases heard in at least this many records.")
+    parser.add_argument("--min-purity", type=float, default=0.8, help="Suggest aliases whose records expect the same letter at least this share of the time.")
+    parser.add_argument("--output", help="Write the suggested aliases as {alias: letter} JSON, to be merged into the recognition options.")
+    args = parser.parse_args(argv)
+
+    config = configparser.ConfigParser()
+    if not config.read(args.config, encoding="utf-8"):
+        parser.error(f"Cannot read config file {args.config}")
+    options = dict(config["Speech Recognition"])
+    options["correct_answers_folders"] = config["Audio Files"].get(
+        "correct_answers_folders", os.path.join("audio", "correct_answers")
+    )
+    if args.backend:
+        options["recognizer_backend"] = args.backend
+    folders = args.folders or [
+        options.get("unrecognized_folder", "unrecognized"),
+        options.get("misdetection_folder", "misdetection"),
+    ]
+    if args.restart and os.path.isfile(args.checkpoint):
+        os.remove(args.checkpoint)
+
+    archive_recognition = ArchiveRecognition(
+        folders,
+        options,
+        RecognitionIndex.RecognitionIndex(
+            options.get("recognition_options_file_path", "recognition_options.json"),
+            float(options.get("match_min_similarity", 0.6)),
+        ),
+        args.checkpoint,
+        args.workers,
+        args.rate,
+    )
+    results = archive_recognition.run()
+
+    print(f"\n{'letter':10} {'records':>8} {'recognized':>11} {'failed':>7}")
+    for letter, counts in sorted(archive_recognition.accuracy(results).items()):
+        print(f"{letter:10} {counts['records']:>8} {counts['recognized']:>11} {counts['failed']:>7}")
+
+    suggestions = archive_recognition.suggestions(results, args.min_hits, args.min_purity)
+    print(f"\n{'rank':>4} {'alias':20} {'letter':10} {'hits':>5} {'purity':>7}  other letters")
+    for rank, suggestion in enumerate(suggestions, 1):
+        others = ", ".join(f"{letter}:{count}" for letter, count in suggestion["other_letters"].items())
+        print(
+            f"{rank:>4} {suggestion['alias']:20} {suggestion['letter']:10} {suggestion['hits']:>5} {suggestion['purity']:>7.2f}  {others}"
+        )
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output_file:
+            json.dump(
+                {suggestion["alias"]: suggestion["letter"] for suggestion in suggestions},
+                output_file,
+                ensure_ascii=False,
+                indent=4,
+            )
+
+
+if __name__ == "__main__":
+    main()
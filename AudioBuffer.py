@@ -0,0 +1,194 @@
+import threading
+from typing import Any, Dict, Optional
+
+import numpy as np
+import speech_recognition as sr
+
+
+class AllocationCounters:
+    """Counts the audio copies of every pipeline stage - buffers allocated for audio samples, and views taken instead of copies.
+
+    A turn should allocate the record buffer once at capture, and then only where a stage produces new audio (resampling, encoding).
+    """
+
+    def __init__(self) -> None:
+        self._stages = {}
+        self._lock = threading.Lock()
+
+    def allocated(self, stage: str, nbytes: int) -> None:
+        """Count a buffer allocated for audio.
+
+        Args:
+            stage (str): The pipeline stage.
+            nbytes (int): Size of the buffer.
+        """
+        with self._lock:
+            counters = self._counters(stage)
+            counters["allocations"] += 1
+            counters["allocated_bytes"] += int(nbytes)
+
+    def viewed(self, stage: str) -> None:
+        """Count a view of audio taken instead of a copy.
+
+        Args:
+            stage (str): The pipeline stage.
+        """
+        with self._lock:
+            self._counters(stage)["views"] += 1
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """Returns the allocations, allocated_bytes and views of every stage."""
+        with self._lock:
+            return {stage: dict(counters) for stage, counters in self._stages.items()}
+
+    def reset(self) -> None:
+        """Zero all the counters."""
+        with self._lock:
+            self._stages.clear()
+
+    def _counters(self, stage: str) -> Dict[str, int]:
+        if stage not in self._stages:
+            self._stages[stage] = {"allocations": 0, "allocated_bytes": 0, "views": 0}
+        return self._stages[stage]
+
+
+# The counters of the process, all the stages report to them
+allocations = AllocationCounters()
+
+
+class AudioBuffer(sr.AudioData):
+    """16 bit mono audio backed by a numpy array, passed between the pipeline stages as views of the same memory.
+
+    An AudioBuffer is an sr.AudioData - its frame_data is a memoryview of the samples, so code expecting records keeps working without copying them.
+    Views (see view) share the samples, the backing array lives as long as any of its views.
+
+    Attributes:
+        samples (np.ndarray): The int16 samples, usually a view of a RecordBuffer array.
+        sample_rate (int): Sample rate of the samples.
+        sample_width (int): 2 - 16 bit samples.
+        frame_data (memoryview): The samples as bytes.
+    """
+
+    def __init__(self, samples: np.ndarray, sample_rate: int) -> None:
+        """Constructs AudioBuffer over samples, without copying them.
+
+        Args:
+            samples (np.ndarray): Contiguous int16 samples.
+            sample_rate (int): Sample rate of the samples.
+
+        Raises:
+            ValueError: In case the samples aren't contiguous int16 samples.
+        """
+        if samples.dtype != np.int16 or not samples.flags["C_CONTIGUOUS"]:
+            raise ValueError("Audio buffers hold contiguous int16 samples")
+        super().__init__(memoryview(samples).cast("B"), sample_rate, 2)
+        self.samples = samples
+
+    def view(self, start: int = 0, end: Optional[int] = None, stage: str = "view") -> "AudioBuffer":
+        """Returns a part of the audio, sharing its samples.
+
+        Args:
+            start (int, optional): First sample. Defaults to 0.
+            end (Optional[int], optional): End sample (exclusive). Defaults to the end of the audio.
+            stage (str, optional): The pipeline stage taking the view, for the allocation counters. Defaults to "view".
+
+        Returns:
+            AudioBuffer: The view.
+        """
+        allocations.viewed(stage)
+        return AudioBuffer(self.samples[start:end], self.sample_rate)
+
+
+def as_samples(audio_data: sr.AudioData, stage: str) -> np.ndarray:
+    """Returns the int16 samples of a record - a view of an AudioBuffer (or of 16 bit sr.AudioData), converted only for other sample widths.
+
+    Args:
+        audio_data (sr.AudioData): The record.
+        stage (str): The pipeline stage, for the allocation counters.
+
+    Returns:
+        np.ndarray: The samples, read only for sr.AudioData.
+    """
+    if isinstance(audio_data, AudioBuffer):
+        allocations.viewed(stage)
+        return audio_data.samples
+    if audio_data.sample_width == 2:
+        allocations.viewed(stage)
+        return np.frombuffer(audio_data.frame_data, dtype=np.int16)
+    raw = audio_data.get_raw_data(convert_width=2)
+    allocations.allocated(stage, len(raw))
+    return np.frombuffer(raw, dtype=np.int16)
+
+
+class RecordBuffer:
+    """A record being captured, into an array allocated once for the longest possible record.
+
+    Chunks are read from the mic straight into the array, and every stage gets views of it.
+    Only the touched pages of the array take memory, a short record of a long buffer stays small.
+
+    Attributes:
+        sample_rate (int): Sample rate of the record.
+        capacity (int): The maximal record length, in samples.
+        length (int): Samples recorded so far.
+    """
+
+    def __init__(self, capacity: int, sample_rate: int) -> None:
+        self.sample_rate = sample_rate
+        self.capacity = capacity
+        self.length = 0
+        self._samples = np.empty(capacity, dtype=np.int16)
+        self._bytes = memoryview(self._samples).cast("B")
+        allocations.allocated("capture", self._samples.nbytes)
+
+    def read_chunk(self, mic: Any) -> np.ndarray:
+        """Read the next chunk of an opened mic into the record.
+
+        Args:
+            mic (Any): The opened mic - sr.Microphone, or a capture reader which copies straight into the record.
+
+        Raises:
+            ValueError: In case the record is full.
+
+        Returns:
+            np.ndarray: A view of the chunk samples.
+        """
+        start = self.length
+        end = start + mic.CHUNK
+        if end > self.capacity:
+            raise ValueError("The record buffer is full")
+        target = self._bytes[start * 2 : end * 2]
+        read_into = getattr(mic.stream, "read_into", None)
+        if read_into is not None:
+            read_into(target)
+        else:
+            # The stream returns its own buffer, copied into place
+            target[:] = mic.stream.read(mic.CHUNK)
+        self.length = end
+        allocations.viewed("capture")
+        return self._samples[start:end]
+
+    def chunk_bytes(self, start: int, end: int) -> memoryview:
+        """Returns samples start to end as bytes, without copying them.
+
+        Args:
+            start (int): First sample.
+            end (int): End sample (exclusive).
+
+        Returns:
+            memoryview: The samples bytes.
+        """
+        return self._bytes[start * 2 : end * 2]
+
+    def audio(self, start: int = 0, end: Optional[int] = None, stage: str = "capture") -> AudioBuffer:
+        """Returns the recorded samples start to end, without copying them.
+
+        Args:
+            start (int, optional): First sample. Defaults to 0.
+            end (Optional[int], optional): End sample (exclusive). Defaults to the recorded length.
+            stage (str, optional): The pipeline stage taking the view, for the allocation counters. Defaults to "capture".
+
+        Returns:
+            AudioBuffer: A view of the record.
+        """
+        allocations.viewed(stage)
+        return AudioBuffer(self._samples[start : self.length if end is None else end], self.sample_rate)
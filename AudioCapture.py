@@ -0,0 +1,273 @@
+import math
+import time
+import logging
+import threading
+from typing import Any, Dict
+
+import speech_recognition as sr
+
+from . import Logger
+
+# pyaudio.paInputOverflowed - the device buffer overflowed before it was read
+_PA_INPUT_OVERFLOWED = -9981
+
+
+class CaptureReader:
+    """A record of a CaptureService, read like an opened sr.Microphone - reader.stream.read(CHUNK) returns the next chunk.
+
+    Attributes:
+        SAMPLE_RATE (int): Sample rate of the mic.
+        SAMPLE_WIDTH (int): Bytes per sample.
+        CHUNK (int): Samples per mic read.
+        stream (CaptureReader): The reader itself, for code reading sr.Microphone streams.
+        overruns (int): Times the reader fell more than the ring buffer behind the mic, and skipped the overwritten audio.
+        pre_roll (int): Samples captured before the record started, read first - a whole number of chunks.
+    """
+
+    def __init__(self, service: "CaptureService", position: int, pre_roll: int = 0) -> None:
+        self.SAMPLE_RATE = service.SAMPLE_RATE
+        self.SAMPLE_WIDTH = service.SAMPLE_WIDTH
+        self.CHUNK = service.CHUNK
+        self.stream = self
+        self.overruns = 0
+        self.pre_roll = pre_roll
+        self._service = service
+        self._position = position
+
+    def __enter__(self) -> "CaptureReader":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        pass
+
+    def read(self, size: int) -> bytes:
+        """Returns the next size samples, blocking until the mic captured them.
+
+        Args:
+            size (int): Samples to read.
+
+        Raises:
+            EnvironmentError: In case the mic capture failed.
+
+        Returns:
+            bytes: The samples.
+        """
+        data = bytearray(size * self.SAMPLE_WIDTH)
+        self._service._read(self, memoryview(data))
+        return bytes(data)
+
+    def read_into(self, target: memoryview) -> None:
+        """Copy the next samples straight into a buffer, blocking until the mic captured them.
+
+        Args:
+            target (memoryview): Bytes buffer to fill, a whole number of samples.
+
+        Raises:
+            EnvironmentError: In case the mic capture failed.
+        """
+        self._service._read(self, target)
+
+
+class CaptureService:
+    """Keeps a microphone open for the whole session, capturing it into a fixed size ring buffer.
+
+    Opening the mic takes a while, and a record opened after the start record prompt misses the answers said right on the prompt.
+    The service opens the mic once and captures it in a dedicated thread, so a record starts right away and can include the last
+    seconds captured before it started (pre-roll). The ring buffer is allocated once, the memory doesn't grow however long the session runs.
+
+    Mic read errors (for example an unplugged mic) are retried by reopening the mic, the records read meanwhile raise EnvironmentError.
+
+    Attributes:
+        microphone (sr.Microphone): The captured mic, opened by the service.
+        buffer_seconds (float): Seconds of audio kept in the ring buffer.
+        SAMPLE_RATE (int): Sample rate of the mic.
+        SAMPLE_WIDTH (int): Bytes per sample.
+        CHUNK (int): Samples per mic read.
+        chunks (int): Chunks captured.
+        overruns (int): Times a reader fell more than the ring buffer behind the mic.
+        overrun_bytes (int): Audio bytes the readers skipped because they were overwritten.
+        device_overflows (int): Times the mic device buffer overflowed before the service read it (audio lost by the device).
+        read_errors (int): Failed mic reads.
+        reopens (int): Times the mic was reopened after a read error.
+    """
+
+    @Logger.log_function
+    def __init__(self, microphone: sr.Microphone, buffer_seconds: float = 10.0) -> None:
+        """Constructs CaptureService, allocating its ring buffer. The mic is opened by start().
+
+        Args:
+            See Attributes section in class docstring
+        """
+        self.microphone = microphone
+        self.buffer_seconds = buffer_seconds
+        self.SAMPLE_RATE = microphone.SAMPLE_RATE
+        self.SAMPLE_WIDTH = microphone.SAMPLE_WIDTH
+        self.CHUNK = microphone.CHUNK
+        self.chunks = 0
+        self.overruns = 0
+        self.overrun_bytes = 0
+        self.device_overflows = 0
+        self.read_errors = 0
+        self.reopens = 0
+
+        # Whole chunks, so most writes don't wrap around
+        chunk_bytes = self.CHUNK * self.SAMPLE_WIDTH
+        self._capacity = max(1, math.ceil(buffer_seconds * self.SAMPLE_RATE / self.CHUNK)) * chunk_bytes
+        self._buffer = bytearray(self._capacity)
+        self._view = memoryview(self._buffer)
+        # Bytes captured since the start - the ring holds the last _capacity of them
+        self._written = 0
+        self._error = None
+        self._running = False
+        self._thread = None
+        self._condition = threading.Condition()
+
+    @Logger.log_function
+    def start(self) -> None:
+        """Open the mic and start capturing it.
+
+        Raises:
+            EnvironmentError: In case the mic cannot be opened.
+        """
+        if self._running:
+            return
+        self.microphone.__enter__()
+        self._running = True
+        self._thread = threading.Thread(target=self._capture, name="mic-capture", daemon=True)
+        self._thread.start()
+
+    def reader(self, pre_roll: float = 0.0) -> CaptureReader:
+        """Start a record, right away.
+
+        Args:
+            pre_roll (float, optional): Seconds captured before the record started to include in the record, rounded up to whole chunks. Defaults to 0.
+
+        Returns:
+            CaptureReader: The record, read like an opened microphone.
+        """
+        chunk_bytes = self.CHUNK * self.SAMPLE_WIDTH
+        pre_roll_bytes = math.ceil(pre_roll * self.SAMPLE_RATE / self.CHUNK) * chunk_bytes
+        with self._condition:
+            pre_roll_bytes = min(pre_roll_bytes, self._capacity, self._written)
+            # Whole chunks, so the record chunks start right where the record started
+            pre_roll_bytes -= pre_roll_bytes % chunk_bytes
+            position = self._written - pre_roll_bytes
+        return CaptureReader(self, position, pre_roll_bytes // self.SAMPLE_WIDTH)
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns the capture counters - captured seconds, reader overruns, device overflows and mic read errors."""
+        with self._condition:
+            return {
+                "captured_seconds": round(self._written / self.SAMPLE_WIDTH / self.SAMPLE_RATE, 3),
+                "chunks": self.chunks,
+                "buffer_bytes": self._capacity,
+                "overruns": self.overruns,
+                "overrun_bytes": self.overrun_bytes,
+                "device_overflows": self.device_overflows,
+                "read_errors": self.read_errors,
+                "reopens": self.reopens,
+            }
+
+    @Logger.log_function
+    def close(self, timeout: float = 1.0) -> None:
+        """Stop capturing and close the mic.
+
+        Args:
+            timeout (float, optional): Seconds to wait for the capture thread. Defaults to 1.
+        """
+        self._running = False
+        with self._condition:
+            self._condition.notify_all()
+        if self._thread:
+            self._thread.join(timeout)
+
+    def _capture(self) -> None:
+        """Read the mic into the ring buffer until closed. Runs in the capture thread, which owns the opened mic."""
+        try:
+            while self._running:
+                try:
+                    chunk = self._read_chunk()
+                except (IOError, OSError) as ex:
+                    self._failed(ex)
+                    continue
+                self._write(chunk)
+        finally:
+            self._close_microphone()
+
+    def _read_chunk(self) -> bytes:
+        """Read the next chunk of the mic, counting device overflows when the mic is a PyAudio stream."""
+        stream = self.microphone.stream
+        if stream is None:
+            raise EnvironmentError("The mic isn't open")
+        pyaudio_stream = getattr(stream, "pyaudio_stream", None)
+        if pyaudio_stream is None:
+            return stream.read(self.CHUNK)
+        try:
+            return pyaudio_stream.read(self.CHUNK, exception_on_overflow=True)
+        except IOError as ex:
+            if ex.errno != _PA_INPUT_OVERFLOWED:
+                raise
+            with self._condition:
+                self.device_overflows += 1
+            return pyaudio_stream.read(self.CHUNK, exception_on_overflow=False)
+
+    def _write(self, chunk: bytes) -> None:
+        """Append a chunk to the ring buffer, overwriting the oldest audio."""
+        with self._condition:
+            offset = self._written % self._capacity
+            first = min(len(chunk), self._capacity - offset)
+            self._view[offset : offset + first] = chunk[:first]
+            self._view[: len(chunk) - first] = chunk[first:]
+            self._written += len(chunk)
+            self.chunks += 1
+            self._error = None
+            self._condition.notify_all()
+
+    def _failed(self, error: Exception) -> None:
+        """Handle a mic read error - fail the waiting readers and reopen the mic."""
+        logging.error(f"Mic capture failed, reopening the mic - {error}")
+        with self._condition:
+            self.read_errors += 1
+            self._error = error
+            self._condition.notify_all()
+        time.sleep(1)
+        if not self._running:
+            return
+        self._close_microphone()
+        try:
+            self.microphone.__enter__()
+            self.reopens += 1
+        except (IOError, OSError) as ex:
+            logging.error(f"Cannot reopen the mic - {ex}")
+
+    def _close_microphone(self) -> None:
+        if self.microphone.stream is not None:
+            self.microphone.__exit__(None, None, None)
+
+    def _read(self, reader: CaptureReader, target: memoryview) -> None:
+        """Copy the next bytes of a reader out of the ring buffer into target, waiting until they are captured."""
+        length = len(target)
+        # A few chunks without audio means the capture is stuck
+        stall_timeout = max(1.0, 4 * self.CHUNK / self.SAMPLE_RATE)
+        with self._condition:
+            while self._written < reader._position + length:
+                if self._error is not None:
+                    raise EnvironmentError(f"Mic capture failed - {self._error}")
+                if not self._running:
+                    raise EnvironmentError("Mic capture is closed")
+                if not self._condition.wait(stall_timeout):
+                    raise EnvironmentError(f"Mic capture stalled for {stall_timeout} seconds")
+
+            oldest = self._written - self._capacity
+            if reader._position < oldest:
+                # The mic overwrote the audio the reader didn't read yet
+                self.overruns += 1
+                self.overrun_bytes += oldest - reader._position
+                reader.overruns += 1
+                reader._position = oldest
+
+            offset = reader._position % self._capacity
+            first = min(length, self._capacity - offset)
+            target[:first] = self._view[offset : offset + first]
+            target[first:] = self._view[: length - first]
+            reader._position += length
@@ -0,0 +1,177 @@
+import io
+import time
+import logging
+from math import gcd
+from typing import Optional
+
+import numpy as np
+import speech_recognition as sr
+
+from . import AudioBuffer, Logger
+
+
+class PreparedAudio:
+    """A record ready to be uploaded for recognition.
+
+    Attributes:
+        data (bytes): The encoded audio.
+        content_type (str): HTTP content type of the encoded audio.
+        sample_rate (int): Sample rate of the encoded audio.
+    """
+
+    def __init__(self, data: bytes, content_type: str, sample_rate: int) -> None:
+        self.data = data
+        self.content_type = content_type
+        self.sample_rate = sample_rate
+
+
+def resample_poly(
+    samples: np.ndarray,
+    up: int,
+    down: int,
+    half_width: int = 8,
+    beta: float = 5.0,
+    block: int = 4096,
+    stage: Optional[str] = None,
+) -> np.ndarray:
+    """Resample by up / down with a polyphase Kaiser windowed sinc filter.
+    Only the filter phases which produce output samples are evaluated, a block of outputs at a time in a single vectorized product.
+
+    Args:
+        samples (np.ndarray): Mono samples.
+        up (int): Upsampling factor.
+        down (int): Downsampling factor.
+        half_width (int, optional): Filter zero crossings on each side. Defaults to 8.
+        beta (float, optional): Kaiser window beta. Defaults to 5.0.
+        block (int, optional): Output samples computed at once, bounds the temporary memory. Defaults to 4096.
+        stage (Optional[str], optional): Pipeline stage to count the allocated buffers for, see AudioBuffer.allocations. Defaults to None - not counted.
+
+    Returns:
+        np.ndarray: The resampled float32 samples.
+    """
+    divisor = gcd(up, down)
+    up, down = up // divisor, down // divisor
+    if up == down:
+        return np.asarray(samples, dtype=np.float32)
+
+    # Low pass at the lower of the 2 Nyquist frequencies, with a gain of up to compensate the zeros inserted by upsampling
+    cutoff = 1.0 / max(up, down)
+    taps = 2 * half_width * max(up, down) + 1
+    center = (taps - 1) // 2
+    filter_taps = cutoff * np.sinc(cutoff * (np.arange(taps) - center)) * np.kaiser(taps, beta) * up
+
+    # Polyphase bank - phase p holds taps p, p + up, p + 2 * up...
+    taps_per_phase = -(-taps // up)
+    filter_taps = np.pad(filter_taps, (0, taps_per_phase * up - taps))
+    bank = filter_taps.reshape(taps_per_phase, up).T.astype(np.float32)
+
+    outputs = -(-len(samples) * up // down)
+    # Converted to float straight into the padded signal
+    padded = np.zeros(len(samples) + 2 * taps_per_phase + center // up + 1, dtype=np.float32)
+    padded[taps_per_phase : taps_per_phase + len(samples)] = samples
+    offsets = np.arange(taps_per_phase)
+    resampled = np.empty(outputs, dtype=np.float32)
+    for start in range(0, outputs, block):
+        # Position of every output sample in the (virtually) upsampled signal, delayed by the filter center
+        positions = np.arange(start, min(start + block, outputs)) * down + center
+        phases = positions % up
+        bases = positions // up + taps_per_phase
+        windows = padded[bases[:, None] - offsets[None, :]]
+        resampled[start : start + len(positions)] = np.einsum("nk,nk->n", windows, bank[phases])
+    if stage:
+        AudioBuffer.allocations.allocated(stage, padded.nbytes)
+        AudioBuffer.allocations.allocated(stage, resampled.nbytes)
+    return resampled
+
+
+class AudioPreparation:
+    """Prepares records for upload - resample to the recognition sample rate, convert to mono 16 bit and encode, all in memory.
+
+    Codecs:
+        flac - lossless, encoded by libsndfile (soundfile package), no external flac / sox processes.
+        opus - Ogg Opus speech codec, for services accepting it (libsndfile >= 1.0.29).
+        l16 - raw 16 bit PCM, no encoding.
+
+    Attributes:
+        sample_rate (int): The recognition sample rate.
+        codec (str): flac / opus / l16.
+        last_report (Dict[str, float]): bytes before / after, resample and encode milliseconds of the last prepared record.
+    """
+
+    CONTENT_TYPES = {
+        "flac": "audio/x-flac; rate={rate}",
+        "opus": "audio/ogg; codecs=opus; rate={rate}",
+        "l16": "audio/l16; rate={rate}",
+    }
+
+    @Logger.log_function
+    def __init__(self, sample_rate: int = 16000, codec: str = "flac") -> None:
+        """Constructs AudioPreparation.
+
+        Args:
+            See Attributes section in class docstring
+
+        Raises:
+            ValueError: In case of an unknown codec.
+            EnvironmentError: In case the codec requires the soundfile package, and it isn't installed.
+        """
+        if codec not in self.CONTENT_TYPES:
+            raise ValueError(f"Unknown upload codec - {codec}")
+        self.sample_rate = sample_rate
+        self.codec = codec
+        self.last_report = {}
+        self._soundfile = None
+        if codec != "l16":
+            try:
+                import soundfile
+            except ImportError:
+                raise EnvironmentError(
+                    f"Upload codec {codec} requires the soundfile package, install it or set upload_codec = l16"
+                )
+            self._soundfile = soundfile
+
+    def prepare(self, audio_data: sr.AudioData) -> PreparedAudio:
+        """Resample, convert and encode a record. Records at the recognition sample rate are encoded straight from their samples.
+
+        Args:
+            audio_data (sr.AudioData): The recorded audio.
+
+        Returns:
+            PreparedAudio: The encoded record.
+        """
+        start = time.perf_counter()
+        pcm = AudioBuffer.as_samples(audio_data, "prepare")
+        if audio_data.sample_rate != self.sample_rate:
+            samples = resample_poly(pcm, self.sample_rate, audio_data.sample_rate, stage="resample")
+            np.round(samples, out=samples)
+            np.clip(samples, -32768, 32767, out=samples)
+            pcm = samples.astype(np.int16)
+            AudioBuffer.allocations.allocated("resample", pcm.nbytes)
+        resampled = time.perf_counter()
+
+        if self.codec == "l16":
+            # The request body must own its bytes
+            data = pcm.tobytes()
+        else:
+            buffer = io.BytesIO()
+            self._soundfile.write(
+                buffer,
+                pcm,
+                self.sample_rate,
+                format="FLAC" if self.codec == "flac" else "OGG",
+                subtype="PCM_16" if self.codec == "flac" else "OPUS",
+            )
+            data = buffer.getvalue()
+        AudioBuffer.allocations.allocated("encode", len(data))
+        encoded = time.perf_counter()
+
+        self.last_report = {
+            "bytes_before": len(audio_data.frame_data),
+            "bytes_after": len(data),
+            "resample_ms": (resampled - start) * 1000,
+            "encode_ms": (encoded - resampled) * 1000,
+        }
+        logging.info(f"Audio preparation: {self.last_report}")
+        return PreparedAudio(
+            data, self.CONTENT_TYPES[self.codec].format(rate=self.sample_rate), self.sample_rate
+        )
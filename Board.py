@@ -0,0 +1,359 @@
+import abc
+import time
+import threading
+import configparser
+from enum import Enum
+from typing import Callable, Dict, List, Tuple, Union
+
+from . import Logger
+
+
+class Edge(Enum):
+    """Signal edges which can be detected on an input pin."""
+
+    RISING = "rising"
+    FALLING = "falling"
+    BOTH = "both"
+
+
+class Board(abc.ABC):
+    """Hardware abstraction for the board GPIOs and serial ports. Pins are numbered by the RPi standard (BOARD) legend.
+
+    The game logic talks only to this interface, so it can run on a real RPi (RPiBoard) or on any Linux machine (SimulatedBoard).
+    Backends must implement all the methods, an incomplete backend fails when it's constructed.
+    """
+
+    HIGH = True
+    LOW = False
+
+    @abc.abstractmethod
+    def setup_output(self, pins: List[int]) -> None:
+        """Set pins as outputs.
+
+        Args:
+            pins (List[int]): Pins to set.
+        """
+
+    @abc.abstractmethod
+    def setup_input(self, pin: int) -> None:
+        """Set a pin as input.
+
+        Args:
+            pin (int): Pin to set.
+        """
+
+    @abc.abstractmethod
+    def output(self, pins: Union[int, List[int]], state: bool) -> None:
+        """Set one or more output pins to the same state.
+
+        Args:
+            pins (Union[int, List[int]]): A pin or list of pins.
+            state (bool): The state to be set.
+        """
+
+    @abc.abstractmethod
+    def output_many(self, states: Dict[int, bool]) -> None:
+        """Set multiple output pins to (possibly different) states in one batched write.
+
+        Args:
+            states (Dict[int, bool]): key = pin, value = the state to be set.
+        """
+
+    @abc.abstractmethod
+    def add_event_detect(
+        self, pin: int, edge: Edge, callback: Callable[[int], None], bouncetime: int
+    ) -> None:
+        """Call a callback when an edge is detected on an input pin. The callback is called from another thread.
+
+        Args:
+            pin (int): Input pin.
+            edge (Edge): The edge to detect.
+            callback (Callable[[int], None]): Called with the pin number.
+            bouncetime (int): Edges closer than this amount of milliseconds to the previous edge are ignored, 0 - every edge is reported.
+        """
+
+    @abc.abstractmethod
+    def remove_event_detect(self, pin: int) -> None:
+        """Stop detecting edges on an input pin.
+
+        Args:
+            pin (int): Input pin.
+        """
+
+    @abc.abstractmethod
+    def open_serial(self, serial_port: str, bandwidth: int):
+        """Open a serial port connected to the board.
+
+        Args:
+            serial_port (str): COM port.
+            bandwidth (int): serial bandwidth.
+
+        Returns:
+            A serial.Serial compatible connection.
+        """
+
+    @abc.abstractmethod
+    def cleanup(self) -> None:
+        """Release all the board resources."""
+
+
+class RPiBoard(Board):
+    """Board implementation for a real RaspberryPi, using RPi.GPIO and pyserial."""
+
+    @Logger.log_function
+    def __init__(self) -> None:
+        """Constructs RPiBoard, setting the GPIOs legend to RPi standard (BOARD)."""
+        # Imported here so the other backends can run on machines without RPi.GPIO.
+        import RPi.GPIO as GPIO
+
+        self._gpio = GPIO
+        self._edges = {
+            Edge.RISING: GPIO.RISING,
+            Edge.FALLING: GPIO.FALLING,
+            Edge.BOTH: GPIO.BOTH,
+        }
+        GPIO.setmode(GPIO.BOARD)
+
+    def setup_output(self, pins: List[int]) -> None:
+        self._gpio.setup(pins, self._gpio.OUT)
+
+    def setup_input(self, pin: int) -> None:
+        self._gpio.setup(pin, self._gpio.IN)
+
+    def output(self, pins: Union[int, List[int]], state: bool) -> None:
+        self._gpio.output(pins, self._gpio.HIGH if state else self._gpio.LOW)
+
+    def output_many(self, states: Dict[int, bool]) -> None:
+        if not states:
+            return
+        # RPi.GPIO accepts a list of channels with a matching list of values, writing all of them in a single call.
+        self._gpio.output(
+            list(states.keys()),
+            [self._gpio.HIGH if state else self._gpio.LOW for state in states.values()],
+        )
+
+    def add_event_detect(
+        self, pin: int, edge: Edge, callback: Callable[[int], None], bouncetime: int
+    ) -> None:
+        if bouncetime:
+            self._gpio.add_event_detect(
+                pin, self._edges[edge], callback, bouncetime=bouncetime
+            )
+        else:
+            # RPi.GPIO rejects a zero bounce time, no bounce time means every edge is reported
+            self._gpio.add_event_detect(pin, self._edges[edge], callback)
+
+    def remove_event_detect(self, pin: int) -> None:
+        self._gpio.remove_event_detect(pin)
+
+    @Logger.log_function
+    def open_serial(self, serial_port: str, bandwidth: int):
+        import serial
+
+        return serial.Serial(serial_port, bandwidth)
+
+    @Logger.log_function
+    def cleanup(self) -> None:
+        self._gpio.cleanup()
+
+
+class SimulatedSerial:
+    """In-process stand-in for serial.Serial, recording every write with a monotonic timestamp.
+
+    Attributes:
+        name (str): The serial port name.
+        writes (List[Tuple[float, bytes]]): Every write as (time.monotonic() timestamp, data).
+    """
+
+    def __init__(self, serial_port: str, bandwidth: int) -> None:
+        self.name = serial_port
+        self.bandwidth = bandwidth
+        self.writes = []
+        self._open = True
+        self._lock = threading.Lock()
+
+    def isOpen(self) -> bool:
+        return self._open
+
+    def write(self, data: bytes) -> int:
+        if not self._open:
+            raise EnvironmentError(f"Serial port {self.name} is closed")
+        with self._lock:
+            self.writes.append((time.monotonic(), bytes(data)))
+        return len(data)
+
+    def close(self) -> None:
+        self._open = False
+
+
+class SimulatedBoard(Board):
+    """In-process board simulator, for running and timing the game on any Linux machine.
+
+    Every output pin transition and serial write is recorded with a time.monotonic() timestamp, and button edges can be injected with press_button / inject_edge.
+
+    Attributes:
+        transitions (List[Tuple[float, int, bool]]): Every output pin transition as (timestamp, pin, state).
+        serial_ports (Dict[str, SimulatedSerial]): Serial ports opened on the board.
+    """
+
+    @Logger.log_function
+    def __init__(self) -> None:
+        """Constructs SimulatedBoard with no pins set."""
+        self.transitions = []
+        self.serial_ports = {}
+        self._states = {}
+        self._outputs = set()
+        self._inputs = set()
+        self._event_detects = {}
+        self._last_edge = {}
+        self._lock = threading.Lock()
+
+    def setup_output(self, pins: List[int]) -> None:
+        with self._lock:
+            for pin in self._as_list(pins):
+                self._outputs.add(pin)
+                self._states.setdefault(pin, self.LOW)
+
+    def setup_input(self, pin: int) -> None:
+        with self._lock:
+            self._inputs.add(pin)
+            # Inputs are pulled up, a press pulls the pin down (FALLING edge).
+            self._states[pin] = self.HIGH
+
+    def output(self, pins: Union[int, List[int]], state: bool) -> None:
+        self.output_many({pin: state for pin in self._as_list(pins)})
+
+    def output_many(self, states: Dict[int, bool]) -> None:
+        now = time.monotonic()
+        with self._lock:
+            for pin, state in states.items():
+                if pin not in self._outputs:
+                    raise RuntimeError(f"Pin {pin} wasn't set up as output")
+                state = bool(state)
+                if self._states[pin] != state:
+                    self._states[pin] = state
+                    self.transitions.append((now, pin, state))
+
+    def add_event_detect(
+        self, pin: int, edge: Edge, callback: Callable[[int], None], bouncetime: int
+    ) -> None:
+        with self._lock:
+            if pin not in self._inputs:
+                raise RuntimeError(f"Pin {pin} wasn't set up as input")
+            if pin in self._event_detects:
+                raise RuntimeError(f"Conflicting edge detection already enabled for pin {pin}")
+            self._event_detects[pin] = (edge, callback, bouncetime)
+
+    def remove_event_detect(self, pin: int) -> None:
+        with self._lock:
+            self._event_detects.pop(pin, None)
+
+    def open_serial(self, serial_port: str, bandwidth: int) -> SimulatedSerial:
+        with self._lock:
+            connection = SimulatedSerial(serial_port, bandwidth)
+            self.serial_ports[serial_port] = connection
+            return connection
+
+    def cleanup(self) -> None:
+        with self._lock:
+            self._event_detects.clear()
+            for connection in self.serial_ports.values():
+                connection.close()
+
+    def event_detect_enabled(self, pin: int) -> bool:
+        """Returns if edge detection is enabled on an input pin - someone is waiting for it.
+
+        Args:
+            pin (int): Input pin.
+
+        Returns:
+            bool: If a callback is registered on the pin.
+        """
+        with self._lock:
+            return pin in self._event_detects
+
+    def state(self, pin: int) -> bool:
+        """Returns the current state of a pin.
+
+        Args:
+            pin (int): The pin.
+
+        Returns:
+            bool: The pin state.
+        """
+        with self._lock:
+            return self._states[pin]
+
+    def inject_edge(self, pin: int, edge: Edge) -> threading.Thread:
+        """Simulate an edge on an input pin. Like on a real board, the registered callback is called from another thread.
+
+        Args:
+            pin (int): Input pin.
+            edge (Edge): RISING or FALLING.
+
+        Returns:
+            threading.Thread: The thread running the callback (already finished if the edge was ignored).
+        """
+        now = time.monotonic()
+        callback = None
+        with self._lock:
+            self._states[pin] = edge == Edge.RISING
+            detect = self._event_detects.get(pin)
+            if detect:
+                detect_edge, detect_callback, bouncetime = detect
+                last_edge = self._last_edge.get(pin)
+                if detect_edge in (edge, Edge.BOTH) and (
+                    last_edge is None or (now - last_edge) * 1000 >= bouncetime
+                ):
+                    self._last_edge[pin] = now
+                    callback = detect_callback
+
+        thread = threading.Thread(
+            target=callback if callback else (lambda channel: None), args=(pin,)
+        )
+        thread.start()
+        return thread
+
+    def press_button(self, pin: int) -> threading.Thread:
+        """Simulate a button press and release on an input pin.
+
+        Args:
+            pin (int): Input pin.
+
+        Returns:
+            threading.Thread: The thread running the FALLING edge callback.
+        """
+        thread = self.inject_edge(pin, Edge.FALLING)
+        self.inject_edge(pin, Edge.RISING)
+        return thread
+
+    def _as_list(self, pins: Union[int, List[int]]) -> List[int]:
+        return list(pins) if isinstance(pins, (list, tuple, set)) else [pins]
+
+
+def create_board(config_board_section: configparser.SectionProxy) -> Board:
+    """Create the board backend selected in the config file.
+
+    Args:
+        config_board_section (configparser.SectionProxy): Configuration file Board section.
+
+    Raises:
+        ValueError: In case of an unknown backend.
+
+    Returns:
+        Board: The board backend.
+    """
+    backend = config_board_section.get("backend", "rpi")
+    if backend == "rpi":
+        return RPiBoard()
+    if backend == "simulated":
+        return SimulatedBoard()
+    if backend == "remote":
+        # Imported here, RemoteBoard builds on this module
+        from . import RemoteBoard
+
+        return RemoteBoard.RemoteBoard(
+            config_board_section.get("host", "127.0.0.1"),
+            config_board_section.getint("port", RemoteBoard.DEFAULT_PORT),
+        )
+    raise ValueError(f"Unknown board backend - {backend}")
@@ -0,0 +1,144 @@
+import time
+import asyncio
+import threading
+from collections import deque
+from typing import Any, Dict, Optional
+
+from . import Board, Logger
+
+
+class ButtonEvent:
+    """A debounced button press.
+
+    Attributes:
+        pin (int): The button pin.
+        timestamp (float): time.monotonic() timestamp of the edge, taken in the GPIO callback thread.
+    """
+
+    __slots__ = ("pin", "timestamp")
+
+    def __init__(self, pin: int, timestamp: float) -> None:
+        self.pin = pin
+        self.timestamp = timestamp
+
+    def __repr__(self) -> str:
+        return f"ButtonEvent(pin={self.pin}, timestamp={self.timestamp:.6f})"
+
+
+class ButtonInput:
+    """Detects the presses of a button for the whole session, queueing them with the time they happened.
+
+    Edge detection is registered once by start(). Every edge is timestamped in the GPIO callback thread, debounced in software
+    and appended to a bounded queue (the oldest press is dropped when it's full) - the game consumes the presses at its own pace,
+    and a press arriving while nobody waits isn't lost. The presses are consumed from the event loop with next_press.
+
+    Attributes:
+        board (Board): The board backend the button is connected to.
+        pin (int): The button input pin.
+        debounce_ms (float): Edges closer than this amount of milliseconds to the previous accepted edge are bounces, and ignored.
+        queue_size (int): Presses kept until they are consumed.
+    """
+
+    @Logger.log_function
+    def __init__(self, board: Board.Board, pin: int, debounce_ms: float = 200, queue_size: int = 16) -> None:
+        """Constructs ButtonInput, edges aren't detected until start().
+
+        Args:
+            See Attributes section in class docstring
+        """
+        self.board = board
+        self.pin = pin
+        self.debounce_ms = debounce_ms
+        self.queue_size = queue_size
+
+        # Appended by the GPIO thread and popped by the event loop - deque appends and pops are atomic
+        self._events = deque(maxlen=queue_size)
+        self._last_edge = None
+        self._started = False
+        self._loop = None
+        self._waiter = None
+        self._lock = threading.Lock()
+        self._edges = 0
+        self._bounces = 0
+        self._dropped = 0
+        self._stale = 0
+        self._consumed = 0
+
+    @Logger.log_function
+    def start(self) -> None:
+        """Register the edge detection of the button."""
+        if self._started:
+            return
+        # Debounced here, so the bounces are counted
+        self.board.add_event_detect(self.pin, Board.Edge.FALLING, self._on_edge, bouncetime=0)
+        self._started = True
+
+    @Logger.log_function
+    def close(self) -> None:
+        """Stop detecting the button edges."""
+        if self._started:
+            self._started = False
+            self.board.remove_event_detect(self.pin)
+
+    @property
+    def waiting(self) -> bool:
+        """Someone is waiting for a press."""
+        return self._waiter is not None
+
+    async def next_press(self, since: float) -> ButtonEvent:
+        """Wait for the next press, from the event loop thread.
+
+        Args:
+            since (float): time.monotonic() timestamp - presses queued before it were meant for an earlier phase, and are dropped.
+
+        Returns:
+            ButtonEvent: The press.
+        """
+        # The running loop - get_event_loop returns it inside a coroutine
+        self._loop = asyncio.get_event_loop()
+        while True:
+            while self._events:
+                event = self._events.popleft()
+                if event.timestamp >= since:
+                    self._consumed += 1
+                    return event
+                self._stale += 1
+            self._waiter = asyncio.Event()
+            try:
+                # An edge queued before the waiter was set wouldn't set it
+                if not self._events:
+                    await self._waiter.wait()
+            finally:
+                self._waiter = None
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns the button counters - edges detected, bounces ignored, presses dropped by a full queue, stale presses, presses consumed and presses queued."""
+        with self._lock:
+            return {
+                "edges": self._edges,
+                "bounces": self._bounces,
+                "dropped": self._dropped,
+                "stale": self._stale,
+                "consumed": self._consumed,
+                "queued": len(self._events),
+            }
+
+    def _on_edge(self, channel: int) -> None:
+        """The GPIO callback, timestamping, debouncing and queueing the edge.
+
+        Args:
+            channel (int): The pin of the edge.
+        """
+        timestamp = time.monotonic()
+        with self._lock:
+            self._edges += 1
+            if self._last_edge is not None and (timestamp - self._last_edge) * 1000 < self.debounce_ms:
+                self._bounces += 1
+                return
+            self._last_edge = timestamp
+            if len(self._events) == self.queue_size:
+                self._dropped += 1
+            self._events.append(ButtonEvent(channel, timestamp))
+        loop, waiter = self._loop, self._waiter
+        if loop is not None and waiter is not None:
+            loop.call_soon_threadsafe(waiter.set)
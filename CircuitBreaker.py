@@ -0,0 +1,186 @@
+import math
+import time
+import logging
+import threading
+from collections import deque
+from enum import Enum
+from typing import Any, Dict
+
+import speech_recognition as sr
+
+from . import Logger, Tracing
+
+
+class CircuitState(Enum):
+    """The states of a circuit breaker."""
+
+    # Calls go through, their outcomes are tracked
+    CLOSED = "closed"
+    # Calls fail fast, until reset_timeout passed
+    OPEN = "open"
+    # A single trial call goes through, its outcome closes or reopens the circuit
+    HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(sr.RequestError):
+    """Raised instead of calling a service whose circuit is open."""
+
+
+class CircuitBreaker:
+    """Tracks the recent calls of a remote service, and fails fast once it degrades.
+
+    The circuit opens when failure_threshold of the last window calls failed - an error, or an answer slower than slow_call_seconds.
+    While open, allow() returns False and the callers use their fallback right away. After reset_timeout seconds a single trial call
+    is allowed (half open), its success closes the circuit and its failure opens it again. State changes are logged.
+
+    Attributes:
+        name (str): The service name, for the logs.
+        window (int): Recent calls tracked.
+        failure_threshold (int): Failed calls of the window which open the circuit.
+        slow_call_seconds (float): Successful calls slower than this count as failures.
+        reset_timeout (float): Seconds the circuit stays open before a trial call.
+        state (CircuitState): The circuit state.
+    """
+
+    @Logger.log_function
+    def __init__(
+        self,
+        name: str,
+        window: int = 10,
+        failure_threshold: int = 3,
+        slow_call_seconds: float = 5.0,
+        reset_timeout: float = 60.0,
+    ) -> None:
+        """Constructs a closed CircuitBreaker.
+
+        Args:
+            See Attributes section in class docstring
+        """
+        self.name = name
+        self.window = window
+        self.failure_threshold = failure_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.reset_timeout = reset_timeout
+        self.state = CircuitState.CLOSED
+
+        self._lock = threading.Lock()
+        # (failed, latency seconds) of the recent calls
+        self._outcomes = deque(maxlen=window)
+        self._changed_at = time.monotonic()
+        self._trial_running = False
+        self._calls = 0
+        self._failures = 0
+        self._slow_calls = 0
+        self._rejected = 0
+        self._opened = 0
+
+    @property
+    def is_open(self) -> bool:
+        """The circuit is open - calls fail fast, without taking the half open trial call."""
+        return self.state == CircuitState.OPEN
+
+    def allow(self) -> bool:
+        """Returns if a call may go through. Calls which went through must report their outcome with record.
+
+        Returns:
+            bool: False while the circuit is open - the caller should fail fast.
+        """
+        with self._lock:
+            if self.state == CircuitState.OPEN and time.monotonic() - self._changed_at >= self.reset_timeout:
+                self._transition(CircuitState.HALF_OPEN, f"trial call after {self.reset_timeout} seconds")
+            if self.state == CircuitState.CLOSED:
+                return True
+            if self.state == CircuitState.HALF_OPEN and not self._trial_running:
+                self._trial_running = True
+                return True
+            self._rejected += 1
+            return False
+
+    def record(self, latency: float, failed: bool) -> None:
+        """Report the outcome of a call which went through.
+
+        Args:
+            latency (float): Seconds the call took, or waited before it was abandoned.
+            failed (bool): The call failed or was abandoned.
+        """
+        slow = not failed and latency > self.slow_call_seconds
+        with self._lock:
+            self._calls += 1
+            self._failures += failed
+            self._slow_calls += slow
+            self._outcomes.append((failed or slow, latency))
+
+            if self.state == CircuitState.HALF_OPEN:
+                self._trial_running = False
+                if failed or slow:
+                    self._transition(CircuitState.OPEN, f"trial call {'was slow' if slow else 'failed'}")
+                else:
+                    self._outcomes.clear()
+                    self._transition(CircuitState.CLOSED, "trial call succeeded")
+            elif self.state == CircuitState.CLOSED:
+                failures = sum(1 for outcome_failed, _ in self._outcomes if outcome_failed)
+                if failures >= self.failure_threshold:
+                    self._transition(
+                        CircuitState.OPEN, f"{failures} of the last {len(self._outcomes)} calls failed or were slow"
+                    )
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns the circuit state and counters - calls, failures, slow calls, rejected (failed fast) calls, times opened, and the recent calls latency."""
+        with self._lock:
+            latencies = sorted(latency * 1000 for _, latency in self._outcomes)
+            return {
+                "state": self.state.value,
+                "state_seconds": round(time.monotonic() - self._changed_at, 3),
+                "calls": self._calls,
+                "failures": self._failures,
+                "slow_calls": self._slow_calls,
+                "rejected": self._rejected,
+                "opened": self._opened,
+                "recent_failures": sum(1 for failed, _ in self._outcomes if failed),
+                "latency_ms_p50": round(Tracing.percentile(latencies, 50), 3) if latencies else None,
+                "latency_ms_p95": round(Tracing.percentile(latencies, 95), 3) if latencies else None,
+            }
+
+    def _transition(self, state: CircuitState, reason: str) -> None:
+        """Change the circuit state. Must be called with the lock held."""
+        logging.warning(f"Circuit {self.name} {self.state.value} -> {state.value} - {reason}")
+        self.state = state
+        self._changed_at = time.monotonic()
+        self._opened += state == CircuitState.OPEN
+
+
+class TurnDeadline:
+    """The end-to-end time budget of a game turn, split between its stages - every stage gets at most what's left of the turn.
+
+    Attributes:
+        total (float): Seconds the turn may take, 0 - no deadline.
+        start (float): time.monotonic() of the turn start.
+        budgets (Dict[str, float]): Seconds given to every stage so far.
+    """
+
+    def __init__(self, total: float) -> None:
+        self.total = total
+        self.start = time.monotonic()
+        self.budgets = {}
+
+    def remaining(self) -> float:
+        """Returns the seconds left until the deadline, infinite when there's no deadline."""
+        if not self.total:
+            return math.inf
+        return max(0.0, self.start + self.total - time.monotonic())
+
+    def stage(self, name: str, max_seconds: float, reserve: float = 0.0, minimum: float = 0.0) -> float:
+        """Give a stage its budget - up to max_seconds, leaving reserve seconds for the following stages.
+
+        Args:
+            name (str): The stage name.
+            max_seconds (float): The stage own time limit.
+            reserve (float, optional): Seconds kept for the following stages. Defaults to 0.
+            minimum (float, optional): Seconds the stage gets even when the turn is already late. Defaults to 0.
+
+        Returns:
+            float: The stage budget, seconds.
+        """
+        budget = min(max_seconds, max(minimum, self.remaining() - reserve, 0.0))
+        self.budgets[name] = round(budget, 3)
+        return budget
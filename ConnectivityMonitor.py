@@ -0,0 +1,123 @@
+import time
+import logging
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from . import Logger
+
+
+def create_session(pool_maxsize: int = 4) -> requests.Session:
+    """Create a keep-alive HTTP session, so requests to the same host reuse established connections.
+
+    Args:
+        pool_maxsize (int, optional): Connections kept open per host. Defaults to 4.
+
+    Returns:
+        requests.Session: The session.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_maxsize)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+class ConnectivityMonitor:
+    """Keeps a cached internet connectivity state, refreshed by a background thread, so callers never wait for a probe.
+
+    The state is probed every interval seconds (every failure_interval seconds while disconnected) and whenever refresh is called.
+    Probes go through the shared session, so they also keep its connection to the probed host alive.
+
+    Attributes:
+        session (requests.Session): Shared keep-alive session for all the internet traffic.
+        url (str): Url to be used for detecting internet connection.
+        timeout (float): Timeout of a single probe.
+        interval (float): Seconds between probes while connected.
+        failure_interval (float): Seconds between probes while disconnected.
+        last_probe_ms (float): Duration of the last probe.
+    """
+
+    @Logger.log_function
+    def __init__(
+        self,
+        session: requests.Session,
+        url: str = "https://www.google.com/",
+        timeout: float = 2,
+        interval: float = 30,
+        failure_interval: float = 5,
+    ) -> None:
+        """Constructs ConnectivityMonitor, the state is unknown (reported as connected) until the first probe ends.
+
+        Args:
+            See Attributes section in class docstring
+        """
+        self.session = session
+        self.url = url
+        self.timeout = timeout
+        self.interval = interval
+        self.failure_interval = failure_interval
+        self.last_probe_ms = 0.0
+
+        self._connected = True
+        self._refresh = threading.Event()
+        self._thread = None
+
+    @property
+    def connected(self) -> bool:
+        """The cached connectivity state."""
+        return self._connected
+
+    @Logger.log_function
+    def start(self) -> None:
+        """Start probing in a background thread."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    @Logger.log_function
+    def refresh(self) -> None:
+        """Probe as soon as possible, to be called when a request failed."""
+        self._refresh.set()
+
+    @Logger.log_function
+    def warm_up(self, url: str) -> None:
+        """Open a connection to a host in the background, so the next request to it reuses an established connection.
+
+        Args:
+            url (str): Url on the host to connect to.
+        """
+        threading.Thread(target=self._warm_up, args=(url,), daemon=True).start()
+
+    def probe(self) -> bool:
+        """Probe the connectivity now, updating the cached state.
+
+        Returns:
+            bool: If the probe succeeded.
+        """
+        start = time.monotonic()
+        try:
+            self.session.head(self.url, timeout=self.timeout)
+            connected = True
+        except requests.RequestException:
+            connected = False
+        self.last_probe_ms = (time.monotonic() - start) * 1000
+
+        if connected != self._connected:
+            logging.info(f"Internet connectivity changed - connected: {connected}")
+        self._connected = connected
+        return connected
+
+    def _warm_up(self, url: str) -> None:
+        try:
+            self.session.head(url, timeout=self.timeout)
+        except requests.RequestException as ex:
+            logging.info(f"Connection warm up to {url} failed - {ex}")
+            self.refresh()
+
+    def _run(self) -> None:
+        while True:
+            self._refresh.clear()
+            connected = self.probe()
+            self._refresh.wait(self.interval if connected else self.failure_interval)
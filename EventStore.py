@@ -0,0 +1,465 @@
+#!/usr/bin/env python3
+import sys
+import json
+import time
+import queue
+import logging
+import sqlite3
+import argparse
+import threading
+import configparser
+from typing import Any, Dict, List, Optional
+
+from . import Logger, Tracing
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS turns (
+    id INTEGER PRIMARY KEY,
+    time REAL NOT NULL,
+    session TEXT,
+    station TEXT,
+    letter TEXT,
+    result TEXT,
+    transcript TEXT,
+    recognized_letter TEXT,
+    backend TEXT,
+    confidence REAL,
+    lives INTEGER,
+    score INTEGER,
+    duration_ms REAL,
+    stages TEXT,
+    recording TEXT
+);
+CREATE INDEX IF NOT EXISTS turns_time ON turns (time);
+CREATE INDEX IF NOT EXISTS turns_letter_time ON turns (letter, time);
+CREATE TABLE IF NOT EXISTS letter_days (
+    day TEXT NOT NULL,
+    letter TEXT NOT NULL,
+    turns INTEGER NOT NULL,
+    hits INTEGER NOT NULL,
+    misses INTEGER NOT NULL,
+    errors INTEGER NOT NULL,
+    duration_ms_total REAL NOT NULL,
+    PRIMARY KEY (day, letter)
+);
+"""
+
+# Queued by the worker itself, when a batch waited commit_interval seconds
+_INTERVAL = ("interval",)
+
+# Columns of the turns table written by the store, in insert order
+_COLUMNS = (
+    "time",
+    "session",
+    "station",
+    "letter",
+    "result",
+    "transcript",
+    "recognized_letter",
+    "backend",
+    "confidence",
+    "lives",
+    "score",
+    "duration_ms",
+    "stages",
+    "recording",
+)
+
+
+def connect(path: str) -> sqlite3.Connection:
+    """Open an event store database, creating its tables. The database is in WAL mode, so it can be queried while the game writes it.
+
+    Args:
+        path (str): The database file.
+
+    Returns:
+        sqlite3.Connection: The connection, usable only by the calling thread.
+    """
+    connection = sqlite3.connect(path)
+    connection.row_factory = sqlite3.Row
+    connection.execute("PRAGMA journal_mode=WAL")
+    # A commit reaches the WAL file, the database file is synced on checkpoints only
+    connection.execute("PRAGMA synchronous=NORMAL")
+    connection.executescript(_SCHEMA)
+    return connection
+
+
+class EventStore:
+    """Records a structured event per game turn in a SQLite database - letter, result, transcript, lives, stage timings and the archived record.
+
+    Callers only enqueue, a worker thread owns the database and commits the turns in batches - every commit_interval seconds or
+    commit_batch turns, so the SD card is written once per batch instead of on every turn. Turns older than keep_days are rolled up
+    into per-day per-letter totals (see compact) once a day. While the store is disabled, record returns immediately.
+
+    Attributes:
+        enabled (bool): Turns are recorded.
+        path (str): The database file.
+        written (int): Turns committed.
+        batches (int): Commits.
+        dropped (int): Turns dropped because the queue was full, or the commit failed.
+    """
+
+    def __init__(self) -> None:
+        self.enabled = False
+        self.path = ""
+        self.written = 0
+        self.batches = 0
+        self.dropped = 0
+        self._commit_interval = 30.0
+        self._commit_batch = 50
+        self._keep_days = 90.0
+        self._queue = None
+        self._thread = None
+
+    @Logger.log_function
+    def configure(self, config_event_store_section: configparser.SectionProxy) -> None:
+        """Apply the [Event Store] config section, opening the database and starting the worker thread.
+
+        Args:
+            config_event_store_section (configparser.SectionProxy): enabled, database, commit_interval, commit_batch, keep_days and max_queue.
+        """
+        self.close()
+        self.enabled = config_event_store_section.getboolean("enabled", True)
+        if not self.enabled:
+            return
+        self.path = config_event_store_section.get("database", "events.db")
+        self._commit_interval = config_event_store_section.getfloat("commit_interval", 30)
+        self._commit_batch = config_event_store_section.getint("commit_batch", 50)
+        self._keep_days = config_event_store_section.getfloat("keep_days", 90)
+        self._queue = queue.Queue(config_event_store_section.getint("max_queue", 1024))
+
+        opened = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(opened,), name="event-store", daemon=True)
+        self._thread.start()
+        opened.wait()
+
+    def record(self, **event: Any) -> None:
+        """Enqueue a turn event, never blocks.
+
+        Args:
+            event: The turn columns - time (unix time of the turn start, defaults to now), session, station, letter, result, transcript,
+                recognized_letter, backend, confidence, lives, score, duration_ms, stages (stage name -> milliseconds) and recording (archived record path).
+        """
+        if not self.enabled:
+            return
+        event.setdefault("time", time.time())
+        if event.get("stages") is not None:
+            event["stages"] = json.dumps(event["stages"])
+        try:
+            self._queue.put_nowait(tuple(event.get(column) for column in _COLUMNS))
+        except queue.Full:
+            self.dropped += 1
+            logging.warning("Event store queue is full, dropping a turn")
+
+    def flush(self, timeout: Optional[float] = None) -> None:
+        """Commit the enqueued turns now, and wait for the commit.
+
+        Args:
+            timeout (Optional[float], optional): Seconds to wait, None for no limit. Defaults to None.
+        """
+        if not self.enabled:
+            return
+        done = threading.Event()
+        self._queue.put(done)
+        done.wait(timeout)
+
+    def compact(self, timeout: Optional[float] = None) -> None:
+        """Roll up the turns older than keep_days now, and wait for the compaction (it also runs once a day).
+
+        Args:
+            timeout (Optional[float], optional): Seconds to wait, None for no limit. Defaults to None.
+        """
+        if not self.enabled:
+            return
+        done = threading.Event()
+        self._queue.put(("compact", done))
+        done.wait(timeout)
+
+    def stats(self) -> Dict[str, int]:
+        """Returns the store counters - turns written, commits, turns dropped and turns waiting to be committed."""
+        return {
+            "written": self.written,
+            "batches": self.batches,
+            "dropped": self.dropped,
+            "queued": self._queue.qsize() if self._queue else 0,
+        }
+
+    @Logger.log_function
+    def close(self, timeout: float = 5.0) -> None:
+        """Commit the enqueued turns and close the database.
+
+        Args:
+            timeout (float, optional): Seconds to wait for the worker thread. Defaults to 5.
+        """
+        if self._thread is None:
+            return
+        self._queue.put(None)
+        self._thread.join(timeout)
+        self._thread = None
+        self.enabled = False
+
+    def _run(self, opened: threading.Event) -> None:
+        """The worker thread - batches the enqueued turns into commits, and compacts the database once a day."""
+        try:
+            connection = connect(self.path)
+        except sqlite3.Error as ex:
+            logging.error(f"Cannot open the event store {self.path} - {ex}")
+            self.enabled = False
+            opened.set()
+            return
+        opened.set()
+
+        batch = []
+        waiters = []
+        batch_deadline = None
+        next_compaction = time.monotonic()
+        closing = False
+        while not closing:
+            timeout = None if batch_deadline is None else max(0.0, batch_deadline - time.monotonic())
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = _INTERVAL
+            if item is None:
+                closing = True
+            elif item is _INTERVAL:
+                # The batch waited commit_interval seconds
+                pass
+            elif isinstance(item, threading.Event):
+                waiters.append(item)
+            elif item[0] == "compact":
+                waiters.append(item[1])
+                next_compaction = time.monotonic()
+            else:
+                batch.append(item)
+                if batch_deadline is None:
+                    batch_deadline = time.monotonic() + self._commit_interval
+                if len(batch) < self._commit_batch:
+                    continue
+
+            self._commit(connection, batch)
+            batch = []
+            batch_deadline = None
+            if self._keep_days and time.monotonic() >= next_compaction:
+                next_compaction = time.monotonic() + 24 * 60 * 60
+                try:
+                    logging.info(f"Event store compaction: {compact(connection, self._keep_days)}")
+                except sqlite3.Error as ex:
+                    logging.error(f"Event store compaction failed - {ex}")
+            for waiter in waiters:
+                waiter.set()
+            waiters = []
+        connection.close()
+
+    def _commit(self, connection: sqlite3.Connection, batch: List[tuple]) -> None:
+        """Insert a batch of turns in a single transaction."""
+        if not batch:
+            return
+        try:
+            with connection:
+                connection.executemany(
+                    f"INSERT INTO turns ({', '.join(_COLUMNS)}) VALUES ({', '.join('?' * len(_COLUMNS))})",
+                    batch,
+                )
+        except sqlite3.Error as ex:
+            self.dropped += len(batch)
+            logging.error(f"Cannot commit {len(batch)} turns to the event store - {ex}")
+            return
+        self.written += len(batch)
+        self.batches += 1
+
+
+# The event store of the game, configured by main
+store = EventStore()
+
+
+def compact(connection: sqlite3.Connection, keep_days: float) -> Dict[str, int]:
+    """Roll up the turns older than keep_days into per-day per-letter totals (letter_days), delete them and reclaim their space.
+
+    Args:
+        connection (sqlite3.Connection): The event store database.
+        keep_days (float): Days of turns kept in full.
+
+    Returns:
+        Dict[str, int]: rolled_up - turns rolled up and deleted.
+    """
+    cutoff = time.time() - keep_days * 24 * 60 * 60
+    with connection:
+        days = connection.execute(
+            """
+            SELECT date(time, 'unixepoch', 'localtime'), COALESCE(letter, '?'), COUNT(*),
+                   SUM(result = 'hit'), SUM(result = 'miss'), SUM(result NOT IN ('hit', 'miss')), COALESCE(SUM(duration_ms), 0)
+            FROM turns WHERE time < ?
+            GROUP BY 1, 2
+            """,
+            (cutoff,),
+        ).fetchall()
+        # Added to the day totals rolled up before - without an upsert, it needs SQLite 3.24
+        connection.executemany(
+            "INSERT OR IGNORE INTO letter_days (day, letter, turns, hits, misses, errors, duration_ms_total) VALUES (?, ?, 0, 0, 0, 0, 0)",
+            [(day, letter) for day, letter, *_ in days],
+        )
+        connection.executemany(
+            """
+            UPDATE letter_days SET turns = turns + ?, hits = hits + ?, misses = misses + ?, errors = errors + ?,
+                duration_ms_total = duration_ms_total + ?
+            WHERE day = ? AND letter = ?
+            """,
+            [(turns, hits, misses, errors, duration_ms, day, letter) for day, letter, turns, hits, misses, errors, duration_ms in days],
+        )
+        rolled_up = connection.execute("DELETE FROM turns WHERE time < ?", (cutoff,)).rowcount
+    if rolled_up:
+        connection.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        connection.execute("VACUUM")
+    return {"rolled_up": rolled_up}
+
+
+def _accuracy(hits: int, misses: int) -> Optional[float]:
+    """Returns the share of the answered turns which were hits, None without answered turns."""
+    return round(hits / (hits + misses), 4) if hits + misses else None
+
+
+def letter_stats(connection: sqlite3.Connection, since: Optional[float] = None) -> Dict[str, Dict[str, Any]]:
+    """Returns the accuracy and turn latency of every letter.
+
+    Args:
+        connection (sqlite3.Connection): The event store database.
+        since (Optional[float], optional): Unix time, only turns since then. Defaults to all the turns, including the rolled up ones.
+
+    Returns:
+        Dict[str, Dict[str, Any]]: letter -> turns, hits, misses, errors, accuracy (hits of the answered turns), mean_ms,
+            and p50_ms / p95_ms of the turns which weren't rolled up.
+    """
+    letters = {}
+    durations = {}
+    for row in connection.execute(
+        "SELECT COALESCE(letter, '?') AS letter, result, duration_ms FROM turns WHERE time >= ?", (since or 0,)
+    ):
+        stats = letters.setdefault(row["letter"], {"turns": 0, "hits": 0, "misses": 0, "errors": 0, "total_ms": 0.0})
+        stats["turns"] += 1
+        stats["hits"] += row["result"] == "hit"
+        stats["misses"] += row["result"] == "miss"
+        stats["errors"] += row["result"] not in ("hit", "miss")
+        if row["duration_ms"] is not None:
+            stats["total_ms"] += row["duration_ms"]
+            durations.setdefault(row["letter"], []).append(row["duration_ms"])
+    if since is None:
+        for row in connection.execute(
+            "SELECT letter, SUM(turns), SUM(hits), SUM(misses), SUM(errors), SUM(duration_ms_total) FROM letter_days GROUP BY letter"
+        ):
+            stats = letters.setdefault(row[0], {"turns": 0, "hits": 0, "misses": 0, "errors": 0, "total_ms": 0.0})
+            for key, value in zip(("turns", "hits", "misses", "errors", "total_ms"), row[1:]):
+                stats[key] += value
+
+    result = {}
+    for letter, stats in sorted(letters.items()):
+        values = sorted(durations.get(letter, []))
+        result[letter] = {
+            "turns": stats["turns"],
+            "hits": stats["hits"],
+            "misses": stats["misses"],
+            "errors": stats["errors"],
+            "accuracy": _accuracy(stats["hits"], stats["misses"]),
+            "mean_ms": round(stats["total_ms"] / stats["turns"], 1) if stats["turns"] else None,
+            "p50_ms": round(Tracing.percentile(values, 50), 1) if values else None,
+            "p95_ms": round(Tracing.percentile(values, 95), 1) if values else None,
+        }
+    return result
+
+
+def daily_stats(
+    connection: sqlite3.Connection, letter: Optional[str] = None, since: Optional[float] = None
+) -> List[Dict[str, Any]]:
+    """Returns the accuracy and mean turn latency of every day, to follow the progress over time.
+
+    Args:
+        connection (sqlite3.Connection): The event store database.
+        letter (Optional[str], optional): Only turns of this letter. Defaults to all the letters.
+        since (Optional[float], optional): Unix time, only days since then. Defaults to all the days.
+
+    Returns:
+        List[Dict[str, Any]]: day (local YYYY-MM-DD), turns, hits, misses, errors, accuracy and mean_ms of every day, oldest first.
+    """
+    days = {}
+    queries = (
+        (
+            "SELECT date(time, 'unixepoch', 'localtime'), COUNT(*), SUM(result = 'hit'), SUM(result = 'miss'),"
+            " SUM(result NOT IN ('hit', 'miss')), COALESCE(SUM(duration_ms), 0)"
+            " FROM turns WHERE time >= ? AND (? IS NULL OR letter = ?) GROUP BY 1"
+        ),
+        (
+            "SELECT day, SUM(turns), SUM(hits), SUM(misses), SUM(errors), SUM(duration_ms_total)"
+            " FROM letter_days WHERE day >= date(?, 'unixepoch', 'localtime') AND (? IS NULL OR letter = ?) GROUP BY day"
+        ),
+    )
+    for query in queries:
+        for day, turns, hits, misses, errors, total_ms in connection.execute(query, (since or 0, letter, letter)):
+            stats = days.setdefault(day, [0, 0, 0, 0, 0.0])
+            for index, value in enumerate((turns, hits, misses, errors, total_ms)):
+                stats[index] += value or 0
+    return [
+        {
+            "day": day,
+            "turns": turns,
+            "hits": hits,
+            "misses": misses,
+            "errors": errors,
+            "accuracy": _accuracy(hits, misses),
+            "mean_ms": round(total_ms / turns, 1) if turns else None,
+        }
+        for day, (turns, hits, misses, errors, total_ms) in sorted(days.items())
+    ]
+
+
+def report(connection: sqlite3.Connection, since: Optional[float] = None, letter: Optional[str] = None, out=sys.stdout) -> None:
+    """Print the accuracy and latency per letter, and per day.
+
+    Args:
+        connection (sqlite3.Connection): The event store database.
+        since (Optional[float], optional): Unix time, only turns since then. Defaults to all the turns.
+        letter (Optional[str], optional): Only this letter in the daily table. Defaults to all the letters.
+        out (optional): Output stream. Defaults to sys.stdout.
+    """
+    letters = letter_stats(connection, since)
+    days = daily_stats(connection, letter, since)
+    print(f"{sum(stats['turns'] for stats in letters.values())} turns, {len(days)} days", file=out)
+
+    def cell(value: Any) -> str:
+        return "-" if value is None else f"{value:.2f}" if isinstance(value, float) else str(value)
+
+    for title, rows in (
+        ("letter", [dict(stats, letter=name) for name, stats in letters.items()]),
+        ("day", days),
+    ):
+        columns = [title, "turns", "hits", "misses", "errors", "accuracy", "mean_ms"] + (
+            ["p50_ms", "p95_ms"] if title == "letter" else []
+        )
+        width = max([len(title)] + [len(row[title]) for row in rows])
+        print("\n" + " ".join(f"{column:>{width if index == 0 else 9}}" for index, column in enumerate(columns)), file=out)
+        for row in rows:
+            print(
+                " ".join(f"{cell(row[column]):>{width if index == 0 else 9}}" for index, column in enumerate(columns)),
+                file=out,
+            )
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Event store report CLI - python -m AlephPi.EventStore events.db [--days N] [--letter LETTER] [--compact KEEP_DAYS]"""
+    parser = argparse.ArgumentParser(description="Print the accuracy and turn latency per letter and per day.")
+    parser.add_argument("database", nargs="?", default="events.db", help="The event store database.")
+    parser.add_argument("--days", type=float, help="Only the last days, default all the turns.")
+    parser.add_argument("--letter", help="Only this letter in the daily table.")
+    parser.add_argument("--compact", type=float, metavar="KEEP_DAYS", help="Roll up the turns older than KEEP_DAYS first.")
+    args = parser.parse_args(argv)
+
+    connection = connect(args.database)
+    try:
+        if args.compact is not None:
+            print(f"Compaction: {compact(connection, args.compact)}")
+        report(connection, time.time() - args.days * 24 * 60 * 60 if args.days else None, args.letter)
+    finally:
+        connection.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+import time
+import logging
+import threading
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Dict, List, Optional
+
+import speech_recognition as sr
+
+from . import Logger, RecognitionIndex, RecognizerBackend, Tracing
+
+
+class _BackendStats:
+    """Counters of a single hedged backend."""
+
+    __slots__ = ("requests", "wins", "failures", "unconfident", "cancelled", "late", "saved_ms", "latencies_ms")
+
+    def __init__(self) -> None:
+        self.requests = 0
+        self.wins = 0
+        self.failures = 0
+        self.unconfident = 0
+        self.cancelled = 0
+        self.late = 0
+        self.saved_ms = 0.0
+        self.latencies_ms = deque(maxlen=200)
+
+
+class HedgedBackend(RecognizerBackend.RecognizerBackend):
+    """Sends a record to several backends and returns the first result which maps to a letter confidently.
+
+    The first backend is requested right away, every other backend delay seconds after the previous one (0 - all at once),
+    or as soon as all the requested backends failed or returned unconfident results. Once a result wins, backends which didn't start
+    are cancelled and the running ones are abandoned - their results are only counted in the stats.
+    When no result is confident, the most confident one is returned after all the backends answered.
+
+    Listing the same backend twice hedges it with a second request after the delay.
+
+    Attributes:
+        backends (List[RecognizerBackend]): The backends, in request order. The first is the primary backend.
+        recognition_index (RecognitionIndex): Maps the transcripts to letters, to score the results confidence.
+        delay (float): Seconds between requesting a backend and requesting the next one.
+        min_confidence (float): Results scoring at least this confidence win right away.
+        last_report (Dict[str, Any]): The winner, elapsed_ms and the outcome of every backend in the last recognition.
+    """
+
+    @Logger.log_function
+    def __init__(
+        self,
+        backends: List[RecognizerBackend.RecognizerBackend],
+        recognition_index: RecognitionIndex.RecognitionIndex,
+        delay: float = 0.8,
+        min_confidence: float = 0.5,
+    ) -> None:
+        """Constructs HedgedBackend.
+
+        Args:
+            See Attributes section in class docstring
+
+        Raises:
+            ValueError: In case no backend was given.
+        """
+        if not backends:
+            raise ValueError("Hedged recognition requires at least one backend")
+        self.backends = backends
+        self.recognition_index = recognition_index
+        self.delay = delay
+        self.min_confidence = min_confidence
+        self.last_report = {}
+
+        # Stats keys - the backend names, numbered when a backend is listed twice
+        self._keys = []
+        counts = {}
+        for backend in backends:
+            counts[backend.name] = counts.get(backend.name, 0) + 1
+            self._keys.append(backend.name if counts[backend.name] == 1 else f"{backend.name}#{counts[backend.name]}")
+        self.name = "+".join(self._keys)
+        # Offline backends still answer when the internet is down
+        self.requires_internet = all(backend.requires_internet for backend in backends)
+
+        self._turns = 0
+        self._stats = {key: _BackendStats() for key in self._keys}
+        self._lock = threading.Lock()
+        # Abandoned requests keep their threads until they end, so a slow backend can't hold the next recognition
+        self._executor = ThreadPoolExecutor(max_workers=2 * len(backends), thread_name_prefix="hedge")
+
+    def confidence(self, result: RecognizerBackend.RecognitionResult) -> float:
+        """Score how confidently a result maps to a letter.
+
+        Args:
+            result (RecognitionResult): A backend result.
+
+        Returns:
+            float: The letter confidence - the backend confidence for backends which recognize letters directly,
+            otherwise the recognition options match score of the alternatives. 0 when no letter matched.
+        """
+        if result.letter:
+            return result.confidence
+        match = self.recognition_index.match(result.alternatives)
+        return match.score if match else 0.0
+
+    def recognize(self, audio_data: sr.AudioData) -> RecognizerBackend.RecognitionResult:
+        start = time.monotonic()
+        # Requests are traced in the turn of the calling station
+        tracer = Tracing.active()
+        pending = {}
+        outcomes = {}
+        candidates = []
+        errors = []
+        winner = None
+        started = 0
+
+        while winner is None:
+            # Request the next backends when their time came, or when nothing is running anymore
+            while started < len(self.backends) and (
+                not pending or time.monotonic() - start >= started * self.delay
+            ):
+                pending[self._executor.submit(self._request, started, audio_data, tracer)] = started
+                outcomes[self._keys[started]] = "running"
+                started += 1
+            if not pending:
+                break
+
+            timeout = None
+            if started < len(self.backends):
+                timeout = max(0.0, start + started * self.delay - time.monotonic())
+            done, _ = wait(pending, timeout, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                index = pending.pop(future)
+                key = self._keys[index]
+                try:
+                    result, finished = future.result()
+                    score = self.confidence(result)
+                except Exception as ex:
+                    # Any other exception of a backend is a failure as well, the other backends keep racing
+                    if not isinstance(ex, (sr.RequestError, sr.UnknownValueError)):
+                        logging.warning(f"Hedged backend {key} failed - {ex!r}")
+                    errors.append(ex)
+                    outcomes[key] = type(ex).__name__
+                    with self._lock:
+                        self._stats[key].failures += 1
+                    continue
+
+                outcomes[key] = f"{score:.2f}"
+                if score >= self.min_confidence and winner is None:
+                    winner = (score, index, result, finished)
+                else:
+                    candidates.append((score, index, result, finished))
+                    with self._lock:
+                        self._stats[key].unconfident += 1
+
+        if winner is None and candidates:
+            winner = max(candidates, key=lambda candidate: candidate[0])
+
+        with self._lock:
+            self._turns += 1
+            if winner:
+                self._stats[self._keys[winner[1]]].wins += 1
+            # Backends whose time didn't come aren't requested at all
+            for key in self._keys[started:]:
+                self._stats[key].cancelled += 1
+                outcomes[key] = "cancelled"
+        for future, index in pending.items():
+            self._abandon(future, index, winner)
+
+        self.last_report = {
+            "winner": self._keys[winner[1]] if winner else None,
+            "elapsed_ms": round((time.monotonic() - start) * 1000, 3),
+            "backends": outcomes,
+        }
+        if winner:
+            return winner[2]
+        if any(not isinstance(error, sr.UnknownValueError) for error in errors):
+            raise sr.RequestError(f"All hedged backends failed - {errors}")
+        raise sr.UnknownValueError()
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Returns the counters of every backend - requests, wins, win_rate, failures, unconfident results, cancelled (never started) and late (abandoned while running) requests,
+        latency percentiles, and saved_ms - the total time its wins saved over waiting for the primary backend (measured when the primary answered later)."""
+        with self._lock:
+            report = {}
+            for key, stats in self._stats.items():
+                latencies = sorted(stats.latencies_ms)
+                report[key] = {
+                    "requests": stats.requests,
+                    "wins": stats.wins,
+                    "win_rate": round(stats.wins / self._turns, 4) if self._turns else 0.0,
+                    "failures": stats.failures,
+                    "unconfident": stats.unconfident,
+                    "cancelled": stats.cancelled,
+                    "late": stats.late,
+                    "latency_ms_p50": round(Tracing.percentile(latencies, 50), 3) if latencies else None,
+                    "latency_ms_p95": round(Tracing.percentile(latencies, 95), 3) if latencies else None,
+                    "saved_ms": round(stats.saved_ms, 3),
+                }
+            return report
+
+    def _request(self, index: int, audio_data: sr.AudioData, tracer: Tracing.Tracer):
+        """Recognize with a single backend, runs on the executor. Returns the result and the time.monotonic() it was returned."""
+        key = self._keys[index]
+        with self._lock:
+            self._stats[key].requests += 1
+        start = time.monotonic()
+        with tracer.span(f"recognize:{key}"):
+            result = self.backends[index].recognize(audio_data)
+        finished = time.monotonic()
+        with self._lock:
+            self._stats[key].latencies_ms.append((finished - start) * 1000)
+        return result, finished
+
+    def _abandon(self, future: Future, index: int, winner: Optional[tuple]) -> None:
+        """Cancel a request which lost the race, or count it as late when it's already running."""
+        key = self._keys[index]
+        if future.cancel():
+            with self._lock:
+                self._stats[key].cancelled += 1
+            return
+        with self._lock:
+            self._stats[key].late += 1
+        if index != 0 or winner is None:
+            return
+
+        # The primary answered after the winner - the win saved the difference
+        winner_key = self._keys[winner[1]]
+        winner_finished = winner[3]
+
+        def primary_done(primary: Future) -> None:
+            if primary.cancelled() or primary.exception() is not None:
+                return
+            _, finished = primary.result()
+            with self._lock:
+                self._stats[winner_key].saved_ms += max(0.0, finished - winner_finished) * 1000
+
+        future.add_done_callback(primary_done)
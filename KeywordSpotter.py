@@ -0,0 +1,314 @@
+import os
+import re
+import glob
+import wave
+import logging
+from typing import Dict, List, Tuple
+
+import numpy as np
+import speech_recognition as sr
+
+from . import AudioBuffer, Logger, RecognizerBackend
+
+# Recordings archived by SpeechRecognition.save_record are named *_expected_<letter>.<flac / wav>
+_RECORD_LETTER_PATTERN = re.compile(r"_expected_([a-z]+)\.(?:flac|wav)$")
+
+
+class MfccExtractor:
+    """Vectorized MFCC features extraction.
+
+    Frames are defined in seconds and the mel filterbank covers a fixed frequency band, so features of audio sampled at different rates are comparable without resampling.
+    Filterbanks and DCT matrices are computed once per sample rate.
+
+    Attributes:
+        dither (float): Std of the deterministic white noise added to the samples, relative to their RMS - keeps near silent bands from dominating the features, so clean templates match noisy records.
+        mel_floor (float): Mel energies are floored to this ratio of the loudest band energy of their frame, before the log.
+    """
+
+    def __init__(
+        self,
+        frame_seconds: float = 0.025,
+        hop_seconds: float = 0.01,
+        mel_filters: int = 26,
+        coefficients: int = 13,
+        low_hz: float = 60.0,
+        high_hz: float = 7600.0,
+        silence_db: float = 35.0,
+        dither: float = 0.03,
+        mel_floor: float = 1e-8,
+    ) -> None:
+        self.frame_seconds = frame_seconds
+        self.hop_seconds = hop_seconds
+        self.mel_filters = mel_filters
+        self.coefficients = coefficients
+        self.low_hz = low_hz
+        self.high_hz = high_hz
+        self.silence_db = silence_db
+        self.dither = dither
+        self.mel_floor = mel_floor
+        self._filterbanks = {}
+        self._dct = self._dct_matrix(mel_filters, coefficients)
+
+    def features(self, samples: np.ndarray, sample_rate: int) -> np.ndarray:
+        """Extract MFCC features from mono samples, dropping the silent frames.
+
+        Args:
+            samples (np.ndarray): Mono samples.
+            sample_rate (int): Sample rate of the samples.
+
+        Returns:
+            np.ndarray: (frames, coefficients - 1) array, mean normalized. The energy coefficient (c0) is dropped.
+        """
+        frame_length = int(round(self.frame_seconds * sample_rate))
+        hop_length = int(round(self.hop_seconds * sample_rate))
+        samples = samples.astype(np.float32)
+        if self.dither:
+            # Seeded, so the features of a recording are reproducible
+            rms = np.sqrt(np.mean(samples.astype(np.float64) ** 2))
+            noise = np.random.RandomState(0).normal(0, rms * self.dither, len(samples))
+            samples = samples + noise.astype(np.float32)
+        if len(samples) < frame_length:
+            samples = np.pad(samples, (0, frame_length - len(samples)))
+
+        # Pre-emphasis, then split to overlapping frames without copying
+        emphasized = np.append(samples[0], samples[1:] - 0.97 * samples[:-1])
+        frames_count = 1 + (len(emphasized) - frame_length) // hop_length
+        frames = np.lib.stride_tricks.as_strided(
+            emphasized,
+            shape=(frames_count, frame_length),
+            strides=(emphasized.strides[0] * hop_length, emphasized.strides[0]),
+        )
+
+        # Drop silent frames - everything quieter than silence_db below the loudest frame
+        energy_db = 10 * np.log10(np.mean(frames ** 2, axis=1) + 1e-10)
+        frames = frames[energy_db > energy_db.max() - self.silence_db]
+
+        fft_size = 1 << (frame_length - 1).bit_length()
+        spectrum = np.abs(np.fft.rfft(frames * np.hamming(frame_length), fft_size)) ** 2
+        mel_energies = spectrum @ self._filterbank(sample_rate, fft_size).T
+        mel_energies = np.maximum(mel_energies, mel_energies.max(axis=-1, keepdims=True) * self.mel_floor)
+        mfcc = np.log(mel_energies + 1e-10) @ self._dct.T
+        mfcc = mfcc[:, 1:]
+        return mfcc - mfcc.mean(axis=0)
+
+    def _filterbank(self, sample_rate: int, fft_size: int) -> np.ndarray:
+        key = (sample_rate, fft_size)
+        if key not in self._filterbanks:
+            high_hz = min(self.high_hz, sample_rate / 2)
+            mel_points = np.linspace(
+                self._hz_to_mel(self.low_hz),
+                self._hz_to_mel(high_hz),
+                self.mel_filters + 2,
+            )
+            bins = np.floor((fft_size + 1) * self._mel_to_hz(mel_points) / sample_rate).astype(int)
+            fft_bins = np.arange(fft_size // 2 + 1)
+            left, center, right = bins[:-2, None], bins[1:-1, None], bins[2:, None]
+            rising = (fft_bins - left) / np.maximum(center - left, 1)
+            falling = (right - fft_bins) / np.maximum(right - center, 1)
+            self._filterbanks[key] = np.clip(np.minimum(rising, falling), 0, None)
+        return self._filterbanks[key]
+
+    @staticmethod
+    def _dct_matrix(inputs: int, outputs: int) -> np.ndarray:
+        n = np.arange(inputs)
+        k = np.arange(outputs)[:, None]
+        return np.cos(np.pi * k * (2 * n + 1) / (2 * inputs))
+
+    @staticmethod
+    def _hz_to_mel(hz):
+        return 2595 * np.log10(1 + hz / 700.0)
+
+    @staticmethod
+    def _mel_to_hz(mel):
+        return 700 * (10 ** (mel / 2595.0) - 1)
+
+
+def dtw_distance(a: np.ndarray, b: np.ndarray) -> float:
+    """Dynamic time warping distance between 2 features sequences.
+    The cost matrix is computed in one vectorized operation, and the accumulated costs are computed one anti-diagonal at a time (every cell of an anti-diagonal depends only on the 2 previous ones).
+
+    Args:
+        a (np.ndarray): (n, features) sequence.
+        b (np.ndarray): (m, features) sequence.
+
+    Returns:
+        float: The accumulated distance of the best alignment, normalized by the sequences length.
+    """
+    n, m = len(a), len(b)
+    cost = np.sqrt(((a[:, None, :] - b[None, :, :]) ** 2).sum(axis=2))
+
+    accumulated = np.full((n + 1, m + 1), np.inf)
+    accumulated[0, 0] = 0
+    for diagonal in range(2, n + m + 1):
+        i = np.arange(max(1, diagonal - m), min(n, diagonal - 1) + 1)
+        j = diagonal - i
+        accumulated[i, j] = cost[i - 1, j - 1] + np.minimum(
+            np.minimum(accumulated[i - 1, j - 1], accumulated[i - 1, j]),
+            accumulated[i, j - 1],
+        )
+    return float(accumulated[n, m] / (n + m))
+
+
+def audio_data_samples(audio_data: sr.AudioData) -> Tuple[np.ndarray, int]:
+    """Returns the mono 16 bit samples of a recording, a view of the record - the features extraction converts them to float once.
+
+    Args:
+        audio_data (sr.AudioData): The recording.
+
+    Returns:
+        Tuple[np.ndarray, int]: The samples and their sample rate.
+    """
+    return AudioBuffer.as_samples(audio_data, "keyword_spotting"), audio_data.sample_rate
+
+
+def load_audio_file(filepath: str) -> Tuple[np.ndarray, int]:
+    """Decode a WAV / FLAC / MP3 file to mono float samples.
+
+    Args:
+        filepath (str): Path to the audio file.
+
+    Returns:
+        Tuple[np.ndarray, int]: The samples and their sample rate.
+    """
+    if filepath.endswith(".wav"):
+        with wave.open(filepath, "rb") as wav_file:
+            if wav_file.getsampwidth() != 2:
+                raise ValueError(f"Only 16 bit WAV files are supported - {filepath}")
+            channels = wav_file.getnchannels()
+            samples = np.frombuffer(wav_file.readframes(wav_file.getnframes()), dtype=np.int16)
+            sample_rate = wav_file.getframerate()
+    elif filepath.endswith(".flac"):
+        # Archived records, decoded by libsndfile
+        import soundfile
+
+        samples, sample_rate = soundfile.read(filepath, dtype="int16", always_2d=True)
+        channels = samples.shape[1]
+        samples = samples.reshape(-1)
+    else:
+        # MP3 files are decoded by the mixer (must be initialized), to the mixer sample rate
+        from pygame import mixer, sndarray
+
+        sample_rate, _, channels = mixer.get_init()
+        samples = sndarray.array(mixer.Sound(file=filepath)).reshape(-1)
+
+    samples = samples.astype(np.float32)
+    if channels > 1:
+        samples = samples.reshape(-1, channels).mean(axis=1)
+    return samples, sample_rate
+
+
+def template_files(
+    correct_answers_folder: str, recordings_folders: List[str], max_recordings_per_letter: int = 0
+) -> Dict[str, List[str]]:
+    """Collect the reference templates of every letter - the correct answers audio files and the saved recordings.
+
+    Args:
+        correct_answers_folder (str): Folder of <letter>.mp3 files.
+        recordings_folders (List[str]): Folders of saved recordings, named *_expected_<letter>.<flac / wav>.
+        max_recordings_per_letter (int, optional): Only the latest recordings of every letter are collected, the correct answers always are. 0 - all of them. Defaults to 0.
+
+    Returns:
+        Dict[str, List[str]]: key = letter, value = its templates files - the correct answer first.
+    """
+    templates = {}
+    for filepath in sorted(glob.glob(os.path.join(correct_answers_folder, "*.mp3"))):
+        letter = os.path.splitext(os.path.basename(filepath))[0]
+        templates.setdefault(letter, []).append(filepath)
+
+    recordings = {}
+    for folder in recordings_folders:
+        for filepath in glob.glob(os.path.join(folder, "*.flac")) + glob.glob(os.path.join(folder, "*.wav")):
+            match = _RECORD_LETTER_PATTERN.search(filepath)
+            if match:
+                recordings.setdefault(match.group(1), []).append(filepath)
+    for letter, filepaths in recordings.items():
+        # Recordings are named by their archive time, the latest are last
+        filepaths.sort(key=os.path.basename)
+        if max_recordings_per_letter:
+            filepaths = filepaths[-max_recordings_per_letter:]
+        templates.setdefault(letter, []).extend(filepaths)
+    return templates
+
+
+class KeywordSpottingBackend(RecognizerBackend.RecognizerBackend):
+    """Offline recognizer, scoring the record against per-letter reference templates with MFCC features and DTW.
+
+    The letter with the closest template wins, its confidence is its share of a softmax over the letters distances.
+
+    Attributes:
+        templates (Dict[str, List[np.ndarray]]): key = letter, value = features of its templates.
+        min_confidence (float): Results below this confidence are reported as not understood.
+    """
+
+    name = "keyword_spotting"
+    requires_internet = False
+
+    @Logger.log_function
+    def __init__(
+        self,
+        templates_files: Dict[str, List[str]],
+        min_confidence: float = 0.3,
+        temperature: float = 2.0,
+    ) -> None:
+        """Constructs KeywordSpottingBackend, extracting the features of all templates.
+
+        Args:
+            templates_files (Dict[str, List[str]]): key = letter, value = its templates files.
+            min_confidence (float, optional): Results below this confidence are reported as not understood. Defaults to 0.3.
+            temperature (float, optional): Softmax temperature of the confidence, in distance units. Defaults to 2.0.
+
+        Raises:
+            ValueError: In case no template could be loaded.
+        """
+        self.min_confidence = min_confidence
+        self.temperature = temperature
+        self.extractor = MfccExtractor()
+        self.templates = {}
+        for letter, filepaths in templates_files.items():
+            for filepath in filepaths:
+                try:
+                    samples, sample_rate = load_audio_file(filepath)
+                except (ImportError, OSError, RuntimeError, ValueError, EOFError, wave.Error) as ex:
+                    logging.warning(f"Skipping keyword template {filepath} - {ex}")
+                    continue
+                self.templates.setdefault(letter, []).append(
+                    self.extractor.features(samples, sample_rate)
+                )
+
+        if not self.templates:
+            raise ValueError("No keyword spotting templates were loaded")
+
+    def scores(self, features: np.ndarray) -> Dict[str, float]:
+        """Calculates the distance of the record to every letter - the distance to its closest template.
+
+        Args:
+            features (np.ndarray): The record features.
+
+        Returns:
+            Dict[str, float]: key = letter, value = DTW distance.
+        """
+        return {
+            letter: min(dtw_distance(features, template) for template in templates)
+            for letter, templates in self.templates.items()
+        }
+
+    def recognize(self, audio_data: sr.AudioData) -> RecognizerBackend.RecognitionResult:
+        samples, sample_rate = audio_data_samples(audio_data)
+        AudioBuffer.allocations.allocated("keyword_spotting", len(samples) * 4)
+        distances = self.scores(self.extractor.features(samples, sample_rate))
+
+        letters = list(distances.keys())
+        values = np.array([distances[letter] for letter in letters])
+        weights = np.exp(-(values - values.min()) / self.temperature)
+        confidences = weights / weights.sum()
+        ranking = np.argsort(-confidences)
+
+        alternatives = [(letters[i], float(confidences[i])) for i in ranking]
+        best_letter, best_confidence = alternatives[0]
+        if best_confidence < self.min_confidence:
+            raise sr.UnknownValueError(
+                f"Best keyword {best_letter} confidence {best_confidence:.2f} is below {self.min_confidence}"
+            )
+        return RecognizerBackend.RecognitionResult(
+            best_letter, best_letter, best_confidence, alternatives
+        )
@@ -0,0 +1,274 @@
+import time
+import threading
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+from . import Board, Logger
+
+
+class Animation:
+    """A LED pattern compiled into a frame table.
+
+    Every frame is a (mask, duration, tag) tuple - mask has bit N set when pin N should be HIGH, duration is how long the frame is shown (seconds)
+    and tag is an optional value attached to the frame (for example the letter pin lit by the frame).
+
+    Attributes:
+        name (str): The animation name, for logging.
+        pins_mask (int): Mask of all the pins controlled by the animation, other pins are never touched.
+        frames (List[Tuple[int, float, Optional[int]]]): The frame table.
+        loop (bool): Restart from the first frame after the last one, otherwise the last frame is held.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        pins: List[int],
+        frames: List[Tuple[int, float, Optional[int]]],
+        loop: bool = True,
+    ) -> None:
+        if not frames:
+            raise ValueError(f"Animation {name} has no frames")
+        self.name = name
+        self.pins_mask = pins_to_mask(pins)
+        self.frames = frames
+        self.loop = loop
+
+    def __repr__(self) -> str:
+        return f"Animation({self.name}, {len(self.frames)} frames)"
+
+
+def pins_to_mask(pins: List[int]) -> int:
+    """Convert a list of pins to a pins mask.
+
+    Args:
+        pins (List[int]): The pins.
+
+    Returns:
+        int: Mask with bit N set for every pin N.
+    """
+    mask = 0
+    for pin in pins:
+        mask |= 1 << pin
+    return mask
+
+
+def standby_demo(
+    letters_pins: List[int], start_button_led_pin: int, demo_sleep_timeout: float
+) -> Animation:
+    """Compile the standby mode demo - blink all letters 3 times, turn them on one by one and then off one by one. The start button LED is off.
+
+    Args:
+        letters_pins (List[int]): The letters LEDs pins, in order.
+        start_button_led_pin (int): The start button LEDs pin.
+        demo_sleep_timeout (float): Duration of a single step of the demo.
+
+    Returns:
+        Animation: The compiled demo.
+    """
+    all_letters = pins_to_mask(letters_pins)
+    frames = []
+
+    # Demo #1 - Blink all leds 3 times
+    for i in range(0, 3):
+        frames.append((all_letters, demo_sleep_timeout * 2, None))
+        frames.append((0, demo_sleep_timeout, None))
+
+    # Demo #2 - Turn leds on one by one
+    mask = 0
+    for pin in letters_pins:
+        mask |= 1 << pin
+        frames.append((mask, demo_sleep_timeout, pin))
+
+    # Demo #3 - Turn leds off one by one
+    for pin in letters_pins:
+        mask &= ~(1 << pin)
+        frames.append((mask, demo_sleep_timeout, pin))
+
+    return Animation(
+        "standby_demo", list(letters_pins) + [start_button_led_pin], frames
+    )
+
+
+def letter_chase(letters_pins: List[int], blink_sleep_timeout: float) -> Animation:
+    """Compile the letter selection chase - letters are lit one after the other, every frame is tagged with the lit letter pin.
+
+    Args:
+        letters_pins (List[int]): The letters LEDs pins, in order.
+        blink_sleep_timeout (float): Duration each letter is on, and the gap before the next one.
+
+    Returns:
+        Animation: The compiled chase.
+    """
+    frames = []
+    for pin in letters_pins:
+        frames.append((1 << pin, blink_sleep_timeout, pin))
+        frames.append((0, blink_sleep_timeout, pin))
+    return Animation("letter_chase", letters_pins, frames)
+
+
+def blink(pins: List[int], blink_timeout: float) -> Animation:
+    """Compile a blink of a group of LEDs.
+
+    Args:
+        pins (List[int]): The LEDs pins.
+        blink_timeout (float): Duration of the on and off periods.
+
+    Returns:
+        Animation: The compiled blink.
+    """
+    mask = pins_to_mask(pins)
+    return Animation("blink", pins, [(mask, blink_timeout, None), (0, blink_timeout, None)])
+
+
+class LedAnimator:
+    """Plays LED animations from a single timing thread.
+
+    Frames are scheduled on absolute deadlines, so the error of a single sleep doesn't accumulate over the animation like in time.sleep loops.
+    Switching to another animation (or stopping) is atomic - once play / stop returns, no frame of the previous animation will be written.
+    The lateness of every frame relative to its deadline is measured, see jitter_stats.
+    The latest written frames are kept with their write time, so the frame shown at a past moment (for example a button press) is known, see tag_at.
+
+    Attributes:
+        board (Board): The board backend the LEDs are connected to.
+    """
+
+    @Logger.log_function
+    def __init__(self, board: Board.Board, jitter_samples: int = 1000, history_frames: int = 64) -> None:
+        """Constructs LedAnimator and starts its timing thread.
+
+        Args:
+            board (Board): The board backend the LEDs are connected to.
+            jitter_samples (int, optional): Amount of latest frames kept for the jitter statistics. Defaults to 1000.
+            history_frames (int, optional): Amount of latest frames kept for tag_at. Defaults to 64.
+        """
+        self.board = board
+        self._animation = None
+        self._frame_index = 0
+        self._frame_tag = None
+        self._deadline = 0.0
+        # The pins state written by the current animation, None when the pins state is unknown.
+        self._mask = None
+        self._jitter = deque(maxlen=jitter_samples)
+        # (time.monotonic() the frame was written, frame tag), oldest first
+        self._history = deque(maxlen=history_frames)
+        self._condition = threading.Condition()
+        threading.Thread(target=self._run, daemon=True).start()
+
+    @Logger.log_function
+    def play(self, animation: Animation) -> None:
+        """Switch to an animation, its first frame is written right away.
+
+        Args:
+            animation (Animation): The animation to play.
+        """
+        with self._condition:
+            self._animation = animation
+            self._frame_index = 0
+            self._frame_tag = None
+            self._deadline = time.monotonic()
+            # The previous animation frames don't belong to this animation
+            self._history.append((self._deadline, None))
+            # Pins may have been changed outside the animator, the first frame writes all the animation pins.
+            self._mask = None
+            self._condition.notify()
+
+    @Logger.log_function
+    def stop(self) -> Optional[int]:
+        """Stop the current animation, leaving its pins as they are.
+
+        Returns:
+            Optional[int]: The tag of the frame shown when the animation was stopped.
+        """
+        with self._condition:
+            tag = self._frame_tag
+            self._animation = None
+            self._condition.notify()
+            return tag
+
+    @property
+    def current_tag(self) -> Optional[int]:
+        """The tag of the frame currently shown."""
+        with self._condition:
+            return self._frame_tag
+
+    def tag_at(self, timestamp: float) -> Optional[int]:
+        """Returns the tag of the frame shown at a past moment.
+
+        Args:
+            timestamp (float): time.monotonic() timestamp.
+
+        Returns:
+            Optional[int]: The tag of the latest frame written before timestamp, None when the moment is older than the kept frames.
+        """
+        with self._condition:
+            tag = None
+            for written, frame_tag in self._history:
+                if written > timestamp:
+                    break
+                tag = frame_tag
+            return tag
+
+    def jitter_stats(self) -> Dict[str, float]:
+        """Returns the frames lateness statistics, relative to their scheduled deadlines.
+
+        Returns:
+            Dict[str, float]: frames count, mean / p95 / max lateness in milliseconds.
+        """
+        with self._condition:
+            samples = sorted(self._jitter)
+        if not samples:
+            return {"frames": 0, "mean_ms": 0.0, "p95_ms": 0.0, "max_ms": 0.0}
+        return {
+            "frames": len(samples),
+            "mean_ms": sum(samples) / len(samples) * 1000,
+            "p95_ms": samples[min(len(samples) - 1, int(len(samples) * 0.95))] * 1000,
+            "max_ms": samples[-1] * 1000,
+        }
+
+    def _write_frame(self, animation: Animation, mask: int) -> None:
+        """Write the pins which differ from the previous frame, in one batched write. Must be called with the lock held.
+
+        Args:
+            animation (Animation): The playing animation.
+            mask (int): The frame mask.
+        """
+        changed = animation.pins_mask if self._mask is None else (mask ^ self._mask)
+        changed &= animation.pins_mask
+        states = {}
+        pin = 0
+        while changed:
+            if changed & 1:
+                states[pin] = bool(mask & (1 << pin))
+            changed >>= 1
+            pin += 1
+        self.board.output_many(states)
+        self._mask = mask
+
+    def _run(self) -> None:
+        """The timing thread - writes every frame on its deadline, and waits for the next deadline or an animation switch."""
+        with self._condition:
+            while True:
+                animation = self._animation
+                if animation is None:
+                    self._condition.wait()
+                    continue
+
+                now = time.monotonic()
+                if now < self._deadline:
+                    self._condition.wait(self._deadline - now)
+                    continue
+
+                self._jitter.append(now - self._deadline)
+                mask, duration, tag = animation.frames[self._frame_index]
+                self._write_frame(animation, mask)
+                self._frame_tag = tag
+                self._history.append((time.monotonic(), tag))
+                self._deadline += duration
+
+                self._frame_index += 1
+                if self._frame_index == len(animation.frames):
+                    if animation.loop:
+                        self._frame_index = 0
+                    else:
+                        # Hold the last frame
+                        self._animation = None
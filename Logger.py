@@ -1,32 +1,158 @@
+import queue
+import atexit
+import functools
 import logging
-from typing import Callable, Any
+import reprlib
+import configparser
+import logging.handlers
+from typing import Callable, Any, Dict, List, Optional
+
+# Bounded repr of the logged arguments - the game objects are passed to nearly every function
+_repr = reprlib.Repr()
+_repr.maxstring = 80
+_repr.maxother = 80
+
+_logger = logging.getLogger()
+_listener = None
+# Logging state of every decorated function, updated by configure
+_functions = []  # type: List[_FunctionLog]
+_settings = {"enabled": True, "disabled": set(), "sample_every": {}, "default_sample_every": 1}
+
+
+class _LazyArgs:
+    """Formats the arguments of a logged call only when the record is emitted, on the listener thread."""
+
+    __slots__ = ("args", "kwargs")
+
+    def __init__(self, args: tuple, kwargs: dict) -> None:
+        self.args = args
+        self.kwargs = kwargs
+
+    def __str__(self) -> str:
+        return f"{_repr.repr(self.args)} {_repr.repr(self.kwargs)}"
+
+
+class _FunctionLog:
+    """Logging state of a decorated function - checked on every call, so it's kept to a couple of attributes.
+
+    Attributes:
+        name (str): The function qualified name.
+        enabled (bool): Entry / exit of the function are logged.
+        sample_every (int): Only 1 of every sample_every calls is logged.
+    """
+
+    __slots__ = ("name", "enabled", "sample_every", "calls")
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.calls = 0
+        self.update()
+
+    def update(self) -> None:
+        short_name = self.name.rsplit(".", 1)[-1]
+        disabled = _settings["disabled"]
+        self.enabled = _settings["enabled"] and not (self.name in disabled or short_name in disabled)
+        sample_every = _settings["sample_every"]
+        self.sample_every = max(
+            1,
+            sample_every.get(self.name, sample_every.get(short_name, _settings["default_sample_every"])),
+        )
+
+
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    """Queue handler which leaves the formatting to the listener thread, the caller only enqueues the record."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
 
 
 def log_function(func: Callable[..., Any]) -> Callable[..., Any]:
     """A wrapper for logging every function entry, exit and exception.
 
+    The arguments are formatted lazily - not at all when INFO is disabled or the call isn't sampled, and on the listener thread otherwise.
+    Functions can be disabled or sampled through the [Log] config section (see configure). Exceptions are always logged.
+
     Args:
         func (Callable): Function to be called, relevant arguments will be set during the actual function call.
     """
+    state = _FunctionLog(func.__qualname__)
+    _functions.append(state)
 
+    @functools.wraps(func)
     def wrapper(*args, **kwargs):
+        log = False
+        if state.enabled and _logger.isEnabledFor(logging.INFO):
+            state.calls += 1
+            log = state.calls % state.sample_every == 0
         try:
-            logging.info(f"{func.__name__} started with parameters: {args} {kwargs}")
+            if log:
+                _logger.info("%s started with parameters: %s", state.name, _LazyArgs(args, kwargs))
             return func(*args, **kwargs)
         except Exception as ex:
-            logging.exception(ex)
+            _logger.exception(ex)
             raise ex
         finally:
-            logging.info(f"Function {func.__name__} exited")
+            if log:
+                _logger.info("Function %s exited", state.name)
 
     return wrapper
 
 
-def setup_logger(log_path: str) -> logging.Logger:
+def _function_names(value: str) -> List[str]:
+    return [name.strip() for name in value.split(",") if name.strip()]
+
+
+def configure(config_log_section: configparser.SectionProxy) -> None:
+    """Apply the [Log] config section to the decorated functions.
+
+    Keys:
+        log_level - level of the root logger, for example INFO. Function entry / exit are logged at INFO.
+        log_functions - False disables the entry / exit logs of all functions.
+        disabled_functions - comma separated function names (name or Class.name) whose entry / exit aren't logged.
+        sampled_functions - comma separated name:N pairs, only 1 of every N calls of the function is logged.
+        default_sample_every - N for all other functions.
+
+    Args:
+        config_log_section (configparser.SectionProxy): The [Log] config section.
+    """
+    if "log_level" in config_log_section:
+        _logger.setLevel(config_log_section["log_level"].strip().upper())
+    _settings["enabled"] = config_log_section.getboolean("log_functions", True)
+    _settings["disabled"] = set(_function_names(config_log_section.get("disabled_functions", "")))
+    _settings["sample_every"] = {}
+    for pair in _function_names(config_log_section.get("sampled_functions", "")):
+        name, _, every = pair.partition(":")
+        _settings["sample_every"][name.strip()] = int(every)
+    _settings["default_sample_every"] = config_log_section.getint("default_sample_every", 1)
+
+    for state in _functions:
+        state.update()
+
+
+def stats() -> Dict[str, int]:
+    """Returns the calls counted by the sampler, per function.
+
+    Returns:
+        Dict[str, int]: key = function qualified name, value = calls seen while logging was enabled.
+    """
+    return {state.name: state.calls for state in _functions if state.calls}
+
+
+def shutdown() -> None:
+    """Stop the listener thread, writing the queued records."""
+    global _listener
+    if _listener:
+        _listener.stop()
+        _listener = None
+
+
+def setup_logger(log_path: str, handler: Optional[logging.Handler] = None) -> logging.Logger:
     """Setting up logger for all AlephPi activity.
+    Records are only enqueued by the logging threads, a listener thread formats them and writes them to the log file.
 
     Args:
         log_path (str): A path to the logging file
+        handler (Optional[logging.Handler], optional): Handler writing the records, instead of the rotating log file. Defaults to None.
 
     Raises:
         Exception: In case of internal exception in logging module.
@@ -34,17 +160,29 @@ def setup_logger(log_path: str) -> logging.Logger:
     Returns:
         logging.Logger: A valid logger,
     """
+    global _listener
     try:
+        shutdown()
         logger = logging.getLogger()
         logger.setLevel(logging.DEBUG)
-        handler = logging.handlers.RotatingFileHandler(
-            log_path, maxBytes=500000, backupCount=4
-        )
+        if handler is None:
+            handler = logging.handlers.RotatingFileHandler(
+                log_path, maxBytes=500000, backupCount=4
+            )
         formatter = logging.Formatter(
             "%(asctime)s - %(levelname)s - %(message)s", "%Y-%m-%d %H:%M:%S"
         )
         handler.setFormatter(formatter)
-        logger.addHandler(handler)
+
+        for existing in [h for h in logger.handlers if isinstance(h, _DeferredQueueHandler)]:
+            logger.removeHandler(existing)
+        records = queue.SimpleQueue() if hasattr(queue, "SimpleQueue") else queue.Queue()
+        logger.addHandler(_DeferredQueueHandler(records))
+        _listener = logging.handlers.QueueListener(records, handler, respect_handler_level=True)
+        _listener.start()
         return logger
     except Exception as ex:
         raise Exception(f"Cannot init logger - {ex}")
+
+
+atexit.register(shutdown)
@@ -0,0 +1,316 @@
+import os
+import logging
+import threading
+import configparser
+from typing import Any, Dict, List, Optional, Union
+
+import speech_recognition as sr
+
+from . import (
+    AlephGame,
+    Board,
+    ConnectivityMonitor,
+    LedAnimator,
+    Logger,
+    RecognitionPool,
+    RecognizerBackend,
+    RecordingArchive,
+    RemoteBoard,
+    RemoteSound,
+    SevenSegmentDisplay,
+    Sound,
+    SpeechRecognition,
+    Tracing,
+)
+
+
+class Station:
+    """A game station served by the multi-station host.
+
+    Attributes:
+        name (str): The station name.
+        board (Board): The station board, usually a RemoteBoard.
+        led_animator (LedAnimator): Plays the station LEDs.
+        sound (Union[Sound, RemoteSound]): Plays the station sounds - on the station speaker, or on the host speaker.
+        speech_recognition (SpeechRecognition): Records the station mic, recognizing on the shared pool.
+        seven_segment (Optional[SevenSegmentDisplay]): The station display.
+        game (AlephGame): The station game.
+        tracer (Tracer): Traces the station turns.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        board: Board.Board,
+        led_animator: LedAnimator.LedAnimator,
+        sound: Sound.Sound,
+        speech_recognition: SpeechRecognition.SpeechRecognition,
+        seven_segment: Optional[SevenSegmentDisplay.SevenSegmentDisplay],
+        game: AlephGame.AlephGame,
+        tracer: Tracing.Tracer,
+    ) -> None:
+        self.name = name
+        self.board = board
+        self.led_animator = led_animator
+        self.sound = sound
+        self.speech_recognition = speech_recognition
+        self.seven_segment = seven_segment
+        self.game = game
+        self.tracer = tracer
+
+
+class MultiStation:
+    """Runs the games of several stations in one process.
+
+    Every station has its own board (reached through the remote board protocol, see RemoteBoard), mic, speaker and game,
+    while the recognizer backend, the recognition workers, the connectivity monitor (and its connection pool)
+    and the records archive are shared. Recognitions are scheduled round-robin between the stations, see RecognitionPool.
+    The stations play their sounds on their own speakers, through the station agent (see RemoteSound). The host has a single output device,
+    so at most one station may play on the host speaker instead.
+
+    Stations are listed as [Station <name>] config sections - host, port, mic_name (defaults to the [Speech Recognition] mic), sound (station / host) and use_seven_seg.
+    Every station traces its turns with its own tracer, the records of all the stations are written to the trace file with their station name.
+
+    Attributes:
+        config (configparser.ConfigParser): The application config.
+        logger (logging.Logger): The application logger.
+        pool (RecognitionPool): The shared recognition workers.
+        connectivity_monitor (ConnectivityMonitor): The shared connectivity monitor and keep-alive session.
+        recording_archive (RecordingArchive): The shared archive of the unrecognized and misdetected records.
+        recognizer_backend (Optional[RecognizerBackend]): The shared backend, created by the first station unless given.
+        circuit_breaker (Optional[CircuitBreaker]): The shared backend circuit breaker, created by the first station.
+        fallback_backend (Optional[RecognizerBackend]): The shared fallback backend, created by the first station. None for a free pass.
+        stations (List[Station]): The stations.
+    """
+
+    @Logger.log_function
+    def __init__(
+        self,
+        config: configparser.ConfigParser,
+        logger: logging.Logger,
+        recognizer_backend: Optional[RecognizerBackend.RecognizerBackend] = None,
+        connectivity_monitor: Optional[ConnectivityMonitor.ConnectivityMonitor] = None,
+    ) -> None:
+        """Constructs MultiStation with the shared resources and no stations.
+
+        Args:
+            See Attributes section in class docstring
+        """
+        self.config = config
+        self.logger = logger
+        stations_config = config["Stations"]
+        sr_config = config["Speech Recognition"]
+
+        workers = stations_config.getint("recognition_workers", 4)
+        self.pool = RecognitionPool.RecognitionPool(
+            workers, stations_config.getint("max_in_flight_per_station", 1)
+        )
+        if connectivity_monitor is None:
+            # A pooled connection per worker
+            connectivity_monitor = ConnectivityMonitor.ConnectivityMonitor(
+                ConnectivityMonitor.create_session(workers),
+                sr_config.get("connectivity_url", "https://www.google.com/"),
+                sr_config.getfloat("connectivity_timeout", 2),
+                sr_config.getfloat("connectivity_interval", 30),
+            )
+        self.connectivity_monitor = connectivity_monitor
+        self.recording_archive = RecordingArchive.RecordingArchive(
+            [
+                os.path.join(os.getcwd(), sr_config.get("unrecognized_folder", "unrecognized")),
+                os.path.join(os.getcwd(), sr_config.get("misdetection_folder", "misdetection")),
+            ],
+            sr_config.getint("archive_max_records", 500),
+            sr_config.getfloat("archive_max_mb", 200),
+            codec=sr_config.get("archive_codec", "flac"),
+        )
+        self.recognizer_backend = recognizer_backend
+        self.circuit_breaker = None
+        self.fallback_backend = None
+        self.stations = []
+        self._closing = False
+
+    @Logger.log_function
+    def add_station(
+        self,
+        name: str,
+        board: Board.Board,
+        sound: Optional[Union[Sound.Sound, RemoteSound.RemoteSound]] = None,
+        microphone: Optional[sr.AudioSource] = None,
+        config_sr_overrides: Optional[Dict[str, str]] = None,
+        seven_segment: Optional[SevenSegmentDisplay.SevenSegmentDisplay] = None,
+    ) -> Station:
+        """Add a station, sharing the recognizer of the other stations.
+
+        Args:
+            name (str): The station name.
+            board (Board): The station board.
+            sound (Optional[Union[Sound, RemoteSound]], optional): The station sound. Defaults to the station speaker for a RemoteBoard, otherwise to the host speaker.
+            microphone (Optional[sr.AudioSource], optional): The station mic. Defaults to the mic_name microphone.
+            config_sr_overrides (Optional[Dict[str, str]], optional): [Speech Recognition] values of this station, for example mic_name. Defaults to None.
+            seven_segment (Optional[SevenSegmentDisplay], optional): The station display. Defaults to None.
+
+        Raises:
+            ValueError: In case another station already plays on the host speaker.
+
+        Returns:
+            Station: The station, its game isn't running yet.
+        """
+        if sound is None and isinstance(board, RemoteBoard.RemoteBoard):
+            sound = RemoteSound.RemoteSound(board, self.config["Audio Files"])
+        if sound is None or isinstance(sound, Sound.Sound):
+            self._check_host_speaker(f"Station {name}")
+        if sound is None:
+            sound = Sound.Sound(self.config["Audio Files"])
+
+        config_sr_section = dict(self.config["Speech Recognition"])
+        config_sr_section.update(config_sr_overrides or {})
+        # Streaming recognition talks to its transport directly, only batch recognitions go through the pool
+        if config_sr_section.get("recognition_mode") == "streaming":
+            logging.warning(f"Station {name} streams its recognitions outside the shared pool")
+
+        led_animator = LedAnimator.LedAnimator(board)
+        speech_recognition = SpeechRecognition.SpeechRecognition(
+            self.logger,
+            sound,
+            led_animator,
+            config_sr_section,
+            self.connectivity_monitor,
+            microphone,
+            self.recognizer_backend,
+            self.recording_archive,
+            self.circuit_breaker,
+            self.fallback_backend,
+        )
+        # The first station creates the configured backends and the circuit breaker, the other stations share them
+        self.recognizer_backend = speech_recognition.recognizer_backend
+        speech_recognition.recognizer_backend = RecognitionPool.PooledBackend(
+            self.pool, name, self.recognizer_backend
+        )
+        self.circuit_breaker = speech_recognition.circuit_breaker
+        self.fallback_backend = speech_recognition.fallback_backend
+        if self.fallback_backend:
+            speech_recognition.fallback_backend = RecognitionPool.PooledBackend(
+                self.pool, name, self.fallback_backend
+            )
+
+        game_config = self.config["Game Properties"]
+        game = AlephGame.AlephGame(
+            board,
+            led_animator,
+            sound,
+            speech_recognition,
+            {int(pin): letter for pin, letter in self.config["Letters GPIOs"].items()},
+            self.config["Operative GPIOs"].getint("start_button", 38),
+            self.config["Operative GPIOs"].getint("blink_record", 40),
+            game_config.getint("lives", 4),
+            seven_segment,
+            game_config.getint("demo_sleep_timeout", 1),
+            game_config.getfloat("blink_sleep_timeout", 0.1),
+            game_config.getfloat("button_debounce_ms", 200),
+            game_config.getint("button_queue_size", 16),
+        )
+        game.station = name
+        tracer = Tracing.tracer.for_station(name)
+        for component in (game, sound, speech_recognition):
+            component.tracer = tracer
+        station = Station(name, board, led_animator, sound, speech_recognition, seven_segment, game, tracer)
+        self.stations.append(station)
+        return station
+
+    @Logger.log_function
+    def connect_stations(self) -> List[Station]:
+        """Connect to the stations of the [Station <name>] config sections and add them.
+
+        Raises:
+            EnvironmentError: In case a station cannot be reached.
+            ValueError: In case more than one station plays on the host speaker.
+
+        Returns:
+            List[Station]: The added stations.
+        """
+        added = []
+        for section in self.config.sections():
+            if not section.startswith("Station "):
+                continue
+            station_config = self.config[section]
+            board = RemoteBoard.RemoteBoard(
+                station_config["host"], station_config.getint("port", RemoteBoard.DEFAULT_PORT)
+            )
+            seven_segment = None
+            if station_config.getboolean("use_seven_seg", False):
+                seven_segment = SevenSegmentDisplay.SevenSegmentDisplay(
+                    board,
+                    station_config.get("serial_port", "/dev/serial0"),
+                    station_config.getint("serial_bandwidth", 9600),
+                )
+            sound = None
+            if station_config.get("sound", "station") == "host":
+                self._check_host_speaker(section)
+                sound = Sound.Sound(self.config["Audio Files"])
+            overrides = {"mic_name": station_config["mic_name"]} if "mic_name" in station_config else {}
+            added.append(
+                self.add_station(section[len("Station "):], board, sound, None, overrides, seven_segment)
+            )
+        return added
+
+    @Logger.log_function
+    def run(self) -> None:
+        """Run the games of all the stations, each game on its own thread. Returns when all the games ended."""
+        threads = [
+            threading.Thread(target=self._run_station, args=(station,), name=f"station-{station.name}", daemon=True)
+            for station in self.stations
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Returns the counters of every station - the recognition pool counters, score and lives, and the shared recognition circuit."""
+        pool_stats = self.pool.stats()
+        stats = {
+            station.name: dict(
+                pool_stats.get(station.name, {}),
+                score=station.game.score,
+                lives=station.game.lives,
+            )
+            for station in self.stations
+        }
+        if self.circuit_breaker:
+            stats["circuit"] = self.circuit_breaker.stats()
+        return stats
+
+    @Logger.log_function
+    def close(self) -> None:
+        """Stop the recognition workers, write the archived records and release the stations mics and boards."""
+        self._closing = True
+        self.pool.close()
+        self.recording_archive.flush(5)
+        for station in self.stations:
+            station.speech_recognition.close()
+            if station.seven_segment:
+                station.seven_segment.close_connection()
+            station.board.cleanup()
+
+    def _check_host_speaker(self, name: str) -> None:
+        """Raises ValueError in case a station already plays on the host speaker - all the Sound instances of the process share its single output device."""
+        host_speaker = [station.name for station in self.stations if isinstance(station.sound, Sound.Sound)]
+        if host_speaker:
+            raise ValueError(
+                f"{name} cannot play on the host speaker, station {host_speaker[0]} already does"
+                " - play its sounds on the station (python -m AlephPi.RemoteBoard --sound)"
+            )
+
+    def _run_station(self, station: Station) -> None:
+        try:
+            station.game.run_game()
+        except Exception as err:
+            if self._closing:
+                return
+            # A failing station doesn't stop the others
+            logging.error(f"Station {station.name} failed - {err}")
+            try:
+                station.sound.play_game_sound(Sound.GameSound.FATAL_ERROR, wait=False)
+            except EnvironmentError:
+                # The station is gone together with its speaker
+                pass
@@ -0,0 +1,246 @@
+import os
+import json
+import logging
+import threading
+import unicodedata
+from collections import Counter
+from typing import Dict, List, Optional, Set, Tuple
+
+from . import Logger
+
+# Hebrew final letters are matched as their regular form
+_FINAL_LETTERS = str.maketrans("ךםןףץ", "כמנפצ")
+
+
+def normalize(text: str) -> str:
+    """Normalize a transcript / alias for matching - strips niqqud and other marks, punctuation and whitespace, folds final letters and case.
+
+    Args:
+        text (str): The text to normalize.
+
+    Returns:
+        str: The normalized text.
+    """
+    decomposed = unicodedata.normalize("NFKD", text)
+    kept = [
+        char
+        for char in decomposed
+        # Mn - niqqud and cantillation marks, P - punctuation, S - symbols (Google masks words with *), Z / Cc - whitespace
+        if unicodedata.category(char)[0] not in ("M", "P", "S", "Z", "C")
+    ]
+    return "".join(kept).casefold().translate(_FINAL_LETTERS)
+
+
+def trigrams(text: str) -> Set[str]:
+    """Returns the padded trigrams of a normalized text, short words still get a few trigrams thanks to the padding.
+
+    Args:
+        text (str): Normalized text.
+
+    Returns:
+        Set[str]: The trigrams.
+    """
+    padded = f"##{text}#"
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+def edit_distance(a: str, b: str, max_distance: Optional[int] = None) -> int:
+    """Levenshtein distance between 2 strings.
+
+    Args:
+        a (str): First string.
+        b (str): Second string.
+        max_distance (Optional[int], optional): Stop as soon as the distance is known to exceed this value. Defaults to None.
+
+    Returns:
+        int: The minimal amount of single character edits, max_distance + 1 when it was exceeded.
+    """
+    if len(a) < len(b):
+        a, b = b, a
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(
+                min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b))
+            )
+        # Distances never decrease from one row to the next
+        if max_distance is not None and min(current) > max_distance:
+            return max_distance + 1
+        previous = current
+    return previous[-1]
+
+
+class Match:
+    """A transcript matched to a letter.
+
+    Attributes:
+        letter (str): The verbal value of the matched letter.
+        alias (str): The recognition option the transcript matched.
+        transcript (str): The matched transcript (one of the recognizer alternatives).
+        score (float): Similarity of the transcript to the alias, weighted by the alternative confidence.
+        scores (Dict[str, float]): The best score of every letter which had a candidate.
+    """
+
+    def __init__(
+        self, letter: str, alias: str, transcript: str, score: float, scores: Dict[str, float]
+    ) -> None:
+        self.letter = letter
+        self.alias = alias
+        self.transcript = transcript
+        self.score = score
+        self.scores = scores
+
+    def __repr__(self) -> str:
+        return f"Match({self.letter}, alias={self.alias!r}, transcript={self.transcript!r}, score={self.score:.2f})"
+
+
+class RecognitionIndex:
+    """Index of the recognition options file (key = alias said by the user, value = letter), compiled for fast exact and approximate matching.
+
+    Aliases are normalized (see normalize), exact matches are a single dictionary lookup, and near misses are found through a trigram inverted index
+    and verified with edit distance. All the recognizer alternatives are scored, not only the top one.
+    The file is reloaded when it changes on disk, without a restart.
+
+    Attributes:
+        file_path (str): Path to the recognition options JSON file.
+        min_similarity (float): Approximate matches less similar than this (1 - edit distance / length) are ignored.
+        max_candidates (int): Amount of trigram candidates verified with edit distance per transcript.
+    """
+
+    @Logger.log_function
+    def __init__(self, file_path: str, min_similarity: float = 0.6, max_candidates: int = 20) -> None:
+        """Constructs RecognitionIndex, compiling the recognition options file.
+
+        Args:
+            See Attributes section in class docstring
+
+        Raises:
+            IOError: In case the recognition options file wasn't found.
+        """
+        self.file_path = file_path
+        self.min_similarity = min_similarity
+        self.max_candidates = max_candidates
+        self._mtime = None
+        # (aliases, trigrams index) - replaced as a whole on reload, so lookups never see a half built index
+        self._index = ({}, {})
+        self._reload_lock = threading.Lock()
+        self.reload()
+
+    @Logger.log_function
+    def reload(self) -> None:
+        """Compile the recognition options file.
+
+        Raises:
+            IOError: In case the recognition options file wasn't found.
+        """
+        if not os.path.isfile(self.file_path):
+            raise IOError(
+                f"JSON file with valid recognition options wasn't found - {self.file_path}"
+            )
+
+        with self._reload_lock:
+            mtime = os.path.getmtime(self.file_path)
+            with open(self.file_path, encoding="utf-8") as json_file:
+                options = json.load(json_file)
+
+            aliases = {}
+            for alias, letter in options.items():
+                normalized = normalize(alias)
+                if not normalized:
+                    continue
+                if normalized in aliases and aliases[normalized][0] != letter:
+                    logging.warning(
+                        f"Recognition option {alias} is ambiguous - {aliases[normalized][0]} / {letter}, keeping {aliases[normalized][0]}"
+                    )
+                    continue
+                aliases.setdefault(normalized, (letter, alias))
+
+            trigrams_index = {}
+            for normalized in aliases:
+                for trigram in trigrams(normalized):
+                    trigrams_index.setdefault(trigram, []).append(normalized)
+
+            self._index = (aliases, trigrams_index)
+            self._mtime = mtime
+        logging.info(f"Loaded {len(aliases)} recognition options from {self.file_path}")
+
+    def reload_if_changed(self) -> bool:
+        """Reload the recognition options file in case it was modified since the last load.
+
+        Returns:
+            bool: If the file was reloaded.
+        """
+        try:
+            if os.path.getmtime(self.file_path) == self._mtime:
+                return False
+            self.reload()
+        except (IOError, OSError, ValueError) as ex:
+            # Keep serving the last valid index
+            logging.error(f"Cannot reload recognition options - {ex}")
+            return False
+        return True
+
+    def lookup(self, transcript: str) -> Optional[Tuple[str, str, float]]:
+        """Find the alias closest to a single transcript.
+
+        Args:
+            transcript (str): The transcript.
+
+        Returns:
+            Optional[Tuple[str, str, float]]: (letter, alias, similarity), None when no alias is similar enough.
+        """
+        aliases, trigrams_index = self._index
+        normalized = normalize(transcript)
+        if not normalized:
+            return None
+
+        exact = aliases.get(normalized)
+        if exact:
+            return exact[0], exact[1], 1.0
+
+        shared = Counter()
+        for trigram in trigrams(normalized):
+            shared.update(trigrams_index.get(trigram, ()))
+
+        best = None
+        for candidate, _ in shared.most_common(self.max_candidates):
+            length = max(len(normalized), len(candidate))
+            max_distance = int((1 - self.min_similarity) * length + 1e-9)
+            # The length difference alone is a lower bound of the edit distance
+            if abs(len(normalized) - len(candidate)) > max_distance:
+                continue
+            similarity = 1 - edit_distance(normalized, candidate, max_distance) / length
+            if similarity >= self.min_similarity and (best is None or similarity > best[2]):
+                letter, alias = aliases[candidate]
+                best = (letter, alias, similarity)
+        return best
+
+    def match(self, alternatives: List[Tuple[str, float]]) -> Optional[Match]:
+        """Match the recognizer alternatives to a letter. Every alternative (and every word in it) is looked up,
+        its similarity is weighted by the alternative confidence (or by its rank when the recognizer didn't report a confidence).
+
+        Args:
+            alternatives (List[Tuple[str, float]]): (transcript, confidence) alternatives, best first.
+
+        Returns:
+            Optional[Match]: The best scoring letter, None when nothing matched.
+        """
+        best = None
+        scores = {}
+        for rank, (transcript, confidence) in enumerate(alternatives):
+            weight = confidence if confidence and confidence > 0 else 0.5 ** rank
+            words = transcript.split()
+            for text in [transcript] + (words if len(words) > 1 else []):
+                found = self.lookup(text)
+                if not found:
+                    continue
+                letter, alias, similarity = found
+                score = weight * similarity
+                scores[letter] = max(scores.get(letter, 0.0), score)
+                if best is None or score > best[3]:
+                    best = (letter, alias, transcript, score)
+
+        if best is None:
+            return None
+        return Match(*best, scores)
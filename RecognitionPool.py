@@ -0,0 +1,177 @@
+import time
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+from typing import Any, Callable, Dict
+
+import speech_recognition as sr
+
+from . import Logger, RecognizerBackend, Tracing
+
+
+class _StationQueue:
+    """Pending recognitions and counters of a single station."""
+
+    __slots__ = ("jobs", "in_flight", "submitted", "completed", "wait_ms_total", "wait_ms_max")
+
+    def __init__(self) -> None:
+        self.jobs = deque()
+        self.in_flight = 0
+        self.submitted = 0
+        self.completed = 0
+        self.wait_ms_total = 0.0
+        self.wait_ms_max = 0.0
+
+
+class RecognitionPool:
+    """A fixed set of recognition worker threads shared by several stations.
+
+    Every station has its own queue, the workers serve the stations round-robin and a station never has more than
+    max_in_flight_per_station recognitions running - so a busy station waits for its own requests instead of delaying everyone else's.
+
+    Attributes:
+        workers (int): Number of recognitions running at the same time.
+        max_in_flight_per_station (int): Number of recognitions of a single station running at the same time.
+    """
+
+    @Logger.log_function
+    def __init__(self, workers: int = 4, max_in_flight_per_station: int = 1) -> None:
+        """Constructs RecognitionPool, starting the worker threads.
+
+        Args:
+            See Attributes section in class docstring
+        """
+        self.workers = workers
+        self.max_in_flight_per_station = max_in_flight_per_station
+        # Rotated after every dispatch, the first station with a runnable job is served next
+        self._stations = OrderedDict()
+        self._closed = False
+        self._ready = threading.Condition()
+        self._threads = [threading.Thread(target=self._run, daemon=True) for _ in range(workers)]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, station_id: str, function: Callable[[], Any]) -> Future:
+        """Queue a job of a station.
+
+        Args:
+            station_id (str): The station the job belongs to.
+            function (Callable[[], Any]): The job.
+
+        Raises:
+            RuntimeError: In case the pool is closed.
+
+        Returns:
+            Future: Completed with the job result (or exception).
+        """
+        future = Future()
+        with self._ready:
+            if self._closed:
+                raise RuntimeError("Recognition pool is closed")
+            station = self._stations.get(station_id)
+            if station is None:
+                station = self._stations[station_id] = _StationQueue()
+            station.jobs.append((function, future, time.monotonic()))
+            station.submitted += 1
+            self._ready.notify()
+        return future
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """Returns the counters of every station - submitted, completed, queued, in_flight, wait_ms_mean and wait_ms_max (time from submit until a worker took the job)."""
+        with self._ready:
+            return {
+                station_id: {
+                    "submitted": station.submitted,
+                    "completed": station.completed,
+                    "queued": len(station.jobs),
+                    "in_flight": station.in_flight,
+                    "wait_ms_mean": station.wait_ms_total / station.completed if station.completed else 0.0,
+                    "wait_ms_max": station.wait_ms_max,
+                }
+                for station_id, station in self._stations.items()
+            }
+
+    @Logger.log_function
+    def close(self) -> None:
+        """Stop the workers after the running jobs, queued jobs are cancelled."""
+        with self._ready:
+            self._closed = True
+            cancelled = [job for station in self._stations.values() for job in station.jobs]
+            for station in self._stations.values():
+                station.jobs.clear()
+            self._ready.notify_all()
+        for _, future, _ in cancelled:
+            future.cancel()
+        for thread in self._threads:
+            thread.join(1)
+
+    def _next_job(self):
+        """Pop the job of the next station in turn, None when no station may run a job. Called with the lock held."""
+        for station_id, station in self._stations.items():
+            if station.jobs and station.in_flight < self.max_in_flight_per_station:
+                self._stations.move_to_end(station_id)
+                station.in_flight += 1
+                return station, station.jobs.popleft()
+        return None
+
+    def _run(self) -> None:
+        while True:
+            with self._ready:
+                while True:
+                    if self._closed:
+                        return
+                    next_job = self._next_job()
+                    if next_job:
+                        break
+                    self._ready.wait()
+            station, (function, future, submit_time) = next_job
+            wait_ms = (time.monotonic() - submit_time) * 1000
+
+            if future.set_running_or_notify_cancel():
+                try:
+                    future.set_result(function())
+                except BaseException as ex:
+                    future.set_exception(ex)
+
+            with self._ready:
+                station.in_flight -= 1
+                station.completed += 1
+                station.wait_ms_total += wait_ms
+                station.wait_ms_max = max(station.wait_ms_max, wait_ms)
+                # The station may have another job waiting for this slot
+                self._ready.notify()
+
+
+class PooledBackend(RecognizerBackend.RecognizerBackend):
+    """Runs a shared backend's recognitions on a RecognitionPool, on behalf of a station.
+
+    Attributes:
+        pool (RecognitionPool): The shared pool.
+        station_id (str): The station the recognitions are queued for.
+        backend (RecognizerBackend): The shared backend.
+    """
+
+    @Logger.log_function
+    def __init__(
+        self, pool: RecognitionPool, station_id: str, backend: RecognizerBackend.RecognizerBackend
+    ) -> None:
+        """Constructs PooledBackend.
+
+        Args:
+            See Attributes section in class docstring
+        """
+        self.pool = pool
+        self.station_id = station_id
+        self.backend = backend
+        self.name = backend.name
+        self.requires_internet = backend.requires_internet
+
+    def recognize(self, audio_data: sr.AudioData) -> RecognizerBackend.RecognitionResult:
+        tracer = Tracing.active()
+
+        def recognize() -> RecognizerBackend.RecognitionResult:
+            # The worker traces in the turn of the station
+            with Tracing.activated(tracer):
+                return self.backend.recognize(audio_data)
+
+        return self.pool.submit(self.station_id, recognize).result()
@@ -0,0 +1,210 @@
+import os
+import glob
+import json
+import time
+import wave
+import queue
+import logging
+import itertools
+import threading
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+import speech_recognition as sr
+
+from . import AudioBuffer, Logger
+
+# Archived records are named <date>-<time>-<microseconds>_<sequence>_expected_<letter>.<flac / wav>, next to a .json sidecar
+AUDIO_EXTENSIONS = (".flac", ".wav")
+
+
+class RecordingArchive:
+    """Archives records in the background - callers only enqueue, a worker thread encodes and writes them in batches.
+
+    Every record is stored compressed (FLAC, when the soundfile package is installed, WAV otherwise) next to a JSON sidecar
+    with its metadata (expected letter, transcript, timings...). Filenames start with a microseconds timestamp and a sequence number,
+    so they never collide and sort oldest first. Once the archive holds more than max_records records or max_mb megabytes, the oldest records are evicted.
+
+    Attributes:
+        folders (List[str]): The archive folders, retention is enforced over all of them together.
+        max_records (int): Maximal amount of archived records, 0 for no limit.
+        max_bytes (int): Maximal size of the archived records, 0 for no limit.
+        batch_size (int): Maximal amount of records written in a single batch.
+        codec (str): flac / wav.
+        written (int): Amount of records written.
+        evicted (int): Amount of records evicted.
+        dropped (int): Amount of records dropped because the queue was full.
+    """
+
+    @Logger.log_function
+    def __init__(
+        self,
+        folders: List[str],
+        max_records: int = 500,
+        max_mb: float = 200,
+        batch_size: int = 8,
+        max_queue: int = 64,
+        codec: str = "flac",
+    ) -> None:
+        """Constructs RecordingArchive and starts its worker thread.
+
+        Args:
+            See Attributes section in class docstring
+            max_mb (float, optional): Maximal size of the archived records in megabytes, 0 for no limit. Defaults to 200.
+            max_queue (int, optional): Records waiting to be written, further records are dropped. Defaults to 64.
+        """
+        self.folders = folders
+        self.max_records = max_records
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.batch_size = batch_size
+        self.written = 0
+        self.evicted = 0
+        self.dropped = 0
+
+        self._soundfile = None
+        if codec == "flac":
+            try:
+                import soundfile
+
+                self._soundfile = soundfile
+            except ImportError:
+                logging.warning("soundfile isn't installed, archiving records as WAV")
+                codec = "wav"
+        self.codec = codec
+
+        self._sequence = itertools.count()
+        self._queue = queue.Queue(max_queue)
+        # (name, audio path, bytes) of every archived record, oldest first
+        self._records = deque()
+        self._bytes = 0
+        self._scan()
+
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def save(self, folder: str, audio_data: sr.AudioData, metadata: Dict[str, Any]) -> Optional[str]:
+        """Enqueue a record to be archived, never blocks.
+
+        Args:
+            folder (str): The archive folder of the record.
+            audio_data (sr.AudioData): The record.
+            metadata (Dict[str, Any]): JSON serializable metadata, saved in the sidecar. Its "expected" key (verbal value of the expected letter) is part of the filename.
+
+        Returns:
+            Optional[str]: The path the record will be written to, None in case it was dropped.
+        """
+        now = time.time()
+        name = "{}-{:06d}_{:06d}_expected_{}".format(
+            time.strftime("%Y%m%d-%H%M%S", time.localtime(now)),
+            int(now % 1 * 1000000),
+            next(self._sequence) % 1000000,
+            metadata.get("expected", "unknown"),
+        )
+        try:
+            self._queue.put_nowait((folder, name, audio_data, dict(metadata, time=now)))
+        except queue.Full:
+            self.dropped += 1
+            logging.warning(f"Recording archive queue is full, dropping {name}")
+            return None
+        return os.path.join(folder, f"{name}.{self.codec}")
+
+    def flush(self, timeout: Optional[float] = None) -> None:
+        """Wait until all the enqueued records were written.
+
+        Args:
+            timeout (Optional[float], optional): Seconds to wait, None for no limit. Defaults to None.
+        """
+        done = threading.Event()
+        self._queue.put(done)
+        done.wait(timeout)
+
+    def stats(self) -> Dict[str, int]:
+        """Returns the archive counters.
+
+        Returns:
+            Dict[str, int]: records, bytes, written, evicted, dropped and queued.
+        """
+        return {
+            "records": len(self._records),
+            "bytes": self._bytes,
+            "written": self.written,
+            "evicted": self.evicted,
+            "dropped": self.dropped,
+            "queued": self._queue.qsize(),
+        }
+
+    def _scan(self) -> None:
+        """Index the records archived by previous runs."""
+        records = []
+        for folder in self.folders:
+            for extension in AUDIO_EXTENSIONS:
+                for filepath in glob.glob(os.path.join(folder, f"*{extension}")):
+                    records.append((os.path.basename(filepath), filepath, os.path.getsize(filepath)))
+        records.sort()
+        self._records.extend(records)
+        self._bytes = sum(size for _, _, size in records)
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            # Drain whatever else is waiting, so a burst of records costs a single retention pass
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            for item in batch:
+                if isinstance(item, threading.Event):
+                    continue
+                try:
+                    self._write(*item)
+                except (OSError, RuntimeError, ValueError) as ex:
+                    logging.error(f"Cannot archive record {item[1]} - {ex}")
+            self._enforce_retention()
+
+            for item in batch:
+                if isinstance(item, threading.Event):
+                    item.set()
+
+    def _write(self, folder: str, name: str, audio_data: sr.AudioData, metadata: Dict[str, Any]) -> None:
+        os.makedirs(folder, exist_ok=True)
+        audio_path = os.path.join(folder, f"{name}.{self.codec}")
+
+        # Encoded straight from the record samples into a temporary name, readers never see a partial file
+        samples = AudioBuffer.as_samples(audio_data, "archive")
+        if self._soundfile:
+            self._soundfile.write(
+                f"{audio_path}.tmp", samples, audio_data.sample_rate, format="FLAC", subtype="PCM_16"
+            )
+        else:
+            with wave.open(f"{audio_path}.tmp", "wb") as wav_file:
+                wav_file.setnchannels(1)
+                wav_file.setsampwidth(2)
+                wav_file.setframerate(audio_data.sample_rate)
+                wav_file.writeframes(memoryview(samples).cast("B"))
+        size = os.path.getsize(f"{audio_path}.tmp")
+        os.replace(f"{audio_path}.tmp", audio_path)
+
+        metadata["sample_rate"] = audio_data.sample_rate
+        metadata["audio_file"] = os.path.basename(audio_path)
+        with open(os.path.join(folder, f"{name}.json"), "w", encoding="utf-8") as sidecar:
+            json.dump(metadata, sidecar, ensure_ascii=False, default=str)
+
+        self._records.append((os.path.basename(audio_path), audio_path, size))
+        self._bytes += size
+        self.written += 1
+
+    def _enforce_retention(self) -> None:
+        while self._records and (
+            (self.max_records and len(self._records) > self.max_records)
+            or (self.max_bytes and self._bytes > self.max_bytes)
+        ):
+            _, audio_path, size = self._records.popleft()
+            self._bytes -= size
+            self.evicted += 1
+            for filepath in (audio_path, f"{os.path.splitext(audio_path)[0]}.json"):
+                try:
+                    os.remove(filepath)
+                except FileNotFoundError:
+                    pass
@@ -0,0 +1,386 @@
+#!/usr/bin/env python3
+import json
+import socket
+import logging
+import argparse
+import threading
+import configparser
+import socketserver
+from concurrent.futures import Future, TimeoutError
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+from . import Board, Logger
+
+# Remote board protocol - newline delimited JSON over TCP.
+#   request:   {"id": <int>, "op": <Board method>, "args": [...]}
+#   response:  {"id": <int>, "result": ...} / {"id": <int>, "error": "..."}
+#   event:     {"op": "edge", "pin": <int>} - pushed by the station whenever a detected edge occurs
+# Outputs and serial writes are sent without waiting for their response, so LED frames never wait for the network.
+# Sounds are played by the station agent (see RemoteSound), the play response is sent once the playback ended - true, or false when it was stopped.
+DEFAULT_PORT = 8770
+
+
+def _encode(message: Dict[str, Any]) -> bytes:
+    return (json.dumps(message, separators=(",", ":")) + "\n").encode("utf-8")
+
+
+class RemoteSerial:
+    """serial.Serial compatible handle of a serial port opened on a remote station.
+
+    Attributes:
+        name (str): The serial port name.
+    """
+
+    def __init__(self, board: "RemoteBoard", name: str, handle: int) -> None:
+        self.name = name
+        self._board = board
+        self._handle = handle
+        self._open = True
+
+    def isOpen(self) -> bool:
+        return self._open and self._board.connected
+
+    def write(self, data: bytes) -> int:
+        if not self.isOpen():
+            raise EnvironmentError(f"Serial port {self.name} is closed")
+        self._board.request("serial_write", [self._handle, bytes(data).hex()], wait=False)
+        return len(data)
+
+    def close(self) -> None:
+        if self._open and self._board.connected:
+            self._board.request("serial_close", [self._handle], wait=False)
+        self._open = False
+
+
+class RemoteBoard(Board.Board):
+    """Board of a remote station, reached through the remote board protocol (see BoardServer, which runs on the station).
+
+    Setup calls wait for the station response, outputs and serial writes don't. Edge callbacks are called from another thread, like on RPiBoard.
+
+    Attributes:
+        host (str): The station host.
+        port (int): The station BoardServer port.
+        connected (bool): The connection to the station is up.
+    """
+
+    @Logger.log_function
+    def __init__(self, host: str, port: int = DEFAULT_PORT, timeout: float = 5) -> None:
+        """Constructs RemoteBoard, connecting to the station.
+
+        Args:
+            See Attributes section in class docstring
+            timeout (float, optional): Seconds to wait for the connection and for setup responses. Defaults to 5.
+
+        Raises:
+            EnvironmentError: In case the station cannot be reached.
+        """
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self._socket = socket.create_connection((host, port), timeout)
+        self._socket.settimeout(None)
+        self._socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._send_lock = threading.Lock()
+        self._next_id = 0
+        self._pending = {}
+        self._callbacks = {}
+        self.connected = True
+        threading.Thread(target=self._read, daemon=True).start()
+
+    def request(self, op: str, args: List[Any], wait: bool = True) -> Any:
+        """Send a request to the station.
+
+        Args:
+            op (str): The Board method.
+            args (List[Any]): Its JSON serializable arguments.
+            wait (bool, optional): Wait for the response. Defaults to True.
+
+        Raises:
+            EnvironmentError: In case the station is disconnected, or the call failed on the station.
+
+        Returns:
+            Any: The result, None when not waiting.
+        """
+        request_id, future = self._send(op, args, wait)
+        if not wait:
+            return None
+        try:
+            return future.result(self.timeout)
+        except TimeoutError:
+            self._pending.pop(request_id, None)
+            raise EnvironmentError(f"Station {self.host}:{self.port} didn't respond to {op}")
+
+    def request_async(self, op: str, args: List[Any]) -> Future:
+        """Send a request to the station without a response timeout, for requests which take a while - for example playing a sound.
+
+        Args:
+            op (str): The operation.
+            args (List[Any]): Its JSON serializable arguments.
+
+        Raises:
+            EnvironmentError: In case the station is disconnected.
+
+        Returns:
+            Future: Completed with the result, or with an EnvironmentError when the call failed on the station or the station disconnected.
+        """
+        return self._send(op, args, True)[1]
+
+    def _send(self, op: str, args: List[Any], wait: bool) -> Tuple[int, Future]:
+        """Send a request, returns its id and the future of its response - never completed when not waiting for it."""
+        if not self.connected:
+            raise EnvironmentError(f"Station {self.host}:{self.port} is disconnected")
+        future = Future()
+        with self._send_lock:
+            self._next_id += 1
+            request_id = self._next_id
+            self._pending[request_id] = (op, future if wait else None)
+            try:
+                self._socket.sendall(_encode({"id": request_id, "op": op, "args": args}))
+            except OSError as ex:
+                self._pending.pop(request_id, None)
+                raise EnvironmentError(f"Station {self.host}:{self.port} is disconnected - {ex}")
+        return request_id, future
+
+    def setup_output(self, pins: List[int]) -> None:
+        self.request("setup_output", [list(pins)])
+
+    def setup_input(self, pin: int) -> None:
+        self.request("setup_input", [pin])
+
+    def output(self, pins: Union[int, List[int]], state: bool) -> None:
+        self.request("output", [pins if isinstance(pins, int) else list(pins), bool(state)], wait=False)
+
+    def output_many(self, states: Dict[int, bool]) -> None:
+        if states:
+            self.request("output_many", [[[pin, bool(state)] for pin, state in states.items()]], wait=False)
+
+    def add_event_detect(
+        self, pin: int, edge: Board.Edge, callback: Callable[[int], None], bouncetime: int
+    ) -> None:
+        self._callbacks[pin] = callback
+        try:
+            self.request("add_event_detect", [pin, edge.value, bouncetime])
+        except EnvironmentError:
+            self._callbacks.pop(pin, None)
+            raise
+
+    def remove_event_detect(self, pin: int) -> None:
+        self._callbacks.pop(pin, None)
+        self.request("remove_event_detect", [pin])
+
+    @Logger.log_function
+    def open_serial(self, serial_port: str, bandwidth: int) -> RemoteSerial:
+        return RemoteSerial(self, serial_port, self.request("open_serial", [serial_port, bandwidth]))
+
+    @Logger.log_function
+    def cleanup(self) -> None:
+        if self.connected:
+            try:
+                self.request("cleanup", [])
+            except EnvironmentError as ex:
+                logging.warning(f"Station {self.host}:{self.port} cleanup failed - {ex}")
+        self.connected = False
+        try:
+            # Wakes the reader thread, which fails the requests still waiting for the station (for example playing sounds)
+            self._socket.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        try:
+            self._socket.close()
+        except OSError:
+            pass
+
+    def _read(self) -> None:
+        try:
+            for line in self._socket.makefile("rb"):
+                message = json.loads(line)
+                if message.get("op") == "edge":
+                    callback = self._callbacks.get(message["pin"])
+                    if callback:
+                        # Like on a real board the callback runs on another thread, so it may call the board back.
+                        threading.Thread(target=callback, args=(message["pin"],), daemon=True).start()
+                    continue
+
+                op, future = self._pending.pop(message["id"], (None, None))
+                if "error" in message:
+                    if future:
+                        future.set_exception(EnvironmentError(message["error"]))
+                    else:
+                        logging.error(f"Station {self.host}:{self.port} {op} failed - {message['error']}")
+                elif future:
+                    future.set_result(message.get("result"))
+        except (OSError, ValueError) as ex:
+            logging.error(f"Station {self.host}:{self.port} connection failed - {ex}")
+        finally:
+            self.connected = False
+            for _, future in self._pending.values():
+                if future and not future.done():
+                    future.set_exception(EnvironmentError(f"Station {self.host}:{self.port} disconnected"))
+            self._pending.clear()
+
+
+class BoardServer:
+    """Serves a station's board to a game host through the remote board protocol - runs on the station (see RemoteBoard).
+
+    Attributes:
+        board (Board): The station board.
+        host (str): Interface to listen on.
+        port (int): Port to listen on, 0 for any free port.
+        sound (Optional[Sound]): Plays the game sounds requested by the host on the station speaker. None - the station doesn't play sounds.
+    """
+
+    @Logger.log_function
+    def __init__(
+        self, board: Board.Board, host: str = "0.0.0.0", port: int = DEFAULT_PORT, sound: Optional[Any] = None
+    ) -> None:
+        """Constructs BoardServer, listening on the port.
+
+        Args:
+            See Attributes section in class docstring
+        """
+        self.board = board
+        self.sound = sound
+        server = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self) -> None:
+                server._serve(self.connection, self.rfile)
+
+        socketserver.ThreadingTCPServer.allow_reuse_address = True
+        self._server = socketserver.ThreadingTCPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        self.host, self.port = self._server.server_address[:2]
+        self._serials = {}
+
+    def start(self) -> None:
+        """Serve in a background thread."""
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    def serve_forever(self) -> None:
+        """Serve on the calling thread."""
+        self._server.serve_forever()
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _serve(self, connection: socket.socket, rfile) -> None:
+        connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        send_lock = threading.Lock()
+        detected_pins = set()
+
+        def send(message: Dict[str, Any]) -> None:
+            with send_lock:
+                connection.sendall(_encode(message))
+
+        def edge(pin: int) -> None:
+            try:
+                send({"op": "edge", "pin": pin})
+            except OSError:
+                pass
+
+        try:
+            for line in rfile:
+                request = json.loads(line)
+                try:
+                    if request["op"] == "play":
+                        # Answered once the playback ended, meanwhile the next requests are served
+                        self._play(request["id"], request["args"][0], send)
+                        continue
+                    result = self._call(request["op"], request["args"], edge, detected_pins)
+                    send({"id": request["id"], "result": result})
+                except (EnvironmentError, RuntimeError, ValueError, KeyError, TypeError) as ex:
+                    send({"id": request["id"], "error": f"{type(ex).__name__}: {ex}"})
+        except (OSError, ValueError) as ex:
+            logging.error(f"Board client connection failed - {ex}")
+        finally:
+            # Don't keep calling back a host which is gone
+            for pin in detected_pins:
+                self.board.remove_event_detect(pin)
+
+    def _play(self, request_id: int, filepaths: List[str], send: Callable[[Dict[str, Any]], None]) -> None:
+        """Queue audio files on the station sound, the response is sent when they finished playing."""
+        if self.sound is None:
+            raise ValueError("The station doesn't play sounds, start it with --sound")
+
+        def played(future: Future) -> None:
+            if future.cancelled():
+                response = {"id": request_id, "result": False}
+            elif future.exception() is not None:
+                response = {"id": request_id, "error": f"{type(future.exception()).__name__}: {future.exception()}"}
+            else:
+                response = {"id": request_id, "result": True}
+            try:
+                send(response)
+            except OSError:
+                pass
+
+        self.sound.play_async(filepaths).add_done_callback(played)
+
+    def _call(self, op: str, args: List[Any], edge: Callable[[int], None], detected_pins: set) -> Any:
+        if op == "setup_output":
+            return self.board.setup_output(args[0])
+        if op == "setup_input":
+            return self.board.setup_input(args[0])
+        if op == "output":
+            return self.board.output(args[0], args[1])
+        if op == "output_many":
+            return self.board.output_many({pin: state for pin, state in args[0]})
+        if op == "add_event_detect":
+            pin, edge_name, bouncetime = args
+            self.board.add_event_detect(pin, Board.Edge(edge_name), edge, bouncetime)
+            detected_pins.add(pin)
+            return None
+        if op == "remove_event_detect":
+            detected_pins.discard(args[0])
+            return self.board.remove_event_detect(args[0])
+        if op == "open_serial":
+            handle = len(self._serials) + 1
+            self._serials[handle] = self.board.open_serial(args[0], args[1])
+            return handle
+        if op == "serial_write":
+            return self._serials[args[0]].write(bytes.fromhex(args[1]))
+        if op == "serial_close":
+            return self._serials.pop(args[0]).close()
+        if op == "stop_sound":
+            if self.sound is not None:
+                self.sound.stop()
+            return None
+        if op == "cleanup":
+            detected_pins.clear()
+            return self.board.cleanup()
+        raise ValueError(f"Unknown remote board operation - {op}")
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Station agent - python -m AlephPi.RemoteBoard [--port 8770] [--simulated] [--sound [--config aleph_config.ini]]"""
+    parser = argparse.ArgumentParser(description="Serve this station's board to a multi-station game host.")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--simulated", action="store_true", help="Serve a simulated board.")
+    parser.add_argument("--sound", action="store_true", help="Play the game sounds on this station's speaker.")
+    parser.add_argument("--config", default="aleph_config.ini", help="Config file of the sound - its [Audio Files] section.")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    board = Board.SimulatedBoard() if args.simulated else Board.RPiBoard()
+    sound = None
+    if args.sound:
+        # The mixer is needed only by stations with a speaker
+        from . import Sound
+
+        config = configparser.ConfigParser()
+        config.read(args.config)
+        if not config.has_section("Audio Files"):
+            config.add_section("Audio Files")
+        sound = Sound.Sound(config["Audio Files"])
+    server = BoardServer(board, args.host, args.port, sound)
+    logging.info(f"Serving the board on {server.host}:{server.port}")
+    try:
+        server.serve_forever()
+    finally:
+        board.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+import os
+import configparser
+from concurrent.futures import Future
+from typing import List
+
+from . import Logger, RemoteBoard, Sound, Tracing
+
+
+class RemoteSound:
+    """Plays the game sounds on a remote station's speaker - stands for Sound in multi-station mode.
+
+    The play requests are sent through the remote board protocol and played by the station agent (python -m AlephPi.RemoteBoard --sound),
+    from the station's own copy of the audio files - the paths are the same on the host and on the station.
+    Like Sound, clips are played back to back and every play request completes when its clips finished playing.
+
+    Attributes:
+        board (RemoteBoard): The station board connection.
+        correct_answers_folders (str): A path to a folder containing all the right answers audio files.
+        audio_files (Dict[str, str]): key = sound description, value = file path.
+        tracer (Tracer): Traces the playbacks in the turn of the station's game.
+    """
+
+    @Logger.log_function
+    def __init__(self, board: RemoteBoard.RemoteBoard, config_audio_section: configparser.SectionProxy) -> None:
+        """Constructs RemoteSound.
+
+        Args:
+            board (RemoteBoard): The station board connection.
+            config_audio_section (configparser.SectionProxy): The [Audio Files] config section.
+        """
+        self.board = board
+        self.correct_answers_folders = Sound.configured_correct_answers_folder(config_audio_section)
+        self.audio_files = Sound.configured_audio_files(config_audio_section)
+        self.tracer = Tracing.tracer
+
+    @Logger.log_function
+    def play_game_sound(self, sound: Sound.GameSound, wait: bool = True) -> Future:
+        """Play a pre-defined audio sound on the station.
+
+        Args:
+            sound (GameSound): A key that describes the sound to be played.
+            wait (bool, optional): Block until the sound is fully played. Defaults to True.
+
+        Returns:
+            Future: Completed when the sound finished playing.
+        """
+        return self.play_audio_file(self.audio_files[sound.value], wait)
+
+    @Logger.log_function
+    def play_audio_file(self, filepath: str, wait: bool = True) -> Future:
+        """Play an audio file on the station.
+
+        Args:
+            filepath (str): path to an audio file to play.
+            wait (bool, optional): Block until the file is fully played. Defaults to True.
+
+        Returns:
+            Future: Completed when the file finished playing.
+        """
+        future = self.play_async([filepath])
+        if wait:
+            future.result()
+        return future
+
+    @Logger.log_function
+    def play_async(self, filepaths: List[str]) -> Future:
+        """Queue audio files to be played back to back on the station, without blocking the caller.
+
+        Args:
+            filepaths (List[str]): paths to audio files to play, in order.
+
+        Raises:
+            EnvironmentError: In case the station is disconnected.
+
+        Returns:
+            Future: Completed when the last file finished playing, cancelled if playback was stopped before.
+            Fails with EnvironmentError when the station couldn't play them or disconnected.
+        """
+        future = Future()
+        if not filepaths:
+            future.set_result(None)
+            return future
+        request = self.board.request_async("play", [list(filepaths)])
+
+        # Traced until the playback ends (or is stopped)
+        token = self.tracer.begin(
+            "play:" + "+".join(os.path.splitext(os.path.basename(filepath))[0] for filepath in filepaths)
+        )
+        future.add_done_callback(lambda _: self.tracer.end(token))
+
+        def played(response: Future) -> None:
+            if response.exception() is not None:
+                future.set_exception(response.exception())
+            elif response.result():
+                future.set_result(None)
+            else:
+                future.cancel()
+
+        request.add_done_callback(played)
+        return future
+
+    @Logger.log_function
+    def stop(self) -> None:
+        """Stop the playing clip and drop all queued clips on the station, cancelling their play requests."""
+        if self.board.connected:
+            self.board.request("stop_sound", [], wait=False)
+
+    def correct_answer_file(self, letter: str) -> str:
+        """Returns the audio file of a letter correct answer.
+
+        Args:
+            letter (str): The verbal value of the letter. (for example: "aleph")
+
+        Returns:
+            str: Path to the letter audio file.
+        """
+        return os.path.join(self.correct_answers_folders, f"{letter}.mp3")
@@ -1,25 +1,84 @@
-import serial
-from . import Logger
+import time
+import threading
+from typing import Optional, Tuple
+
+from . import Board, Logger
+
+# SparkFun serial 7-segment commands
+CLEAR_DISPLAY = 0x76
+DECIMAL_CONTROL = 0x77
+CURSOR_CONTROL = 0x79
+BRIGHTNESS_CONTROL = 0x7A
+# The display shows "x" as a blank digit
+BLANK = "x"
+DIGITS = 4
+# Decimal control bits - bit i is the point after digit i, bit 4 the colon
+COLON = 0x10
+
+
+def frame_commands(
+    shown: Optional[Tuple[str, int]], cursor: Optional[int], target: Tuple[str, int]
+) -> Tuple[bytes, int]:
+    """Computes the minimal commands changing the display from its shown frame to a target frame.
+    Only the changed digits are written, a cursor command is sent only when the digit isn't the one after the last written digit.
+    A clear and full rewrite is used when it's shorter (or the shown frame is unknown).
+
+    Args:
+        shown (Optional[Tuple[str, int]]): (digits, decimals) shown by the display, None when unknown.
+        cursor (Optional[int]): The display cursor position, None when unknown.
+        target (Tuple[str, int]): (digits, decimals) to be shown - 4 characters (BLANK for a blank digit) and the decimal control bits.
+
+    Returns:
+        Tuple[bytes, int]: The commands and the cursor position after them.
+    """
+    digits, decimals = target
+
+    # Clearing blanks all the digits and moves the cursor to the first one
+    last = max([i for i, char in enumerate(digits) if char != BLANK], default=-1)
+    commands = bytearray([CLEAR_DISPLAY]) + digits[: last + 1].encode("ascii")
+    new_cursor = (last + 1) % DIGITS
+
+    if shown is not None:
+        changed = bytearray()
+        changed_cursor = cursor
+        for i, char in enumerate(digits):
+            if char == shown[0][i]:
+                continue
+            if changed_cursor != i:
+                changed += bytes([CURSOR_CONTROL, i])
+            changed += char.encode("ascii")
+            changed_cursor = (i + 1) % DIGITS
+        if len(changed) <= len(commands):
+            commands, new_cursor = changed, changed_cursor
+
+    if shown is None or shown[1] != decimals:
+        commands += bytes([DECIMAL_CONTROL, decimals])
+    return bytes(commands), new_cursor
 
 
 class SevenSegmentDisplay:
     """Represents a 7-segment display controlled by a serial port.
     This implementation is tailored to SparkFun 7-segment display - https://www.sparkfun.com/products/11441
-    The 7-segment display is used to display the amount of "lives" the user still has before the game is over.
+    The 7-segment display is used to display the amount of "lives" the user still has before the game is over, the score and a countdown while recording.
+
+    Updates never block the caller - they only set the frame to be shown. A dedicated writer thread keeps a framebuffer of the shown digits,
+    and sends only the commands needed to reach the latest frame (rapid updates are coalesced to a single write).
 
     Raises:
         EnvironmentError: In case the serial port cannot be opened.
 
     Attributes:
-        serial: A serial.Serial instance for communicating with the display controller.
-
+        serial: A serial.Serial compatible instance for communicating with the display controller.
+        bytes_written (int): Bytes sent to the display by the writer thread.
+        frames_written (int): Frames sent to the display by the writer thread.
     """
 
     @Logger.log_function
-    def __init__(self, serial_port: str, bandwidth: int) -> None:
+    def __init__(self, board: Board.Board, serial_port: str, bandwidth: int) -> None:
         """Constructs SevenSegementDisplay, controlled by serial port.
 
         Args:
+            board (Board): The board backend the serial port is opened on.
             serial_port (str, optional): COM port. Defaults to '/dev/serial0'.
             bandwidth (int, optional): serial bandwidth. Defaults to 9600.
 
@@ -27,18 +86,33 @@ class SevenSegmentDisplay:
             EnvironmentError: In case serial port initialization failed.
             Exception: In case serial port failed to transmit non-nulled messages
         """
-        self.serial = serial.Serial(serial_port, bandwidth)
+        self.serial = board.open_serial(serial_port, bandwidth)
         if not self.serial.isOpen():
             raise EnvironmentError(
                 f"Failed to open serial port - {serial_port}. Possible solutions - (1) Check if port is used by other process. (2) Make sure the correct port number is listed in the config file. (3) If you don't have 7-segment display, please disable it in the config file"
             )
 
         # Set brightness to max, check if serial port successfully writes non-zero messages
-        if (self.serial.write(b"\x7A") != 0) and (self.serial.write(b"FFFFF") != 0):
+        if (self.serial.write(b"\x7A") == 0) or (self.serial.write(b"FFFFF") == 0):
             raise Exception(
                 "Serial port didn't write commands properly to 7-segment display."
             )
 
+        self.bytes_written = 0
+        self.frames_written = 0
+        # What the display shows - unknown until the first frame is written
+        self._shown = None
+        self._cursor = None
+        # The frame to be shown, and the temporary content shown over it
+        self._frame = (BLANK * DIGITS, 0)
+        self._flash = None
+        self._flash_until = 0.0
+        self._countdown_until = 0.0
+        self._closed = False
+        self._changed = threading.Condition()
+        self._writer = threading.Thread(target=self._run, daemon=True)
+        self._writer.start()
+
     def __del__(self):
         self.close_connection()
 
@@ -50,15 +124,25 @@ class SevenSegmentDisplay:
             EnvironmentError: In case the port is closed.
 
         Returns:
-            bool: Clear succeeded.
+            bool: Clear was scheduled.
         """
         if not self.serial.isOpen():
             raise EnvironmentError(
                 f"Failed to communicate with serial port - {self.serial.name}. Port is closed."
             )
+        self.show("")
+        return True
 
-        # Clear serial display
-        return self.serial.write(b"\x76") != 0
+    def show(self, text: str, decimals: int = 0) -> None:
+        """Show up to 4 characters, left aligned. Returns immediately, the writer thread updates the display.
+
+        Args:
+            text (str): Digits, hexadecimal letters or spaces.
+            decimals (int, optional): Decimal control bits - bit i is the point after digit i, bit 4 (COLON) the colon. Defaults to 0.
+        """
+        with self._changed:
+            self._frame = (self._digits(text), decimals)
+            self._changed.notify()
 
     @Logger.log_function
     def write_lives(self, lives: int) -> bool:
@@ -68,16 +152,99 @@ class SevenSegmentDisplay:
             lives (int): The lives to be written.
 
         Returns:
-            bool: Write succeeded.
+            bool: Write was scheduled.
+        """
+        # Generate lives string, so if lives = 4 --> "1234" will be written
+        self.show("".join([str(i) for i in range(1, min(lives, DIGITS) + 1)]))
+        return True
+
+    def write_score(self, score: int, seconds: Optional[float] = None) -> None:
+        """Write a score, right aligned.
+
+        Args:
+            score (int): The score, up to 9999.
+            seconds (Optional[float], optional): Show the score for this many seconds over the current content. Defaults to showing it until the next update.
         """
-        if self.clear_display():
-            # Generate lives string, so if lives = 4 --> "1234" will be written
-            lives_str = "".join([str(i) for i in range(1, lives + 1)])
-            return self.serial.write(lives_str.encode("utf-8")) != 0
-        return False
+        text = str(max(0, min(score, 9999))).rjust(DIGITS)
+        if seconds is None:
+            self.show(text)
+        else:
+            self.flash(text, seconds)
+
+    def flash(self, text: str, seconds: float, decimals: int = 0) -> None:
+        """Show content for a while over the current content, which is restored afterwards.
+
+        Args:
+            text (str): Up to 4 characters, left aligned.
+            seconds (float): Duration.
+            decimals (int, optional): Decimal control bits. Defaults to 0.
+        """
+        with self._changed:
+            self._flash = (self._digits(text), decimals)
+            self._flash_until = time.monotonic() + seconds
+            self._changed.notify()
+
+    def start_countdown(self, seconds: float) -> None:
+        """Count down the remaining seconds (with tenths) over the current content, which is restored when the countdown ends.
+
+        Args:
+            seconds (float): The countdown duration.
+        """
+        with self._changed:
+            self._countdown_until = time.monotonic() + seconds
+            self._changed.notify()
+
+    def stop_countdown(self) -> None:
+        """Stop the countdown, restoring the current content."""
+        with self._changed:
+            self._countdown_until = 0.0
+            self._changed.notify()
 
     @Logger.log_function
     def close_connection(self) -> None:
-        """Close the serial connection in case it's opened."""
+        """Write the last frame, and close the serial connection in case it's opened."""
+        if getattr(self, "_writer", None) and not self._closed:
+            with self._changed:
+                self._closed = True
+                self._changed.notify()
+            self._writer.join(1)
         if self.serial.isOpen():
             self.serial.close()
+
+    def _digits(self, text: str) -> str:
+        return text[:DIGITS].ljust(DIGITS).replace(" ", BLANK)
+
+    def _render(self, now: float) -> Tuple[Tuple[str, int], Optional[float]]:
+        """Returns the frame to be shown now, and the seconds until it changes by itself (None when it doesn't). Called with the lock held."""
+        if now < self._countdown_until:
+            remaining = self._countdown_until - now
+            tenths = int(remaining * 10) + 1
+            # Tenths with the point after the third digit - " 1.9"
+            return (self._digits(str(tenths).rjust(2, "0").rjust(DIGITS)), 1 << 2), remaining - (tenths - 1) / 10
+        if now < self._flash_until:
+            return self._flash, self._flash_until - now
+        return self._frame, None
+
+    def _run(self) -> None:
+        while True:
+            with self._changed:
+                while True:
+                    frame, timeout = self._render(time.monotonic())
+                    if frame != self._shown or self._closed:
+                        break
+                    self._changed.wait(timeout)
+                closed = self._closed
+
+            commands, cursor = frame_commands(self._shown, self._cursor, frame)
+            if commands:
+                try:
+                    self.serial.write(commands)
+                except (EnvironmentError, ValueError):
+                    # Closed port - resend everything if it's ever written again
+                    self._shown, self._cursor = None, None
+                    return
+                self.bytes_written += len(commands)
+                self.frames_written += 1
+            self._shown, self._cursor = frame, cursor
+            if closed:
+                return
@@ -1,111 +1,363 @@
 import os
-import time
+import threading
 import subprocess
 import configparser
+from collections import deque
+from concurrent.futures import Future
 from enum import Enum
+from typing import Dict, List, Optional
 
+import pygame
 from pygame import mixer
 
-from . import Logger
+from . import Logger, SoundBank, Startup, Tracing
 
 
 class GameSound(Enum):
     """Proxy-Enum to be used for playing pre-defined sounds."""
 
-    START_GAME = ("start_game",)
-    GAME_OVER = ("game_over",)
-    START_RECORD = ("start_record",)
-    CORRECT_ANSWER = ("correct_answer",)
-    INCORRECT_ANSWER = ("incorrect_answer",)
-    GOOGLE_API_RECOGNITION_ERROR = ("google_api_recognition_error",)
-    GOOGLE_API_TIMEOUT = ("google_api_timeout",)
-    GOOGLE_API_REQUEST_ERROR = ("google_api_request_err",)
-    FATAL_ERROR = ("fatal_error",)
+    START_GAME = "start_game"
+    GAME_OVER = "game_over"
+    START_RECORD = "start_record"
+    CORRECT_ANSWER = "correct_answer"
+    INCORRECT_ANSWER = "incorrect_answer"
+    GOOGLE_API_RECOGNITION_ERROR = "google_api_recognition_error"
+    GOOGLE_API_TIMEOUT = "google_api_timeout"
+    GOOGLE_API_REQUEST_ERROR = "google_api_request_err"
+    FATAL_ERROR = "fatal_error"
     NO_INTERNET = "no_internet"
 
 
+# Posted by the playback channel every time a clip finishes playing (or is stopped). Channel i posts SOUND_END_EVENT + i.
+SOUND_END_EVENT = pygame.USEREVENT + 1
+
+# The mixer and the end events dispatcher are shared by all Sound instances of the process - they all play on the same output device
+_players = {}
+_players_lock = threading.Lock()
+# The sound card reset runs in the background while the game starts, the first play and the audio devices wait for it (see wait_card_ready)
+_card_ready = None
+
+
+class _PlaylistEntry:
+    """A single clip waiting on the playback channel. The future is set only on the last clip of a play request."""
+
+    def __init__(self, clip: mixer.Sound, future: Optional[Future]) -> None:
+        self.clip = clip
+        self.future = future
+
+
 class Sound:
     """A Proxy-Class for pygame.mixer functionality - sound playing"""
 
     @Logger.log_function
-    def __init__(self, config_audio_section: configparser.SectionProxy) -> None:
+    def __init__(
+        self,
+        config_audio_section: configparser.SectionProxy,
+        channel_id: int = 0,
+        sound_bank: Optional[SoundBank.SoundBank] = None,
+    ) -> None:
         """Constructs a Sound object, initiallizing the mixer for playback, and setting audio files.
 
         Attributes:
             correct_answers_folders (str): A path to a folder containing all the right answers audio files (to be played after the user said incorrect answer)
             audio_files (configparser.SectionProxy): configparser.SectionProxy for audio files. key = sound description, value = file path.
+            sound_bank (SoundBank): In-memory cache of decoded clips, every clip is decoded once and played from memory afterwards.
+                Pass a shared bank to decode the clips once for several Sound instances. Defaults to a new bank.
+            channel_id (int): The mixer channel reserved for this instance. All the instances of the process play on the same output device. Defaults to 0.
+            tracer (Tracer): Traces the playbacks in the turn of this instance's game, the station tracer in multi-station mode.
+
+        Playback is asynchronous - clips are queued on a dedicated mixer channel and played back to back, a dispatcher thread waits for the channel end events and completes the play requests futures.
+        The mixer, the sound card reset and the dispatcher thread are shared by all the instances of the process.
+        The audio files are checked while the mixer initializes, the sound card reset and the sound bank preload (once the reset is done) run in the background.
 
         Raises:
-            EnvironmentError: In case of a mixer failure.
+            EnvironmentError: In case of a mixer failure. Sound card failures are raised by the first play.
             FileNotFoundError: In case one of the audio file doesn't exists.
         """
 
-        mixer.init()
-        if not mixer.get_init():
-            raise EnvironmentError("Cannot init sound controller - mixer init failed")
-
-        self.correct_answers_folders = os.path.join("audio", "correct_answers")
-
-        # Default audio files, in case a different file was supplied in the config file, override the file entry with config file input
-        self.audio_files = {
-            "start_game": os.path.join("audio", "start_game.mp3"),
-            "game_over": os.path.join("audio", "game_over.mp3"),
-            "start_record": os.path.join("audio", "start_record.mp3"),
-            "correct_answer": os.path.join("audio", "correct_answer.mp3"),
-            "incorrect_answer": os.path.join("audio", "incorrect_answer.mp3"),
-            "google_api_recognition_error": os.path.join(
-                "audio", "google_api_cant_understand.mp3"
-            ),
-            "google_api_timeout": os.path.join("audio", "google_api_timeout.mp3"),
-            "google_api_request_err": os.path.join(
-                "audio", "google_api_request_err.mp3"
-            ),
-            "fatal_error": os.path.join("audio", "fatal_error.mp3"),
-            "no_internet": os.path.join("audio", "no_internet.mp3"),
-        }
-
-        for key in self.audio_files:
-            if key in config_audio_section:
-                self.audio_files[key] = config_audio_section[key]
-
-            if not os.path.exists(self.audio_files[key]):
-                raise FileNotFoundError(
-                    f"Cannot find audio file {self.audio_files[key]}"
-                )
-
-        # Reset the sound card
-        if (
-            subprocess.call(["bash", "-c", "jack_control stop && jack_control start"])
-            != 0
-        ):
-            raise EnvironmentError(
-                "Cannot init sound card, try running jack_control command manually and make sure you have sufficient permissions."
+        self._playlist = deque()
+        self._now_playing = None
+        self._queued = None
+        self._ignored_end_events = 0
+        self._playlist_lock = threading.Lock()
+        self.tracer = Tracing.tracer
+
+        self.correct_answers_folders = configured_correct_answers_folder(config_audio_section)
+        self.audio_files = configured_audio_files(config_audio_section)
+        files_checked = Startup.profile.background("audio files check", self._check_audio_files)
+
+        with _players_lock:
+            if not _players:
+                _init_mixer()
+            # The playlist channels are reserved, so clips played elsewhere won't steal them.
+            if mixer.get_num_channels() <= channel_id:
+                mixer.set_num_channels(channel_id + 1)
+            mixer.set_reserved(max([channel_id] + [player._channel_id for player in _players.values()]) + 1)
+            self._channel_id = channel_id
+            self._end_event = SOUND_END_EVENT + channel_id
+            self._channel = mixer.Channel(channel_id)
+            self._channel.set_endevent(self._end_event)
+            pygame.event.set_allowed(self._end_event)
+            _players[self._end_event] = self
+        files_checked.result()
+
+        # Decode all game sounds and correct answers once, so playing them won't wait for the SD card and the MP3 decoder.
+        if sound_bank is None:
+            sound_bank = SoundBank.SoundBank(
+                int(config_audio_section.getfloat("sound_bank_max_mb", 32) * 1024 * 1024)
+            )
+        self.sound_bank = sound_bank
+        if config_audio_section.getboolean("sound_bank_preload", True):
+            # Clips played before the preload reached them are decoded on demand
+            Startup.profile.background(
+                "sound bank preload",
+                self._preload,
+                list(self.audio_files.values()) + self.correct_answers_files(),
             )
 
     @Logger.log_function
-    def play_game_sound(self, sound: GameSound) -> None:
+    def play_game_sound(self, sound: GameSound, wait: bool = True) -> Future:
         """Play a pre-defined audio sound.
 
         Args:
             sound (GameSound): A key that describes the sound to be played.
+            wait (bool, optional): Block until the sound is fully played. Defaults to True.
+
+        Returns:
+            Future: Completed when the sound finished playing.
         """
-        self.play_audio_file(self.audio_files[GameSound.value])
+        return self.play_audio_file(self.audio_files[sound.value], wait)
 
     @Logger.log_function
-    def play_audio_file(self, filepath: str) -> None:
-        """Playing an audio file, while blocking the thread until sound is fully played.
+    def play_audio_file(self, filepath: str, wait: bool = True) -> Future:
+        """Playing an audio file from the sound bank.
 
         Args:
             filepath (str): path to an audio file to play.
+            wait (bool, optional): Block until the file is fully played. Defaults to True.
+
+        Returns:
+            Future: Completed when the file finished playing.
+        """
+        future = self.play_async([filepath])
+        if wait:
+            future.result()
+        return future
+
+    @Logger.log_function
+    def play_async(self, filepaths: List[str]) -> Future:
+        """Queue audio files to be played back to back, without blocking the caller.
+        Files are played after any previously queued request, without gaps between the clips.
+
+        Args:
+            filepaths (List[str]): paths to audio files to play, in order.
+
+        Raises:
+            EnvironmentError: In case the sound card reset failed.
+
+        Returns:
+            Future: Completed when the last file finished playing, cancelled if playback was stopped before.
+        """
+        wait_card_ready()
+        future = Future()
+        clips = [self.sound_bank.get(filepath) for filepath in filepaths]
+        if not clips:
+            future.set_result(None)
+            return future
+
+        # Traced until the playback ends (or is stopped)
+        token = self.tracer.begin(
+            "play:" + "+".join(os.path.splitext(os.path.basename(filepath))[0] for filepath in filepaths)
+        )
+        future.add_done_callback(lambda _: self.tracer.end(token))
+
+        with self._playlist_lock:
+            for clip in clips[:-1]:
+                self._playlist.append(_PlaylistEntry(clip, None))
+            self._playlist.append(_PlaylistEntry(clips[-1], future))
+            self._feed_channel()
+        return future
+
+    @Logger.log_function
+    def stop(self) -> None:
+        """Stop the playing clip and drop all queued clips, cancelling their play requests."""
+        with self._playlist_lock:
+            entries = [self._now_playing, self._queued] + list(self._playlist)
+            self._playlist.clear()
+            # Every clip handed to the channel posts exactly one end event, even when it's stopped.
+            started = [entry for entry in (self._now_playing, self._queued) if entry]
+            self._ignored_end_events += len(started)
+            self._now_playing = None
+            self._queued = None
+            # Halting the channel starts its queued clip, so halt it once more for that one.
+            for _ in started:
+                self._channel.stop()
+
+        for entry in entries:
+            if entry and entry.future:
+                entry.future.cancel()
+
+    def _feed_channel(self) -> None:
+        """Hand the next clips of the playlist to the channel - one playing and one queued behind it. Must be called with the playlist lock held."""
+        if self._now_playing is None and self._playlist:
+            self._now_playing = self._playlist.popleft()
+            self._channel.play(self._now_playing.clip)
+        if self._now_playing is not None and self._queued is None and self._playlist:
+            self._queued = self._playlist.popleft()
+            self._channel.queue(self._queued.clip)
+
+    def _channel_ended(self) -> None:
+        """Handle an end event of the channel, completing the finished play request and feeding the channel with the next clips."""
+        with self._playlist_lock:
+            if self._ignored_end_events:
+                self._ignored_end_events -= 1
+                return
+            finished = self._now_playing
+            # The queued clip already started playing when the previous one ended.
+            self._now_playing = self._queued
+            self._queued = None
+            self._feed_channel()
+
+        if finished and finished.future and not finished.future.done():
+            finished.future.set_result(None)
+
+    def _preload(self, filepaths: List[str]) -> None:
+        """Decode audio files into the sound bank once the sound card reset is done."""
+        wait_card_ready()
+        self.sound_bank.preload(filepaths)
+
+    def _check_audio_files(self) -> None:
+        """Raises FileNotFoundError in case one of the audio files doesn't exist."""
+        for filepath in self.audio_files.values():
+            if not os.path.exists(filepath):
+                raise FileNotFoundError(f"Cannot find audio file {filepath}")
+
+    def correct_answer_file(self, letter: str) -> str:
+        """Returns the audio file of a letter correct answer.
+
+        Args:
+            letter (str): The verbal value of the letter. (for example: "aleph")
+
+        Returns:
+            str: Path to the letter audio file.
         """
-        mixer.music.load(filepath)
-        mixer.music.play()
+        return os.path.join(self.correct_answers_folders, f"{letter}.mp3")
 
-        # Make sure the mixer finished playing the audio file.
-        # TODO: replace it with pygame.mixer.music.set_endevent()
-        while mixer.music.get_busy():
-            time.sleep(20)
-        time.sleep(20)
+    def correct_answers_files(self) -> List[str]:
+        """Lists the audio files of the correct answers folder.
+
+        Returns:
+            List[str]: Paths to all correct answers audio files.
+        """
+        return [
+            os.path.join(self.correct_answers_folders, filename)
+            for filename in sorted(os.listdir(self.correct_answers_folders))
+            if filename.endswith(".mp3")
+        ]
 
     def __del__(self):
-        mixer.quit()
+        with _players_lock:
+            if _players.pop(getattr(self, "_end_event", None), None) is self and not _players:
+                mixer.quit()
+
+
+def configured_correct_answers_folder(config_audio_section: configparser.SectionProxy) -> str:
+    """Returns the folder of the correct answers audio files, <letter>.mp3.
+
+    Args:
+        config_audio_section (configparser.SectionProxy): The [Audio Files] config section.
+
+    Returns:
+        str: The correct_answers_folders config value, defaults to audio/correct_answers.
+    """
+    return config_audio_section.get("correct_answers_folders", os.path.join("audio", "correct_answers"))
+
+
+def configured_audio_files(config_audio_section: configparser.SectionProxy) -> Dict[str, str]:
+    """Returns the game sounds audio files - the default files, overridden by the config.
+
+    Args:
+        config_audio_section (configparser.SectionProxy): The [Audio Files] config section.
+
+    Returns:
+        Dict[str, str]: key = sound description (GameSound value), value = file path.
+    """
+    audio_files = {
+        "start_game": os.path.join("audio", "start_game.mp3"),
+        "game_over": os.path.join("audio", "game_over.mp3"),
+        "start_record": os.path.join("audio", "start_record.mp3"),
+        "correct_answer": os.path.join("audio", "correct_answer.mp3"),
+        "incorrect_answer": os.path.join("audio", "incorrect_answer.mp3"),
+        "google_api_recognition_error": os.path.join(
+            "audio", "google_api_cant_understand.mp3"
+        ),
+        "google_api_timeout": os.path.join("audio", "google_api_timeout.mp3"),
+        "google_api_request_err": os.path.join(
+            "audio", "google_api_request_err.mp3"
+        ),
+        "fatal_error": os.path.join("audio", "fatal_error.mp3"),
+        "no_internet": os.path.join("audio", "no_internet.mp3"),
+    }
+
+    # In case a different file was supplied in the config file, override the file entry with config file input
+    for key in audio_files:
+        if key in config_audio_section:
+            audio_files[key] = config_audio_section[key]
+    return audio_files
+
+
+def wait_card_ready() -> None:
+    """Wait for the sound card reset - the audio server restarts with it, so the clips and the microphones are opened once it's done.
+    Returns right away when no Sound instance was created.
+
+    Raises:
+        EnvironmentError: In case the sound card reset failed.
+    """
+    if _card_ready is not None:
+        _card_ready.result()
+
+
+def _init_mixer() -> None:
+    """Init the mixer, start the sound card reset and the end events dispatcher. Called once, by the first Sound instance.
+
+    Raises:
+        EnvironmentError: In case of a mixer failure.
+    """
+    global _card_ready
+    if not mixer.get_init():
+        mixer.init()
+    if not mixer.get_init():
+        raise EnvironmentError("Cannot init sound controller - mixer init failed")
+
+    # Channel end events are posted only when the video subsystem is up, a dummy driver is enough for a headless board.
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    pygame.display.init()
+    pygame.event.set_blocked(None)
+
+    if _card_ready is None:
+        _card_ready = Startup.profile.background("sound card reset", _reset_sound_card)
+    threading.Thread(target=_dispatch_end_events, daemon=True).start()
+
+
+def _reset_sound_card() -> None:
+    """Reset the sound card.
+
+    Raises:
+        EnvironmentError: In case of a sound card failure.
+    """
+    if (
+        subprocess.call(["bash", "-c", "jack_control stop && jack_control start"])
+        != 0
+    ):
+        raise EnvironmentError(
+            "Cannot init sound card, try running jack_control command manually and make sure you have sufficient permissions."
+        )
+
+
+def _dispatch_end_events() -> None:
+    """Wait for the channels end events, routing each one to the Sound instance playing on the channel. Runs in a dedicated thread."""
+    while True:
+        event = pygame.event.wait()
+        player = _players.get(event.type)
+        if player is not None:
+            player._channel_ended()
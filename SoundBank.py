@@ -0,0 +1,132 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable
+
+from pygame import mixer
+
+from . import Logger
+
+
+class SoundBank:
+    """A size-bounded LRU cache of decoded audio clips.
+
+    Every clip is decoded once into a pygame.mixer.Sound (PCM buffer held in memory), so playing it again doesn't touch the SD card.
+    When the decoded buffers exceed max_bytes the least recently played clips are evicted.
+
+    Attributes:
+        max_bytes (int): Upper bound for the decoded PCM buffers held by the bank.
+        hits (int): Number of lookups served from memory.
+        misses (int): Number of lookups that required decoding the file.
+        evictions (int): Number of clips dropped to stay under max_bytes.
+    """
+
+    @Logger.log_function
+    def __init__(self, max_bytes: int) -> None:
+        """Constructs an empty SoundBank. The mixer must be initialized before clips are loaded.
+
+        Args:
+            max_bytes (int): Upper bound for the decoded PCM buffers held by the bank.
+
+        Raises:
+            EnvironmentError: In case the mixer isn't initialized.
+        """
+        self._mixer_format = mixer.get_init()
+        if not self._mixer_format:
+            raise EnvironmentError("Cannot init sound bank - mixer isn't initialized")
+
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._clips = OrderedDict()
+        self._clips_bytes = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    @Logger.log_function
+    def preload(self, filepaths: Iterable[str]) -> None:
+        """Decode all the given files into memory, so the first play of each file won't wait for decoding.
+
+        Args:
+            filepaths (Iterable[str]): Paths to audio files to decode.
+        """
+        for filepath in filepaths:
+            self.get(filepath, count_stats=False)
+
+    def get(self, filepath: str, count_stats: bool = True) -> mixer.Sound:
+        """Returns the decoded clip for an audio file, decoding it on first use.
+
+        Args:
+            filepath (str): Path to an audio file.
+            count_stats (bool, optional): Update hits / misses counters. Defaults to True.
+
+        Raises:
+            FileNotFoundError: In case the audio file doesn't exist.
+
+        Returns:
+            mixer.Sound: The decoded clip, ready to be played.
+        """
+        key = os.path.normpath(filepath)
+        with self._lock:
+            clip = self._clips.get(key)
+            if clip is not None:
+                self._clips.move_to_end(key)
+                if count_stats:
+                    self.hits += 1
+                return clip
+
+        if not os.path.exists(key):
+            raise FileNotFoundError(f"Cannot find audio file {filepath}")
+
+        # Decode outside the lock, decoding a clip takes a while and other clips may still be served meanwhile.
+        clip = mixer.Sound(file=key)
+        clip_bytes = self._decoded_size(clip)
+
+        with self._lock:
+            if count_stats:
+                self.misses += 1
+            if key not in self._clips:
+                self._clips[key] = clip
+                self._clips_bytes[key] = clip_bytes
+                self._bytes += clip_bytes
+                self._evict()
+            return clip
+
+    def stats(self) -> Dict[str, int]:
+        """Returns the bank counters.
+
+        Returns:
+            Dict[str, int]: hits, misses, evictions, clips count and decoded bytes held in memory.
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "clips": len(self._clips),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+    def _evict(self) -> None:
+        """Drop the least recently used clips until the bank is under max_bytes. The newest clip is always kept. Must be called with the lock held."""
+        while self._bytes > self.max_bytes and len(self._clips) > 1:
+            key, _ = self._clips.popitem(last=False)
+            self._bytes -= self._clips_bytes.pop(key)
+            self.evictions += 1
+
+    def _decoded_size(self, clip: mixer.Sound) -> int:
+        """Calculates the size of a decoded clip buffer without copying it.
+
+        Args:
+            clip (mixer.Sound): A decoded clip.
+
+        Returns:
+            int: Size of the PCM buffer in bytes.
+        """
+        frequency, sample_format, channels = self._mixer_format
+        # The format is the sample size in bits, negative for signed samples.
+        sample_bytes = abs(sample_format) // 8
+        return int(clip.get_length() * frequency) * channels * sample_bytes
@@ -1,25 +1,60 @@
 import os
-import json
+import math
 import time
-import threading
 import logging
 import configparser
-from typing import List, Tuple
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError
+from typing import Callable, List, Optional, Tuple
 
-import RPi.GPIO as GPIO
 import speech_recognition as sr
-import requests
 
-from . import Logger, Sound
+from . import (
+    AudioBuffer,
+    AudioCapture,
+    AudioPreparation,
+    CircuitBreaker,
+    ConnectivityMonitor,
+    HedgedRecognition,
+    KeywordSpotter,
+    LedAnimator,
+    Logger,
+    RecognitionIndex,
+    RecognitionPool,
+    RecordingArchive,
+    RecognizerBackend,
+    Sound,
+    Startup,
+    StreamingRecognizer,
+    Tracing,
+    VoiceActivityDetector,
+)
 
 
 class SpeechRecognition:
     """Responsible for recording user, submitting the audio file to Google for recognition and analyzing the result.
 
     Attributes:
-        recognizer (speech_recognition.Recognizer): Google API recognizer.
+        recognition_index (RecognitionIndex): The recognition options (alias said by the user -> letter), compiled for exact and approximate matching. Reloaded when the file changes.
+        recognizer_backend (RecognizerBackend): The backend recognizing the records - Google's API, the offline keyword spotter, or several of them hedged (see HedgedBackend).
+        connectivity_monitor (ConnectivityMonitor): Cached internet connectivity state, and the keep-alive session used for all recognition traffic.
+        streaming_transport (StreamingTransport): In streaming mode, the service the audio is streamed to while the user is still talking. None in batch mode.
         microphone (speech_recognition.Microphone): Google API microphone instance. This microphone will capture the user's input and use recognizer to recognize it.
-
+        capture (Optional[CaptureService]): Keeps the microphone open for the whole session, so records start right away with capture_pre_roll seconds from before they started. None when persistent_capture is off - every record opens the microphone.
+        voice_activity_detector (VoiceActivityDetector): Ends the records when the user stops talking, and trims their silence.
+        last_vad_report (dict): Record time and upload payload saved by the voice activity detection in the last record.
+        last_recognition (dict): The last recognition - transcript, recognized_letter (said by the backend or matched by the recognition options), backend, confidence and recording (the archived record path, None when it wasn't archived).
+        recording_archive (RecordingArchive): Archives the unrecognized and misdetected records in the background, with a retention cap.
+        audio_preparation (AudioPreparation): Resamples and encodes the records before the upload, its last_report holds the bytes before / after and encode time of the last turn. None for the offline backend.
+        circuit_breaker (CircuitBreaker): Tracks the recognizer backend failures and latency. While open, the recognitions fail fast to the fallback backend.
+        fallback_backend (Optional[RecognizerBackend]): Recognizes the records while the circuit is open. None for a free pass - the turn ends without costing a life.
+        tracer (Tracer): Traces the records and recognitions in the current turn, the station tracer in multi-station mode. The backends trace with it as the active tracer (see Tracing.activated).
+
+    Every turn has a turn_deadline seconds budget, split between the record and the recognition - the record leaves the recognition at least
+    recognition_min_budget seconds, and the recognition is abandoned (counted as a backend failure) once the budget is spent.
+
+    The mic discovery, the mic capture start, the recognition options load and the backend creation aren't needed before the first button press,
+    they run in the background and the microphone, capture, recognition_index, recognizer_backend and fallback_backend attributes wait for them on first use.
+    The mic discovery and the capture start wait for the sound card reset (see Sound.wait_card_ready), the audio server restarts with it.
     """
 
     @Logger.log_function
@@ -27,24 +62,39 @@ class SpeechRecognition:
         self,
         logger: logging.Logger,
         sound: Sound,
+        led_animator: LedAnimator.LedAnimator,
         config_sr_section: configparser.SectionProxy,
+        connectivity_monitor: Optional[ConnectivityMonitor.ConnectivityMonitor] = None,
+        microphone: Optional[sr.AudioSource] = None,
+        recognizer_backend: Optional[RecognizerBackend.RecognizerBackend] = None,
+        recording_archive: Optional[RecordingArchive.RecordingArchive] = None,
+        circuit_breaker: Optional[CircuitBreaker.CircuitBreaker] = None,
+        fallback_backend: Optional[RecognizerBackend.RecognizerBackend] = None,
     ) -> None:
         """_summary_
 
         Args:
             logger (logging.Logger): Logger instance for logging all Google's result and failures.
             sound (Sound): Sound instance for playing sounds, giving the user the approperiate feedback - success / failure / internal error.
+            led_animator (LedAnimator): Plays the listening LEDs blink.
             config_sr_section (dict): Configuration file Speech Recognition section. Will override defaults.
+            connectivity_monitor (ConnectivityMonitor, optional): A shared connectivity monitor (and its keep-alive session). Defaults to a new monitor.
+            microphone (sr.AudioSource, optional): Audio source to record from, for example recorded files in benchmarks. Defaults to the mic_name microphone.
+            recognizer_backend (RecognizerBackend, optional): Recognizer backend to use instead of the configured one. Defaults to None.
+            recording_archive (RecordingArchive, optional): A shared archive of the unrecognized and misdetected records. Defaults to a new archive.
+            circuit_breaker (CircuitBreaker, optional): A shared circuit breaker of the recognizer backend. Defaults to a new circuit breaker.
+            fallback_backend (RecognizerBackend, optional): Fallback backend to use instead of the configured one. Defaults to None.
 
         Raises:
-            IOError: In case the required JSON file with the recognition options wasn't found.
+            IOError: In case the required JSON file with the recognition options wasn't found - raised on first use of recognition_index.
         """
         self.logger = logger
         self.sound = sound
-        self._listening = False
-        self.recognition_options = None
+        self.led_animator = led_animator
+        self.tracer = Tracing.tracer
 
         self._recognition_options_file_path = "recognition_options.json"
+        self._match_min_similarity = 0.6
         # Google credentails file
         self._google_json_file = "/home/pi/Desktop/RPi_board.json"
         self._google_environment_variable_name = "GOOGLE_APPLICATION_CREDENTIALS"  # Environment variable name, to be used by SpeechRecognition.
@@ -53,8 +103,46 @@ class SpeechRecognition:
         self._sample_rate = 48000
         self._chunk_size = 2048
         self._seconds_for_record = 2
+        self._vad_energy_threshold = 400
+        self._vad_zcr_threshold = 0.25
+        self._vad_hangover = 0.3
+        self._vad_padding = 0.1
+        self._vad_pre_roll = 0.5
+        self._vad_start_timeout = 2
+        self._persistent_capture = True
+        self._capture_buffer_seconds = 10
+        self._capture_pre_roll = 0.3
+        self._listening_blink_timeout = 0.2
         self._unrecognized_folder = "unrecognized"
         self._misdetection_folder = "misdetection"
+        self._archive_max_records = 500
+        self._archive_max_mb = 200
+        self._archive_codec = "flac"
+        self._recognizer_backend = "google"
+        self._hedge_backends = ""
+        self._hedge_delay = 0.8
+        self._hedge_min_confidence = 0.5
+        self._keyword_min_confidence = 0.3
+        self._keyword_max_templates_per_letter = 10
+        self._keyword_templates_folders = ""
+        self._recognition_mode = "batch"
+        self._streaming_transport = "google_cloud"
+        self._streaming_url = "http://127.0.0.1:8765/recognize"
+        self._streaming_result_timeout = 5
+        self._google_api_key = ""
+        self._recognition_timeout = 10
+        self._turn_deadline = 10
+        self._recognition_min_budget = 2
+        self._fallback_backend = "free_pass"
+        self._circuit_window = 10
+        self._circuit_failure_threshold = 3
+        self._circuit_slow_call_seconds = 5
+        self._circuit_reset_timeout = 60
+        self._upload_sample_rate = 16000
+        self._upload_codec = "flac"
+        self._connectivity_url = "https://www.google.com/"
+        self._connectivity_timeout = 2
+        self._connectivity_interval = 30
 
         # Override default values with config values
         for key in config_sr_section:
@@ -63,19 +151,136 @@ class SpeechRecognition:
         # Set the environment variable to google API
         os.environ[self._google_environment_variable_name] = self._google_json_file
 
-        # Init recognizer
-        self.recognizer = sr.Recognizer()
-        self.recognizer.dynamic_energy_threshold = False
-        self.recognizer.energy_threshold = 400
+        # Keep the connectivity state and the connection to Google warm in the background
+        if connectivity_monitor is None:
+            connectivity_monitor = ConnectivityMonitor.ConnectivityMonitor(
+                ConnectivityMonitor.create_session(),
+                self._connectivity_url,
+                float(self._connectivity_timeout),
+                float(self._connectivity_interval),
+            )
+        self.connectivity_monitor = connectivity_monitor
+        self.connectivity_monitor.start()
 
         # Init mic
+        if microphone is None:
+            self._microphone_future = Startup.profile.background("mic discovery", self._find_microphone)
+        else:
+            self._microphone_future = Startup.completed(microphone)
+        if configparser.ConfigParser.BOOLEAN_STATES[str(self._persistent_capture).lower()]:
+            self._capture_future = Startup.profile.background("mic capture start", self._start_capture)
+        else:
+            self._capture_future = Startup.completed(None)
+
+        # End records as soon as the user stops talking
+        self.voice_activity_detector = VoiceActivityDetector.VoiceActivityDetector(
+            int(self._sample_rate),
+            float(self._vad_energy_threshold),
+            float(self._vad_zcr_threshold),
+            float(self._vad_hangover),
+            padding=float(self._vad_padding),
+        )
+        self.last_vad_report = {}
+        self.last_recognition = {}
+
+        # Compile correct answers dictionary file
+        self._recognition_index_future = Startup.profile.background(
+            "recognition options load",
+            RecognitionIndex.RecognitionIndex,
+            self._recognition_options_file_path,
+            float(self._match_min_similarity),
+        )
+
+        # Records are archived off the game turn
+        if recording_archive is None:
+            recording_archive = RecordingArchive.RecordingArchive(
+                [
+                    os.path.join(os.getcwd(), self._unrecognized_folder),
+                    os.path.join(os.getcwd(), self._misdetection_folder),
+                ],
+                int(self._archive_max_records),
+                float(self._archive_max_mb),
+                codec=self._archive_codec,
+            )
+        self.recording_archive = recording_archive
+
+        self.audio_preparation = None
+        if recognizer_backend:
+            self._recognizer_backend_future = Startup.completed(recognizer_backend)
+        else:
+            self._recognizer_backend_future = Startup.profile.background(
+                "recognizer backend creation", self._create_recognizer_backend
+            )
+        self.streaming_transport = None
+        if self._recognition_mode == "streaming":
+            self.streaming_transport = self._create_streaming_transport()
+
+        # Fail fast once the recognizer backend degrades
+        if circuit_breaker is None:
+            circuit_breaker = CircuitBreaker.CircuitBreaker(
+                "recognition",
+                int(self._circuit_window),
+                int(self._circuit_failure_threshold),
+                float(self._circuit_slow_call_seconds),
+                float(self._circuit_reset_timeout),
+            )
+        self.circuit_breaker = circuit_breaker
+        if fallback_backend or self._fallback_backend == "free_pass":
+            self._fallback_backend_future = Startup.completed(fallback_backend)
+        else:
+            self._fallback_backend_future = Startup.profile.background(
+                "fallback backend creation", self._create_backend, self._fallback_backend
+            )
+        # The recognitions run here, so a turn stops waiting for them once its budget is spent
+        self._recognition_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="recognize")
+        self._recognitions = set()
+        self._deadline = None
+        self._fallback_used = False
+
+    @property
+    def microphone(self) -> sr.AudioSource:
+        return self._microphone_future.result()
+
+    @property
+    def capture(self) -> Optional[AudioCapture.CaptureService]:
+        return self._capture_future.result()
+
+    @property
+    def recognition_index(self) -> RecognitionIndex.RecognitionIndex:
+        return self._recognition_index_future.result()
+
+    @property
+    def recognizer_backend(self) -> RecognizerBackend.RecognizerBackend:
+        return self._recognizer_backend_future.result()
+
+    @recognizer_backend.setter
+    def recognizer_backend(self, recognizer_backend: RecognizerBackend.RecognizerBackend) -> None:
+        self._recognizer_backend_future = Startup.completed(recognizer_backend)
+
+    @property
+    def fallback_backend(self) -> Optional[RecognizerBackend.RecognizerBackend]:
+        return self._fallback_backend_future.result()
+
+    @fallback_backend.setter
+    def fallback_backend(self, fallback_backend: Optional[RecognizerBackend.RecognizerBackend]) -> None:
+        self._fallback_backend_future = Startup.completed(fallback_backend)
+
+    @Logger.log_function
+    def _find_microphone(self) -> sr.Microphone:
+        """Find the mic_name microphone.
+
+        Returns:
+            sr.Microphone: The microphone.
+        """
+        # The audio server restarts with the sound card reset, its devices are listed once it's up
+        Sound.wait_card_ready()
         mic_list = sr.Microphone.list_microphone_names()
         for i, microphone_name in enumerate(mic_list):
             if microphone_name == self._mic_name:
                 mic_device_index = i
                 break
 
-        self.microphone = sr.Microphone(
+        return sr.Microphone(
             device_index=mic_device_index,
             sample_rate=int(
                 self._sample_rate
@@ -83,14 +288,105 @@ class SpeechRecognition:
             chunk_size=int(self._chunk_size),
         )
 
-        # Load correct answers dictionary file
-        if os.path.isfile(self._recognition_options_file_path):
-            with open(self._recognition_options_file_path) as json_file:
-                self.recognition_options = json.load(json_file)
-        else:
-            raise IOError(
-                f"JSON file with valid recognition options wasn't found - {self._recognition_options_file_path}"
+    @Logger.log_function
+    def _start_capture(self) -> AudioCapture.CaptureService:
+        """Open the microphone for the whole session.
+
+        Returns:
+            CaptureService: The started capture.
+        """
+        Sound.wait_card_ready()
+        capture = AudioCapture.CaptureService(self.microphone, float(self._capture_buffer_seconds))
+        capture.start()
+        return capture
+
+    @Logger.log_function
+    def close(self) -> None:
+        """Stop the mic capture, closing the microphone, and the recognitions still running."""
+        if self._capture_future.done() and self._capture_future.exception() is None and self.capture:
+            self.capture.close()
+        # Recognitions which didn't start yet are dropped, the running ones end with their backend timeout
+        for future in list(self._recognitions):
+            future.cancel()
+        self._recognition_executor.shutdown(wait=False)
+
+    @Logger.log_function
+    def _create_recognizer_backend(self) -> RecognizerBackend.RecognizerBackend:
+        """Create the recognizer backend selected in the config file - the hedged backends when listed, otherwise the recognizer backend.
+
+        Raises:
+            ValueError: In case of an unknown backend.
+
+        Returns:
+            RecognizerBackend: The recognizer backend.
+        """
+        hedge_backends = [name.strip() for name in self._hedge_backends.split(",") if name.strip()]
+        if not hedge_backends:
+            return self._create_backend(self._recognizer_backend)
+        return HedgedRecognition.HedgedBackend(
+            [self._create_backend(name) for name in hedge_backends],
+            self.recognition_index,
+            float(self._hedge_delay),
+            float(self._hedge_min_confidence),
+        )
+
+    def _create_backend(self, name: str) -> RecognizerBackend.RecognizerBackend:
+        """Create a recognizer backend by its config name.
+
+        Args:
+            name (str): google or keyword_spotting.
+
+        Raises:
+            ValueError: In case of an unknown backend.
+
+        Returns:
+            RecognizerBackend: The recognizer backend.
+        """
+        if name == "google":
+            # Upload the records at the recognition sample rate, encoded in memory
+            if self.audio_preparation is None:
+                self.audio_preparation = AudioPreparation.AudioPreparation(
+                    int(self._upload_sample_rate), self._upload_codec
+                )
+            return RecognizerBackend.GoogleBackend(
+                self.connectivity_monitor.session,
+                self._google_recognition_language,
+                self._google_api_key,
+                float(self._recognition_timeout),
+                self.audio_preparation,
+            )
+        if name == "keyword_spotting":
+            # Bootstrap the templates from the correct answers and the reviewed recordings of every letter.
+            # The unrecognized and misdetected records aren't used - their expected letter isn't necessarily the one said in them.
+            return KeywordSpotter.KeywordSpottingBackend(
+                KeywordSpotter.template_files(
+                    self.sound.correct_answers_folders,
+                    [folder.strip() for folder in self._keyword_templates_folders.split(",") if folder.strip()],
+                    int(self._keyword_max_templates_per_letter),
+                ),
+                float(self._keyword_min_confidence),
+            )
+        raise ValueError(f"Unknown recognizer backend - {name}")
+
+    @Logger.log_function
+    def _create_streaming_transport(self) -> StreamingRecognizer.StreamingTransport:
+        """Create the streaming transport selected in the config file.
+
+        Raises:
+            ValueError: In case of an unknown transport.
+
+        Returns:
+            StreamingTransport: The streaming transport.
+        """
+        if self._streaming_transport == "google_cloud":
+            return StreamingRecognizer.GoogleCloudStreamingTransport()
+        if self._streaming_transport == "http":
+            return StreamingRecognizer.HttpStreamingTransport(
+                self._streaming_url,
+                float(self._streaming_result_timeout),
+                self.connectivity_monitor.session,
             )
+        raise ValueError(f"Unknown streaming transport - {self._streaming_transport}")
 
     @Logger.log_function
     def recognize_letter(
@@ -108,42 +404,339 @@ class SpeechRecognition:
         Returns:
             Tuple[bool, bool]: A tuple with 2 boolean arguments - (1) if the user said the letter correctly. (2) if some internal exception occourd.
         """
-        # Return values - will be returned in any case.
-        hit = False
-        exception_occurred = True
+        with self.tracer.span("recognize_letter"):
+            audio_file = self.record(listening_led_gpio_pins)
+            if audio_file is None:
+                return False, True
+            return self.recognize(audio_file, current_letter)
+
+    @Logger.log_function
+    def record(
+        self,
+        listening_led_gpio_pins: List[int],
+        on_listening: Optional[Callable[[float], None]] = None,
+    ) -> Optional[sr.AudioData]:
+        """Records the user, after signaling him he can start talking.
+
+        Args:
+            listening_led_gpio_pins (List[int]): List of GPIOs - the current letter GPIO + the push button GPIO.
+            on_listening (Optional[Callable[[float], None]], optional): Called when the mic is opened, with the maximal seconds the record can last. Defaults to None.
+
+        Raises:
+            EnvironmentError: In case of missing google environment / No internet connection.
 
+        Returns:
+            Optional[sr.AudioData]: The recorded audio, None in case the user didn't start talking in time.
+        """
+        # The previous turn recognition doesn't belong to this turn
+        self.last_recognition = {}
+        # The turn starts now, the record leaves the recognition its minimal budget
+        self._deadline = CircuitBreaker.TurnDeadline(float(self._turn_deadline))
+        start_timeout = float(self._vad_start_timeout)
+        record_budget = self._deadline.stage(
+            "record",
+            start_timeout + float(self._seconds_for_record),
+            reserve=float(self._recognition_min_budget),
+            minimum=float(self._seconds_for_record),
+        )
+        # Wait less for the user to start talking, the phrase time limit stays
+        start_timeout = min(start_timeout, max(0.0, record_budget - float(self._seconds_for_record)))
+
+        # While the circuit is open the turn is recognized locally or is a free pass, it doesn't need the internet
+        local_fallback = self.circuit_breaker.is_open and (
+            self.fallback_backend is None or not self.fallback_backend.requires_internet
+        )
         # Ensure we have google environment and internet connetion before calling google's API
-        if os.environ[self._google_environment_variable_name] is None:
-            raise EnvironmentError(
-                f"Missing {self._google_environment_variable_name} environment variable wasn't found"
-            )
+        if not local_fallback and (
+            self.recognizer_backend.requires_internet
+            or (self.streaming_transport and self.streaming_transport.requires_internet)
+        ):
+            if os.environ[self._google_environment_variable_name] is None:
+                raise EnvironmentError(
+                    f"Missing {self._google_environment_variable_name} environment variable wasn't found"
+                )
 
-        if not self.connected_to_internet():
-            raise EnvironmentError("No internet connection")
+            if not self.connected_to_internet():
+                raise EnvironmentError("No internet connection")
 
-        # Start the logic - open mic, record user, and send audio to Google for recognition
-        speech_result = ""
         # Signal the user he can start talking
         self.sound.play_game_sound(Sound.GameSound.START_RECORD)
         try:
             # Record the user
-            with self.microphone as mic:
-                self._listening = True
+            with self._open_microphone() as mic:
+                self.tracer.mark("mic_open")
+                if on_listening:
+                    on_listening(start_timeout + float(self._seconds_for_record))
                 # Signaling the user that record has started by blinking the letter's and the push button LEDs
-                threading.Thread(
-                    target=self.blink_listening_led, args=(listening_led_gpio_pins,)
-                ).start()
-                audio_file = self.recognizer.listen(
-                    mic, timeout=2, phrase_time_limit=int(self._seconds_for_record)
+                self.led_animator.play(
+                    LedAnimator.blink(
+                        listening_led_gpio_pins, float(self._listening_blink_timeout)
+                    )
                 )
-                self._listening = False
-            # Call google API for recognizing the audio file
-            speech_result = self.recognizer.recognize_google(
-                audio_file, language=self._google_recognition_language
+                if self.streaming_transport:
+                    return self._stream_record(mic, start_timeout)
+                return self._capture_phrase(mic, start_timeout)
+
+        # The user didn't start talking before the listen timeout
+        except sr.WaitTimeoutError as ex:
+            self._deadline = None
+            self.sound.play_game_sound(Sound.GameSound.GOOGLE_API_TIMEOUT)
+            self.logger.log(
+                logging.ERROR, f"Got TIMEOUT exception - {ex}", str(self.__dict__)
             )
+            return None
+
+        finally:
+            self.led_animator.stop()
+            if self.capture:
+                self.logger.log(logging.INFO, f"Mic capture: {self.capture.stats()}")
+
+    def _open_microphone(self) -> sr.AudioSource:
+        """Returns the audio source of a record - a capture reader starting capture_pre_roll seconds ago, or the microphone when there's no persistent capture."""
+        if self.capture:
+            return self.capture.reader(float(self._capture_pre_roll))
+        return self.microphone
+
+    @Logger.log_function
+    def _stream_record(self, mic: sr.Microphone, start_timeout: float) -> StreamingRecognizer.StreamedAudioData:
+        """Records the user while streaming the audio for recognition, the request ends as soon as the user stops talking.
+
+        Args:
+            mic (sr.Microphone): The opened microphone.
+            start_timeout (float): Seconds to wait for the user to start talking.
+
+        Raises:
+            sr.WaitTimeoutError: In case the user didn't start talking in time.
+
+        Returns:
+            StreamedAudioData: The recorded audio, holding the pending streaming result.
+        """
+        session = StreamingRecognizer.StreamingSession(
+            self.streaming_transport, mic.SAMPLE_RATE, self._google_recognition_language
+        )
+        try:
+            audio = self._capture_phrase(mic, start_timeout, session.feed)
+        finally:
+            session.finish()
+        return StreamingRecognizer.StreamedAudioData(audio.samples, audio.sample_rate, session)
+
+    def _capture_phrase(
+        self,
+        mic: sr.Microphone,
+        start_timeout: float,
+        on_chunk: Optional[Callable[[memoryview], None]] = None,
+    ) -> AudioBuffer.AudioBuffer:
+        """Reads the microphone until the user stops talking, handing over every chunk as soon as it's read.
+        The voice activity detector ends the record vad_hangover seconds after the speech stopped, and trims the silence around the speech.
+        The chunks are read into a single buffer allocated for the longest record, the phrase and the chunks are views of it.
+        The pre-roll of a capture reader (captured while the start record prompt played) is kept in the record, but the speech start is detected
+        only after it - the prompt would start the phrase otherwise.
+
+        Args:
+            mic (sr.Microphone): The opened microphone.
+            start_timeout (float): Seconds to wait for the user to start talking.
+            on_chunk (Optional[Callable[[memoryview], None]], optional): Called with every chunk of the phrase. Defaults to None.
+
+        Raises:
+            sr.WaitTimeoutError: In case the user didn't start talking in time.
+
+        Returns:
+            AudioBuffer: The trimmed phrase, 16 bit mono PCM.
+        """
+        seconds_per_buffer = mic.CHUNK / mic.SAMPLE_RATE
+        start_buffers = max(1, math.ceil(start_timeout / seconds_per_buffer))
+        phrase_buffers = math.ceil(float(self._seconds_for_record) / seconds_per_buffer)
+        pre_roll_buffers = max(1, math.ceil(float(self._vad_pre_roll) / seconds_per_buffer))
+        capture_pre_roll_buffers = getattr(mic, "pre_roll", 0) // mic.CHUNK
+        record = AudioBuffer.RecordBuffer(
+            (capture_pre_roll_buffers + start_buffers + phrase_buffers) * mic.CHUNK, mic.SAMPLE_RATE
+        )
+        vad = self.voice_activity_detector
+        vad.reset()
+
+        # Audio from before the record started, not run through the speech start detection
+        for _ in range(capture_pre_roll_buffers):
+            record.read_chunk(mic)
+
+        # Wait for the phrase to start
+        for _ in range(start_buffers):
+            vad.process(record.read_chunk(mic))
+            if vad.speech_started:
+                self.tracer.mark("speech_start")
+                break
+        else:
+            raise sr.WaitTimeoutError("listening timed out while waiting for phrase to start")
+
+        # Keep the last chunks before the phrase started
+        phrase_start = max(0, record.length - pre_roll_buffers * mic.CHUNK)
+        if on_chunk:
+            for start in range(phrase_start, record.length, mic.CHUNK):
+                on_chunk(record.chunk_bytes(start, start + mic.CHUNK))
+
+        phrase_chunks = 1
+        while not vad.ended and phrase_chunks < phrase_buffers:
+            chunk = record.read_chunk(mic)
+            if on_chunk:
+                on_chunk(record.chunk_bytes(record.length - mic.CHUNK, record.length))
+            vad.process(chunk)
+            phrase_chunks += 1
+        self.tracer.mark("speech_end")
+
+        audio = record.audio(phrase_start)
+        trimmed = vad.trim(audio)
+
+        # Compare to waiting out the whole phrase time limit and uploading all of it
+        bytes_per_second = mic.SAMPLE_RATE * mic.SAMPLE_WIDTH
+        phrase_seconds = phrase_chunks * seconds_per_buffer
+        self.last_vad_report = {
+            "phrase_seconds": phrase_seconds,
+            "saved_record_seconds": max(0.0, float(self._seconds_for_record) - phrase_seconds),
+            "upload_bytes": trimmed.samples.nbytes,
+            "trimmed_bytes": audio.samples.nbytes - trimmed.samples.nbytes,
+            "saved_upload_bytes": max(
+                0, int(float(self._seconds_for_record) * bytes_per_second) - trimmed.samples.nbytes
+            ),
+        }
+        self.logger.log(logging.INFO, f"Voice activity detection: {self.last_vad_report}")
+        return trimmed
+
+    def _recognize_audio(
+        self, audio_file: sr.AudioData, deadline: CircuitBreaker.TurnDeadline
+    ) -> RecognizerBackend.RecognitionResult:
+        """Returns the recognition of a record - the streaming result when the record was streamed, otherwise sends it to the recognizer backend.
+
+        Args:
+            audio_file (sr.AudioData): The recorded audio.
+            deadline (TurnDeadline): The turn deadline, the recognition gets what's left of it.
+
+        Raises:
+            sr.RequestError: In case the recognition service cannot be reached, or didn't answer within the turn budget.
+            CircuitOpenError: In case the circuit is open and there's no fallback backend - a free pass.
+            sr.UnknownValueError: In case the speech wasn't understood.
+
+        Returns:
+            RecognitionResult: The recognition result.
+        """
+        min_budget = float(self._recognition_min_budget)
+        if isinstance(audio_file, StreamingRecognizer.StreamedAudioData):
+            try:
+                return audio_file.session.result(
+                    deadline.stage("streaming", float(self._streaming_result_timeout), minimum=min_budget)
+                )
+            except sr.RequestError as ex:
+                # Fallback to the batch path with the full record
+                self.logger.log(
+                    logging.WARNING,
+                    f"Streaming recognition failed, falling back to {self.recognizer_backend.name} - {ex}",
+                )
+        return self._recognize_guarded(
+            audio_file, deadline.stage("recognize", float(self._recognition_timeout), minimum=min_budget)
+        )
+
+    def _recognize_guarded(self, audio_file: sr.AudioData, budget: float) -> RecognizerBackend.RecognitionResult:
+        """Sends a record to the recognizer backend through the circuit breaker - the fallback backend recognizes it while the circuit is open.
+
+        Args:
+            audio_file (sr.AudioData): The recorded audio.
+            budget (float): Seconds to wait for the recognizer backend.
+
+        Raises:
+            sr.RequestError: In case the recognition service cannot be reached, or didn't answer within the budget.
+            CircuitOpenError: In case the circuit is open and there's no fallback backend.
+            sr.UnknownValueError: In case the speech wasn't understood.
+
+        Returns:
+            RecognitionResult: The recognition result.
+        """
+        if not self.circuit_breaker.allow():
+            if self.fallback_backend is None:
+                raise CircuitBreaker.CircuitOpenError(
+                    f"{self.recognizer_backend.name} circuit is open, the turn is a free pass"
+                )
+            self.logger.log(
+                logging.WARNING,
+                f"{self.recognizer_backend.name} circuit is open, recognizing with {self.fallback_backend.name}",
+            )
+            self._fallback_used = True
+            return self._backend_recognize(self.fallback_backend, audio_file)
+
+        start = time.monotonic()
+        future = self._recognition_executor.submit(
+            self._backend_recognize, self.recognizer_backend, audio_file
+        )
+        self._recognitions.add(future)
+        future.add_done_callback(self._recognitions.discard)
+        failed = True
+        try:
+            result = future.result(budget)
+            failed = False
+            return result
+        except sr.UnknownValueError:
+            # The service answered
+            failed = False
+            raise
+        except TimeoutError:
+            # Left running, the backend's own timeout ends it
+            raise sr.RequestError(
+                f"{self.recognizer_backend.name} didn't answer within the turn budget of {budget:.2f} seconds"
+            )
+        finally:
+            self.circuit_breaker.record(time.monotonic() - start, failed)
+
+    def _backend_recognize(
+        self, backend: RecognizerBackend.RecognizerBackend, audio_file: sr.AudioData
+    ) -> RecognizerBackend.RecognitionResult:
+        """Recognize with a backend on the current thread, the backend spans go to this instance's tracer."""
+        with Tracing.activated(self.tracer):
+            return backend.recognize(audio_file)
+
+    @Logger.log_function
+    def recognize(
+        self, audio_file: sr.AudioData, current_letter: str
+    ) -> Tuple[bool, bool]:
+        """Sends the recorded audio to the recognizer backend, and returns if it's matching the current letter.
+
+        Args:
+            audio_file (sr.AudioData): The recorded audio.
+            current_letter (str): The verbal value of the selected letter by the user. (for example: "aleph")
+
+        Returns:
+            Tuple[bool, bool]: A tuple with 2 boolean arguments - (1) if the user said the letter correctly. (2) if some internal exception occourd.
+        """
+        # Return values - will be returned in any case.
+        hit = False
+        exception_occurred = True
+
+        self.recognition_index.reload_if_changed()
+        speech_result = ""
+        result = None
+        # Recognitions without a record (for example of recorded files) get a turn of their own
+        deadline = self._deadline or CircuitBreaker.TurnDeadline(float(self._turn_deadline))
+        self._deadline = None
+        self._fallback_used = False
+        self.last_recognition = {
+            "transcript": None,
+            "recognized_letter": None,
+            "backend": None,
+            "confidence": None,
+            "recording": None,
+        }
+        recognize_start = time.monotonic()
+        try:
+            # Call the recognizer backend for recognizing the audio file
+            with self.tracer.span("recognize"):
+                result = self._recognize_audio(audio_file, deadline)
+            speech_result = result.transcript
+            self._log_hedging()
+
+        # The circuit is open and there's no fallback backend - a free pass, nothing was requested
+        except CircuitBreaker.CircuitOpenError as ex:
+            self.logger.log(logging.WARNING, f"Free pass - {ex}")
 
         # Cannot reach google services / not enough credit for recognition
         except sr.RequestError as ex:
+            self._log_hedging()
+            self.connectivity_monitor.refresh()
             self.sound.play_game_sound(Sound.GameSound.GOOGLE_API_REQUEST_ERROR)
             self.logger.log(
                 logging.ERROR,
@@ -153,107 +746,171 @@ class SpeechRecognition:
 
         # Cannot recognize sound
         except sr.UnknownValueError as ex:
+            self._log_hedging()
             self.sound.play_game_sound(Sound.GameSound.GOOGLE_API_RECOGNITION_ERROR)
-            self.save_record(self._unrecognized_folder, audio_file, current_letter)
-            self.logger.log_exception(
+            self.save_record(
+                self._unrecognized_folder,
+                audio_file,
+                current_letter,
+                recognize_ms=(time.monotonic() - recognize_start) * 1000,
+            )
+            self.logger.log(
                 logging.ERROR,
                 f"Google API could not understand audio - {ex}",
                 str(self.__dict__),
             )
 
-        # Google took too long to response (connection closed?)
-        except sr.WaitTimeoutError as ex:
-            self.sound.play_game_sound(Sound.GameSound.GOOGLE_API_TIMEOUT)
-            self.logger.log_exception(
-                logging.ERROR, f"Got TIMEOUT exception - {ex}", str(self.__dict__)
-            )
+        # Any other backend failure ends the turn as an internal error, the game goes on
+        except Exception as ex:
+            self._log_hedging()
+            self.sound.play_game_sound(Sound.GameSound.GOOGLE_API_REQUEST_ERROR)
+            self.logger.exception(f"Recognition failed - {ex}")
 
         # Parse result
         else:
             exception_occurred = False
+            recognize_ms = (time.monotonic() - recognize_start) * 1000
+            self.last_recognition.update(
+                transcript=speech_result,
+                recognized_letter=result.letter,
+                backend=self._result_backend_name(),
+                confidence=result.confidence,
+            )
             self.logger.log(
                 logging.INFO,
-                f"Google API returned: {speech_result}, current letter turn on is: {current_letter}",
+                f"{self._result_backend_name()} returned: {result}, current letter turn on is: {current_letter}",
             )
 
-            if not speech_result:
+            # Backends which recognize letters directly don't need the recognition options
+            if result.letter:
+                hit = current_letter == result.letter
+                if not hit:
+                    self.save_record(
+                        self._misdetection_folder, audio_file, current_letter, result, recognize_ms
+                    )
+
+            elif not speech_result:
                 self.logger.log(
                     logging.ERROR,
                     "Google returned empty string, saving the record to unrecognized folder",
                 )
-                self.save_record(self._unrecognized_folder, audio_file, current_letter)
+                self.save_record(
+                    self._unrecognized_folder, audio_file, current_letter, result, recognize_ms
+                )
 
             else:
-                if speech_result in self._recognition_options_file_path:
-                    if (
-                        current_letter
-                        == self._recognition_options_file_path[speech_result]
-                    ):
-                        hit = True
-                    else:
-                        self.logger.log(
-                            logging.INFO,
-                            f"Got {speech_result} which is not defined in the json dictionary file, saving the record to misdetection folder",
-                        )
-                        self.save_record(
-                            self._misdetection_folder, audio_file, current_letter
-                        )
-
-        finally:
-            self._listening = False
-            return hit, exception_occurred
+                # Score all the alternatives against the recognition options
+                match = self.recognition_index.match(result.alternatives)
+                self.logger.log(logging.INFO, f"Recognition options match: {match}")
+                if match:
+                    self.last_recognition["recognized_letter"] = match.letter
+                if match and current_letter == match.letter:
+                    hit = True
+                elif match:
+                    self.logger.log(
+                        logging.INFO,
+                        f"Got {speech_result} which matched {match.letter}, saving the record to misdetection folder",
+                    )
+                    self.save_record(
+                        self._misdetection_folder, audio_file, current_letter, result, recognize_ms
+                    )
+                else:
+                    self.logger.log(
+                        logging.INFO,
+                        f"Got {speech_result} which is not defined in the json dictionary file, saving the record to misdetection folder",
+                    )
+                    self.save_record(
+                        self._misdetection_folder, audio_file, current_letter, result, recognize_ms
+                    )
+
+        self.logger.log(logging.INFO, f"Audio allocations: {AudioBuffer.allocations.stats()}")
+        self.logger.log(
+            logging.INFO,
+            f"Turn budgets: {deadline.budgets}, recognition circuit: {self.circuit_breaker.stats()}",
+        )
+        return hit, exception_occurred
 
     @Logger.log_function
     def save_record(
-        self, folder: str, audio_file: speech_recognition.AudioData, expected: str
+        self,
+        folder: str,
+        audio_file: sr.AudioData,
+        expected: str,
+        result: Optional[RecognizerBackend.RecognitionResult] = None,
+        recognize_ms: Optional[float] = None,
     ) -> None:
-        """Saving the audio file for a later debug.
+        """Archive the audio file for a later debug, in the background - the game turn doesn't wait for the write. Its path is kept in last_recognition.
 
         Args:
             folder (str): folder path to save the audio file to.
-            audio_file (speech_recognition.AudioData): The recorded file.
+            audio_file (sr.AudioData): The recorded file.
             expected (str): The verbal value of the letter in the selected GPIO.
+            result (Optional[RecognitionResult], optional): The recognition result, when the backend returned one. Defaults to None.
+            recognize_ms (Optional[float], optional): Duration of the recognition. Defaults to None.
         """
-        folder_path = os.path.join(os.getcwd(), folder)
-        if not os.path.exists(folder_path):
-            os.makedirs(folder_path)
-
-        # Name the audio file with the timestamp and expected result for later debug
-        debug_audio_file = os.path.join(
-            folder_path,
-            f"{time.strftime('%x').replace('/','_')}_{time.strftime('%X')}_expected_{expected}.wav",
+        self.last_recognition["recording"] = self.recording_archive.save(
+            os.path.join(os.getcwd(), folder),
+            audio_file,
+            {
+                "expected": expected,
+                "backend": self._result_backend_name(),
+                "transcript": result.transcript if result else None,
+                "recognized_letter": result.letter if result else None,
+                "alternatives": result.alternatives if result else [],
+                "recognize_ms": recognize_ms,
+                "vad": self.last_vad_report,
+            },
         )
-        with open(debug_audio_file, "wb") as file:
-            file.write(audio_file.get_wav_data())
 
-    @Logger.log_function
-    def connected_to_internet(self, url="https://www.google.com/", timeout=2) -> bool:
-        """Detects if the PC has a valid internet connection.
+    def _hedged_backend(self) -> Optional[HedgedRecognition.HedgedBackend]:
+        """Returns the hedged backend, also when it's shared through a recognition pool. None when the recognitions aren't hedged."""
+        backend = self.recognizer_backend
+        if isinstance(backend, RecognitionPool.PooledBackend):
+            backend = backend.backend
+        return backend if isinstance(backend, HedgedRecognition.HedgedBackend) else None
+
+    def _result_backend_name(self) -> str:
+        """Returns the name of the backend which returned the last result - the fallback while the circuit is open, the winner when the recognitions are hedged."""
+        if self._fallback_used:
+            return self.fallback_backend.name
+        hedged = self._hedged_backend()
+        if hedged and hedged.last_report.get("winner"):
+            return hedged.last_report["winner"]
+        return self.recognizer_backend.name
+
+    def _log_hedging(self) -> None:
+        hedged = self._hedged_backend()
+        if hedged:
+            self.logger.log(logging.INFO, f"Hedged recognition: {hedged.last_report}, backends: {hedged.stats()}")
 
-        Args:
-            url (str, optional): Url to be used for detecting internet connection. Defaults to 'https://www.google.com/'.
-            timeout (int, optional): timeout for the test. Defaults to 2.
+    @Logger.log_function
+    def connected_to_internet(self) -> bool:
+        """Detects if the PC has a valid internet connection, by the cached state of the connectivity monitor - never waits for a probe.
 
         Returns:
-            bool: _description_
+            bool: If the last connectivity probe succeeded.
         """
-        connected = True
-        try:
-            _ = requests.get(url, timeout=timeout)
-        except requests.ConnectionError:
-            connected = False
+        connected = self.connectivity_monitor.connected
+        if not connected:
             self.sound.play_game_sound(Sound.GameSound.NO_INTERNET)
         return connected
 
     @Logger.log_function
-    def blink_listening_led(self, listening_led_gpio_pins: List[int]) -> None:
-        """Blinking the LEDs of the selected letter and the game push button. To be called in a new thread.
-
-        Args:
-            listening_led_gpio_pins (List[int]): The GPIOs to tuggle.
+    def warm_up(self) -> None:
+        """Open the connection to the recognition service in the background, so the recognition request reuses it. To be called ahead of recording.
+        Never waits - it's called from the game event loop, so it does nothing until the recognizer backend was created.
         """
-        while self._listening:
-            GPIO.output(listening_led_gpio_pins, GPIO.HIGH)
-            time.sleep(0.2)
-            GPIO.output(listening_led_gpio_pins, GPIO.LOW)
-            time.sleep(0.2)
+        future = self._recognizer_backend_future
+        if not future.done() or future.exception() is not None:
+            return
+        backend = future.result()
+        # A station of a multi-station host recognizes with the shared backend
+        if isinstance(backend, RecognitionPool.PooledBackend):
+            backend = backend.backend
+        hedged = self._hedged_backend()
+        backends = hedged.backends if hedged else [backend]
+        google = [backend for backend in backends if isinstance(backend, RecognizerBackend.GoogleBackend)]
+        if google:
+            self.connectivity_monitor.warm_up(google[0].URL)
+        elif isinstance(self.streaming_transport, StreamingRecognizer.HttpStreamingTransport):
+            self.connectivity_monitor.warm_up(self.streaming_transport.url)
@@ -0,0 +1,232 @@
+import sys
+import time
+import threading
+import contextlib
+import importlib.abc
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Iterator, List, Optional
+
+# Standard library only - imported by main before the game modules, so their imports can be timed.
+
+PROFILE_FLAG = "--startup-profile"
+
+
+class _Step:
+    """A timed startup step."""
+
+    __slots__ = ("name", "thread", "start", "duration", "error")
+
+    def __init__(self, name: str, thread: str, start: float, duration: float, error: Optional[str]) -> None:
+        self.name = name
+        self.thread = thread
+        self.start = start
+        self.duration = duration
+        self.error = error
+
+
+class _TimedLoader(importlib.abc.Loader):
+    """Wraps a module loader, timing the module execution."""
+
+    def __init__(self, loader: importlib.abc.Loader, profile: "StartupProfile") -> None:
+        self._loader = loader
+        self._profile = profile
+
+    def create_module(self, spec):
+        return self._loader.create_module(spec)
+
+    def exec_module(self, module) -> None:
+        self._profile._import_started()
+        try:
+            self._loader.exec_module(module)
+        finally:
+            self._profile._import_ended(module.__name__)
+
+    def __getattr__(self, name: str) -> Any:
+        # get_data, is_package, get_resource_reader...
+        return getattr(self._loader, name)
+
+
+class _ImportTimer(importlib.abc.MetaPathFinder):
+    """Finds modules with the other finders, wrapping their loaders with _TimedLoader."""
+
+    def __init__(self, profile: "StartupProfile") -> None:
+        self._profile = profile
+
+    def find_spec(self, fullname: str, path, target=None):
+        for finder in sys.meta_path:
+            find_spec = getattr(finder, "find_spec", None)
+            if finder is self or find_spec is None:
+                continue
+            spec = find_spec(fullname, path, target)
+            if spec is not None:
+                break
+        else:
+            return None
+        if spec.loader is not None and hasattr(spec.loader, "exec_module"):
+            spec.loader = _TimedLoader(spec.loader, self._profile)
+        return spec
+
+
+class StartupProfile:
+    """Times the startup steps - on the main thread or in the background - and the module imports.
+
+    Background steps run on a shared executor, so independent steps (sound card reset, mic discovery, serial port...) run concurrently,
+    and whoever needs a step result waits only for that step.
+
+    Attributes:
+        start (float): time.monotonic() of the profile start.
+        ready (Optional[float]): time.monotonic() when the game could start - background steps may still run.
+        steps (List[_Step]): Every timed step.
+        imports (List[Tuple[str, float, float]]): (module, cumulative ms, self ms) of every module imported while the import timer was installed.
+    """
+
+    def __init__(self) -> None:
+        self.start = time.monotonic()
+        self.ready = None
+        self.steps = []
+        self.imports = []
+        self._lock = threading.Lock()
+        self._executor = None
+        self._background = []
+        self._import_timer = None
+        self._import_stack = threading.local()
+
+    @contextlib.contextmanager
+    def step(self, name: str) -> Iterator[None]:
+        """Time a block as a startup step.
+
+        Args:
+            name (str): The step name.
+        """
+        start = time.monotonic()
+        error = None
+        try:
+            yield
+        except Exception as ex:
+            error = type(ex).__name__
+            raise
+        finally:
+            with self._lock:
+                self.steps.append(
+                    _Step(name, threading.current_thread().name, start, time.monotonic() - start, error)
+                )
+
+    def background(self, name: str, function: Callable[..., Any], *args: Any) -> Future:
+        """Run a timed step in the background.
+
+        Args:
+            name (str): The step name.
+            function (Callable[..., Any]): The step.
+            args: The step arguments.
+
+        Returns:
+            Future: Completed with the step result (or exception).
+        """
+
+        def run() -> Any:
+            with self.step(name):
+                return function(*args)
+
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="startup")
+            future = self._executor.submit(run)
+            self._background.append(future)
+        return future
+
+    def mark_ready(self) -> None:
+        """Mark the time the game could start."""
+        self.ready = time.monotonic()
+
+    def wait_background(self, timeout: Optional[float] = None) -> None:
+        """Wait for all the background steps to end.
+
+        Args:
+            timeout (Optional[float], optional): Seconds to wait for every step. Defaults to no timeout.
+        """
+        with self._lock:
+            background = list(self._background)
+        for future in background:
+            try:
+                future.result(timeout)
+            except Exception:
+                # Reported by whoever needs the step result
+                pass
+
+    def start_imports(self) -> None:
+        """Time the imports from now on."""
+        if self._import_timer is None:
+            self._import_timer = _ImportTimer(self)
+            sys.meta_path.insert(0, self._import_timer)
+
+    def stop_imports(self) -> None:
+        """Stop timing the imports."""
+        if self._import_timer is not None:
+            sys.meta_path.remove(self._import_timer)
+            self._import_timer = None
+
+    def report(self, top_imports: int = 20) -> str:
+        """Returns the timing breakdown - every step by its start time, and the slowest imports.
+
+        Args:
+            top_imports (int, optional): Amount of imports to list. Defaults to 20.
+
+        Returns:
+            str: The report.
+        """
+        lines = [f"{'step':36} {'thread':16} {'start ms':>10} {'duration ms':>12}"]
+        with self._lock:
+            steps = sorted(self.steps, key=lambda step: step.start)
+            imports = sorted(self.imports, key=lambda module: module[1], reverse=True)
+        for step in steps:
+            lines.append(
+                f"{step.name:36} {step.thread[:16]:16} {(step.start - self.start) * 1000:>10.1f} {step.duration * 1000:>12.1f}"
+                + (f"  failed - {step.error}" if step.error else "")
+            )
+        if self.ready is not None:
+            lines.append(f"{'ready for the first button press':53} {(self.ready - self.start) * 1000:>10.1f}")
+        if steps:
+            end = max(step.start + step.duration for step in steps)
+            lines.append(f"{'all steps done':53} {(end - self.start) * 1000:>10.1f}")
+
+        if imports:
+            lines.append("")
+            lines.append(f"{'import':52} {'cumulative ms':>14} {'self ms':>10}")
+            for module, cumulative, own in imports[:top_imports]:
+                lines.append(f"{module:52} {cumulative:>14.1f} {own:>10.1f}")
+            lines.append(f"{'total (' + str(len(imports)) + ' modules)':52} {sum(module[2] for module in imports):>14.1f}")
+        return "\n".join(lines)
+
+    def _import_started(self) -> None:
+        stack = getattr(self._import_stack, "frames", None)
+        if stack is None:
+            stack = self._import_stack.frames = []
+        # [start, time spent importing nested modules]
+        stack.append([time.monotonic(), 0.0])
+
+    def _import_ended(self, name: str) -> None:
+        stack = self._import_stack.frames
+        start, nested = stack.pop()
+        cumulative = time.monotonic() - start
+        if stack:
+            stack[-1][1] += cumulative
+        with self._lock:
+            self.imports.append((name, cumulative * 1000, (cumulative - nested) * 1000))
+
+
+def completed(value: Any) -> Future:
+    """Returns a future completed with a value, for results which are available right away.
+
+    Args:
+        value (Any): The result.
+
+    Returns:
+        Future: The completed future.
+    """
+    future = Future()
+    future.set_result(value)
+    return future
+
+
+# The profile of this process startup, steps are always timed, the report is printed with --startup-profile
+profile = StartupProfile()
@@ -0,0 +1,291 @@
+import abc
+import json
+import time
+import queue
+import threading
+import logging
+from concurrent.futures import Future, TimeoutError
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from typing import Iterator, List, Optional
+from urllib.parse import urlparse
+
+import numpy as np
+import requests
+import speech_recognition as sr
+
+from . import AudioBuffer, Logger, RecognizerBackend
+
+
+class StreamingTransport(abc.ABC):
+    """Interface for streaming recognition services - transcribes audio chunks while they are still being recorded.
+
+    Attributes:
+        name (str): The transport name, for logging.
+        requires_internet (bool): The transport calls a remote service.
+    """
+
+    name = ""
+    requires_internet = True
+
+    @abc.abstractmethod
+    def transcribe(
+        self, chunks: Iterator[bytes], sample_rate: int, language: str
+    ) -> RecognizerBackend.RecognitionResult:
+        """Stream 16 bit mono PCM chunks to the service and return its final result. The chunks iterator ends when the speaker stopped.
+
+        Args:
+            chunks (Iterator[bytes]): The audio chunks, as they are recorded.
+            sample_rate (int): Sample rate of the audio.
+            language (str): The recognition language, for example "he-IL".
+
+        Raises:
+            sr.RequestError: In case the service cannot be reached.
+            sr.UnknownValueError: In case the speech wasn't understood.
+
+        Returns:
+            RecognitionResult: The recognition result.
+        """
+
+
+class HttpStreamingTransport(StreamingTransport):
+    """Streams the audio as a chunked HTTP POST body, the service responds with a JSON result once the body ends.
+
+    The response is {"transcript": str, "confidence": float, "alternatives": [[transcript, confidence], ...]}, an empty transcript means the speech wasn't understood.
+    See StandInStreamingServer for a local implementation of the service.
+    """
+
+    name = "http"
+
+    def __init__(self, url: str, timeout: float, session: Optional[requests.Session] = None) -> None:
+        self.url = url
+        self.timeout = timeout
+        self.session = session if session else requests.Session()
+        self.requires_internet = urlparse(url).hostname not in ("127.0.0.1", "localhost", "::1")
+
+    def transcribe(
+        self, chunks: Iterator[bytes], sample_rate: int, language: str
+    ) -> RecognizerBackend.RecognitionResult:
+        try:
+            # A generator body is sent with chunked transfer encoding, every chunk is sent as soon as it's recorded
+            response = self.session.post(
+                self.url,
+                data=chunks,
+                params={"lang": language},
+                headers={"Content-Type": f"audio/l16; rate={sample_rate}"},
+                timeout=self.timeout,
+            )
+            response.raise_for_status()
+            result = response.json()
+        except (requests.RequestException, ValueError) as ex:
+            raise sr.RequestError(f"Streaming recognition request failed - {ex}")
+
+        if not result.get("transcript"):
+            raise sr.UnknownValueError()
+        alternatives = [tuple(alternative) for alternative in result.get("alternatives", [])]
+        return RecognizerBackend.RecognitionResult(
+            result["transcript"], None, result.get("confidence", 1.0), alternatives
+        )
+
+
+class GoogleCloudStreamingTransport(StreamingTransport):
+    """Google Cloud Speech-to-Text streaming recognition, in single utterance mode so the service ends the stream as soon as the speaker stops.
+    Authenticates with the credentials file in GOOGLE_APPLICATION_CREDENTIALS.
+    """
+
+    name = "google_cloud"
+
+    def __init__(self, max_alternatives: int = 5) -> None:
+        # Imported here, google-cloud-speech is required only for this transport
+        from google.cloud import speech
+
+        self._speech = speech
+        self._client = speech.SpeechClient()
+        self.max_alternatives = max_alternatives
+
+    def transcribe(
+        self, chunks: Iterator[bytes], sample_rate: int, language: str
+    ) -> RecognizerBackend.RecognitionResult:
+        speech = self._speech
+        config = speech.StreamingRecognitionConfig(
+            config=speech.RecognitionConfig(
+                encoding=speech.RecognitionConfig.AudioEncoding.LINEAR16,
+                sample_rate_hertz=sample_rate,
+                language_code=language,
+                max_alternatives=self.max_alternatives,
+            ),
+            single_utterance=True,
+        )
+        audio_requests = (speech.StreamingRecognizeRequest(audio_content=_owned(chunk)) for chunk in chunks)
+        try:
+            for response in self._client.streaming_recognize(config=config, requests=audio_requests):
+                for result in response.results:
+                    if result.is_final and result.alternatives:
+                        alternatives = [
+                            (alternative.transcript, alternative.confidence)
+                            for alternative in result.alternatives
+                        ]
+                        return RecognizerBackend.RecognitionResult(
+                            alternatives[0][0], None, alternatives[0][1], alternatives
+                        )
+        except Exception as ex:
+            raise sr.RequestError(f"Google Cloud streaming recognition failed - {ex}")
+        raise sr.UnknownValueError()
+
+
+class StreamingSession:
+    """A single streaming recognition request. Chunks fed to the session are sent by a background thread while recording continues."""
+
+    def __init__(self, transport: StreamingTransport, sample_rate: int, language: str) -> None:
+        self.transport = transport
+        self._chunks = queue.Queue()
+        self._chunks_ended = False
+        self._future = Future()
+        threading.Thread(target=self._run, args=(sample_rate, language), daemon=True).start()
+
+    def feed(self, chunk: bytes) -> None:
+        """Send a recorded chunk.
+
+        Args:
+            chunk (bytes): 16 bit mono PCM chunk, or a memoryview of the record.
+        """
+        self._chunks.put(chunk)
+
+    def finish(self) -> None:
+        """Signal the speaker stopped, ending the request."""
+        self._chunks.put(None)
+
+    def result(self, timeout: float) -> RecognizerBackend.RecognitionResult:
+        """Wait for the final result of the request.
+
+        Args:
+            timeout (float): Seconds to wait after the request was finished.
+
+        Raises:
+            sr.RequestError: In case the service failed or didn't respond in time.
+            sr.UnknownValueError: In case the speech wasn't understood.
+
+        Returns:
+            RecognitionResult: The recognition result.
+        """
+        try:
+            return self._future.result(timeout)
+        except TimeoutError:
+            raise sr.RequestError(f"Streaming recognition didn't respond in {timeout} seconds")
+
+    def _audio_chunks(self) -> Iterator[bytes]:
+        while True:
+            chunk = self._chunks.get()
+            if chunk is None:
+                self._chunks_ended = True
+                return
+            yield chunk
+
+    def _run(self, sample_rate: int, language: str) -> None:
+        try:
+            self._future.set_result(
+                self.transport.transcribe(self._audio_chunks(), sample_rate, language)
+            )
+        except (sr.RequestError, sr.UnknownValueError) as ex:
+            self._future.set_exception(ex)
+        except Exception as ex:
+            self._future.set_exception(sr.RequestError(f"Streaming recognition failed - {ex}"))
+        finally:
+            # Drain the chunks in case the transport returned before the stream ended
+            while not self._chunks_ended and self._chunks.get() is not None:
+                pass
+
+
+def _owned(chunk: bytes) -> bytes:
+    """Returns a chunk as bytes, copying memoryviews of the record - protobuf messages own their audio."""
+    if isinstance(chunk, bytes):
+        return chunk
+    AudioBuffer.allocations.allocated("stream", len(chunk))
+    return bytes(chunk)
+
+
+class StreamedAudioData(AudioBuffer.AudioBuffer):
+    """A record whose recognition was already streamed - the streaming session holds the pending result."""
+
+    def __init__(self, samples: np.ndarray, sample_rate: int, session: StreamingSession) -> None:
+        super().__init__(samples, sample_rate)
+        self.session = session
+
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class StandInStreamingServer:
+    """A local stand-in for a streaming recognition service, implementing HttpStreamingTransport protocol.
+    Responds with a fixed result once the chunked request body ends, and records when every request started / ended and how many bytes it sent.
+
+    Attributes:
+        transcript (str): The transcript every request is answered with.
+        confidence (float): The confidence every request is answered with.
+        response_delay (float): Seconds to wait between the end of the body and the response.
+        requests (List[dict]): Received requests - {"first_chunk": float, "last_chunk": float, "bytes": int, "chunks": int}.
+    """
+
+    @Logger.log_function
+    def __init__(
+        self, transcript: str, confidence: float = 1.0, response_delay: float = 0.0, port: int = 0
+    ) -> None:
+        self.transcript = transcript
+        self.confidence = confidence
+        self.response_delay = response_delay
+        self.requests: List[dict] = []
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                stats = {"first_chunk": None, "last_chunk": None, "bytes": 0, "chunks": 0}
+                while True:
+                    size = int(self.rfile.readline().split(b";")[0].strip() or b"0", 16)
+                    if size == 0:
+                        self.rfile.readline()
+                        break
+                    self.rfile.read(size)
+                    self.rfile.readline()
+                    now = time.monotonic()
+                    stats["first_chunk"] = stats["first_chunk"] or now
+                    stats["last_chunk"] = now
+                    stats["bytes"] += size
+                    stats["chunks"] += 1
+                stand_in.requests.append(stats)
+
+                time.sleep(stand_in.response_delay)
+                body = json.dumps(
+                    {
+                        "transcript": stand_in.transcript,
+                        "confidence": stand_in.confidence,
+                        "alternatives": [[stand_in.transcript, stand_in.confidence]],
+                    }
+                ).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                logging.debug(f"Stand-in streaming server: {format % args}")
+
+        self._server = _ThreadingHTTPServer(("127.0.0.1", port), Handler)
+
+    @property
+    def url(self) -> str:
+        """The URL to stream requests to."""
+        host, port = self._server.server_address
+        return f"http://{host}:{port}/recognize"
+
+    def start(self) -> None:
+        """Serve requests in a background thread."""
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    def stop(self) -> None:
+        """Stop serving requests."""
+        self._server.shutdown()
+        self._server.server_close()
@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+import sys
+import math
+import glob
+import json
+import time
+import uuid
+import logging
+import argparse
+import threading
+import contextlib
+import configparser
+import logging.handlers
+from typing import Any, Dict, Iterator, List, Optional
+
+from . import Logger
+
+
+class _Turn:
+    """The spans of a single game turn, relative to the turn start.
+
+    Attributes:
+        start (float): time.monotonic() of the turn start - the button press selecting the letter.
+        attributes (Dict[str, Any]): Turn attributes - letter, result...
+        spans (List[Dict[str, Any]]): name, start_ms and duration_ms of every span. Marks have no duration.
+    """
+
+    __slots__ = ("start", "attributes", "spans")
+
+    def __init__(self, start: float, attributes: Dict[str, Any]) -> None:
+        self.start = start
+        self.attributes = attributes
+        self.spans = []
+
+
+class Tracer:
+    """Records monotonic span timestamps of every game turn, written as a JSON line per turn to a rotating file.
+
+    A single turn is traced at a time, spans can be opened and closed from any thread (the game loop, executor threads, the sound dispatcher).
+    While tracing is disabled, or outside of a turn, all calls return immediately.
+    Every station of a multi-station host traces its turns with its own tracer (see for_station), writing to the same file.
+
+    Attributes:
+        enabled (bool): Turns are traced.
+        session (str): Id of the current game session (run_game call).
+        station (str): The station whose turns are traced, written in every record. Empty for a single station.
+    """
+
+    def __init__(self, station: str = "") -> None:
+        self.enabled = False
+        self.session = ""
+        self.station = station
+        self._turn = None
+        self._turns = 0
+        self._writer = None
+        self._lock = threading.Lock()
+
+    @Logger.log_function
+    def configure(self, config_tracing_section: configparser.SectionProxy) -> None:
+        """Apply the [Tracing] config section.
+
+        Args:
+            config_tracing_section (configparser.SectionProxy): enabled, trace_file, trace_max_bytes and trace_backup_count.
+        """
+        self.enabled = config_tracing_section.getboolean("enabled", True)
+        if not self.enabled:
+            return
+        handler = logging.handlers.RotatingFileHandler(
+            config_tracing_section.get("trace_file", "traces.jsonl"),
+            maxBytes=config_tracing_section.getint("trace_max_bytes", 5000000),
+            backupCount=config_tracing_section.getint("trace_backup_count", 10),
+            encoding="utf-8",
+        )
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        # A dedicated logger, so the traces don't end up in the application log
+        self._writer = logging.getLogger("AlephPi.traces")
+        self._writer.propagate = False
+        self._writer.setLevel(logging.INFO)
+        for existing in list(self._writer.handlers):
+            self._writer.removeHandler(existing)
+        self._writer.addHandler(handler)
+
+    def for_station(self, station: str) -> "Tracer":
+        """Returns a tracer of a station's turns, writing to the file of this tracer.
+
+        Args:
+            station (str): The station name.
+
+        Returns:
+            Tracer: The station tracer, enabled when this tracer is.
+        """
+        station_tracer = Tracer(station)
+        station_tracer.enabled = self.enabled
+        station_tracer._writer = self._writer
+        return station_tracer
+
+    @contextlib.contextmanager
+    def session_scope(self) -> Iterator[str]:
+        """Trace a game session - every turn written in the scope carries its id.
+
+        Yields:
+            str: The session id.
+        """
+        self.session = uuid.uuid4().hex[:12]
+        self._turns = 0
+        try:
+            yield self.session
+        finally:
+            self.end_turn(result="aborted")
+
+    def start_turn(self, start: Optional[float] = None, **attributes: Any) -> None:
+        """Start tracing a turn, a turn which wasn't ended is written first.
+
+        Args:
+            start (Optional[float], optional): time.monotonic() of the turn start. Defaults to now.
+            attributes: Turn attributes, for example letter="aleph".
+        """
+        if not self.enabled:
+            return
+        self.end_turn(result="abandoned")
+        with self._lock:
+            self._turn = _Turn(time.monotonic() if start is None else start, attributes)
+
+    def end_turn(self, **attributes: Any) -> None:
+        """End the current turn and write it.
+
+        Args:
+            attributes: Turn attributes, for example result="hit".
+        """
+        with self._lock:
+            turn, self._turn = self._turn, None
+        if turn is None:
+            return
+        self._turns += 1
+        record = {
+            "station": self.station,
+            "session": self.session,
+            "turn": self._turns,
+            "time": time.time() - (time.monotonic() - turn.start),
+            "duration_ms": (time.monotonic() - turn.start) * 1000,
+        }
+        record.update(turn.attributes)
+        record.update(attributes)
+        record["spans"] = sorted(turn.spans, key=lambda span: span["start_ms"])
+        self._writer.info(json.dumps(record, ensure_ascii=False))
+
+    def begin(self, name: str) -> Optional[tuple]:
+        """Open a span, to be closed by end - possibly from another thread.
+
+        Args:
+            name (str): The span name.
+
+        Returns:
+            Optional[tuple]: Token to be passed to end, None outside of a turn.
+        """
+        turn = self._turn
+        if turn is None:
+            return None
+        return turn, name, time.monotonic()
+
+    def end(self, token: Optional[tuple]) -> None:
+        """Close a span opened by begin.
+
+        Args:
+            token (Optional[tuple]): The token returned by begin.
+        """
+        if token is None:
+            return
+        turn, name, start = token
+        turn.spans.append(
+            {
+                "name": name,
+                "start_ms": round((start - turn.start) * 1000, 3),
+                "duration_ms": round((time.monotonic() - start) * 1000, 3),
+            }
+        )
+
+    @contextlib.contextmanager
+    def span(self, name: str) -> Iterator[None]:
+        """Trace the duration of a block.
+
+        Args:
+            name (str): The span name.
+        """
+        token = self.begin(name)
+        try:
+            yield
+        finally:
+            self.end(token)
+
+    def mark(self, name: str) -> None:
+        """Trace a point in time, for example the end of speech.
+
+        Args:
+            name (str): The mark name.
+        """
+        turn = self._turn
+        if turn is not None:
+            turn.spans.append({"name": name, "start_ms": round((time.monotonic() - turn.start) * 1000, 3)})
+
+
+# The tracer of the game, configured by main
+tracer = Tracer()
+
+_active = threading.local()
+
+
+def active() -> Tracer:
+    """Returns the tracer of the turn the current thread works for, see activated. Defaults to the game tracer.
+    Used by components shared between stations, for example the hedged recognizer backend.
+    """
+    return getattr(_active, "tracer", tracer)
+
+
+@contextlib.contextmanager
+def activated(turn_tracer: Tracer) -> Iterator[None]:
+    """Make a tracer the active tracer of the current thread for the block.
+
+    Args:
+        turn_tracer (Tracer): The tracer of the current turn.
+    """
+    previous = getattr(_active, "tracer", None)
+    _active.tracer = turn_tracer
+    try:
+        yield
+    finally:
+        if previous is None:
+            del _active.tracer
+        else:
+            _active.tracer = previous
+
+
+def percentile(values: List[float], percent: float) -> float:
+    """Nearest rank percentile.
+
+    Args:
+        values (List[float]): Sorted values.
+        percent (float): The percentile, between 0 and 100.
+
+    Returns:
+        float: The percentile value.
+    """
+    rank = max(1, math.ceil(percent / 100 * len(values)))
+    return values[rank - 1]
+
+
+def load_turns(paths: List[str], day: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Load the traced turns, including the rotated files.
+
+    Args:
+        paths (List[str]): Trace files, the rotated files next to them (<path>.1, <path>.2...) are loaded as well.
+        day (Optional[str], optional): Only turns of this local date (YYYY-MM-DD). Defaults to None.
+
+    Returns:
+        List[Dict[str, Any]]: The turns.
+    """
+    turns = []
+    for path in paths:
+        for filepath in sorted(set(glob.glob(path) + glob.glob(f"{path}.*"))):
+            with open(filepath, encoding="utf-8") as trace_file:
+                for line in trace_file:
+                    if not line.strip():
+                        continue
+                    turn = json.loads(line)
+                    if day and time.strftime("%Y-%m-%d", time.localtime(turn["time"])) != day:
+                        continue
+                    turns.append(turn)
+    return turns
+
+
+def report(turns: List[Dict[str, Any]], out=sys.stdout) -> None:
+    """Print p50 / p95 / p99 milliseconds per stage, and of the whole turn per letter.
+    Spans are reported by their duration, marks (@name) by their offset from the turn start.
+
+    Args:
+        turns (List[Dict[str, Any]]): The traced turns.
+        out (optional): Output stream. Defaults to sys.stdout.
+    """
+    stages = {}
+    letters = {}
+    for turn in turns:
+        stages.setdefault("turn", []).append(turn["duration_ms"])
+        letters.setdefault(turn.get("letter", "?"), []).append(turn["duration_ms"])
+        for span in turn["spans"]:
+            if "duration_ms" in span:
+                stages.setdefault(span["name"], []).append(span["duration_ms"])
+            else:
+                stages.setdefault(f"@{span['name']}", []).append(span["start_ms"])
+
+    sessions = len({turn["session"] for turn in turns})
+    print(f"{len(turns)} turns, {sessions} sessions", file=out)
+    for title, table in (("stage", stages), ("letter", letters)):
+        width = max([len(title)] + [len(name) for name in table])
+        print(f"\n{title:{width}} {'count':>6} {'p50':>9} {'p95':>9} {'p99':>9}", file=out)
+        for name, values in sorted(table.items()):
+            values.sort()
+            print(
+                f"{name:{width}} {len(values):>6} "
+                + " ".join(f"{percentile(values, percent):>9.1f}" for percent in (50, 95, 99)),
+                file=out,
+            )
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Trace report CLI - python -m AlephPi.Tracing traces.jsonl [--day YYYY-MM-DD]"""
+    parser = argparse.ArgumentParser(description="Print p50 / p95 / p99 turn latencies per stage and per letter.")
+    parser.add_argument("paths", nargs="*", default=["traces.jsonl"], help="Trace files, rotated files are included.")
+    parser.add_argument("--day", default=time.strftime("%Y-%m-%d"), help="Local date (YYYY-MM-DD), default today.")
+    parser.add_argument("--all", action="store_true", help="Report all the traced days.")
+    args = parser.parse_args(argv)
+
+    turns = load_turns(args.paths, None if args.all else args.day)
+    if not turns:
+        print("No traced turns", file=sys.stderr)
+        sys.exit(1)
+    report(turns)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+from typing import Union
+
+import numpy as np
+
+from . import AudioBuffer, Logger
+
+
+class VoiceActivityDetector:
+    """Energy / zero-crossing voice activity detection, used for ending a record as soon as the user stops talking and trimming its silence.
+
+    Every chunk is split to short frames and all frames are classified at once (vectorized). A frame is speech when its RMS energy is above energy_threshold,
+    or when it's above half the threshold with a high zero crossing rate - weak fricatives (shin, samech, tzadik) are quiet but cross zero often.
+
+    Attributes:
+        sample_rate (int): Sample rate of the 16 bit mono audio.
+        energy_threshold (float): RMS energy of a speech frame.
+        zcr_threshold (float): Zero crossings per sample above which a weak frame is treated as a fricative.
+        hangover (float): Seconds of silence after speech that end the phrase.
+        padding (float): Seconds of silence kept around the speech when trimming.
+        speech_started (bool): Speech was detected since the last reset.
+        ended (bool): The phrase ended - speech was followed by hangover seconds of silence.
+    """
+
+    @Logger.log_function
+    def __init__(
+        self,
+        sample_rate: int,
+        energy_threshold: float = 400,
+        zcr_threshold: float = 0.25,
+        hangover: float = 0.3,
+        frame_seconds: float = 0.01,
+        padding: float = 0.1,
+    ) -> None:
+        """Constructs VoiceActivityDetector.
+
+        Args:
+            See Attributes section in class docstring
+            frame_seconds (float, optional): Duration of a classified frame. Defaults to 0.01.
+        """
+        self.sample_rate = sample_rate
+        self.energy_threshold = energy_threshold
+        self.zcr_threshold = zcr_threshold
+        self.hangover = hangover
+        self.padding = padding
+        self._frame_length = max(1, int(sample_rate * frame_seconds))
+        self._hangover_frames = int(np.ceil(hangover / frame_seconds))
+        self._padding_frames = int(np.ceil(padding / frame_seconds))
+        self.reset()
+
+    def reset(self) -> None:
+        """Reset the detection state, before a new record."""
+        self.speech_started = False
+        self.ended = False
+        self._silent_frames = 0
+
+    def speech_frames(self, samples: np.ndarray) -> np.ndarray:
+        """Classify the frames of a block of samples. A partial frame at the end of the block is ignored.
+
+        Args:
+            samples (np.ndarray): 16 bit mono samples.
+
+        Returns:
+            np.ndarray: A boolean per frame, True for speech.
+        """
+        frames_count = len(samples) // self._frame_length
+        # A view of the samples - the energy is accumulated in float64 without converting the samples
+        frames = samples[: frames_count * self._frame_length].reshape(frames_count, self._frame_length)
+
+        energy = np.sqrt(np.einsum("ij,ij->i", frames, frames, dtype=np.float64) / self._frame_length)
+        signs = frames < 0
+        zcr = np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) / self._frame_length
+        return (energy > self.energy_threshold) | (
+            (energy > self.energy_threshold / 2) & (zcr > self.zcr_threshold)
+        )
+
+    def process(self, chunk: Union[bytes, np.ndarray]) -> bool:
+        """Update the detection state with the next recorded chunk.
+
+        Args:
+            chunk (Union[bytes, np.ndarray]): 16 bit mono PCM chunk, or a view of its samples.
+
+        Returns:
+            bool: If the phrase ended.
+        """
+        samples = chunk if isinstance(chunk, np.ndarray) else np.frombuffer(chunk, dtype=np.int16)
+        speech = self.speech_frames(samples)
+        if speech.any():
+            self.speech_started = True
+            # Silent frames after the last speech frame of the chunk
+            self._silent_frames = len(speech) - 1 - int(np.flatnonzero(speech)[-1])
+        else:
+            self._silent_frames += len(speech)
+
+        if self.speech_started and self._silent_frames >= self._hangover_frames:
+            self.ended = True
+        return self.ended
+
+    def trim(self, audio: AudioBuffer.AudioBuffer) -> AudioBuffer.AudioBuffer:
+        """Trim the leading and trailing silence of a record, keeping padding seconds around the speech.
+
+        Args:
+            audio (AudioBuffer): The record.
+
+        Returns:
+            AudioBuffer: A view of the trimmed record, the whole record when no speech was detected.
+        """
+        speech = np.flatnonzero(self.speech_frames(audio.samples))
+        if len(speech) == 0:
+            return audio
+        first_frame = max(0, speech[0] - self._padding_frames)
+        last_frame = speech[-1] + 1 + self._padding_frames
+        return audio.view(first_frame * self._frame_length, last_frame * self._frame_length, "vad")
@@ -0,0 +1,496 @@
+#!/usr/bin/env python3
+"""End-to-end game benchmark on simulated hardware.
+
+Drives AlephGame through full turns - scripted button presses on a SimulatedBoard, records played from a WAV / FLAC corpus
+instead of a live mic (the unrecognized / misdetection archives by default, or synthetic utterances), silent sounds of a fixed duration,
+and a local stub recognizer with configurable latency. The results are written as JSON - throughput, per-stage latency distributions
+(from the turn traces) and recognition accuracy - and can be compared with a previous run to catch regressions.
+
+Usage:
+    python benchmarks/game_benchmark.py --turns 50 --output run.json
+    python benchmarks/game_benchmark.py --synthetic 3 --latency 0.4 --compare run.json
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import logging
+import argparse
+import tempfile
+import importlib
+import threading
+import configparser
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# The game modules use package relative imports, import them through the repository folder name
+sys.path.insert(0, os.path.dirname(REPO))
+PACKAGE = os.path.basename(REPO)
+
+
+def _module(name: str):
+    return importlib.import_module(f"{PACKAGE}.{name}")
+
+
+AlephGame = _module("AlephGame")
+AudioBuffer = _module("AudioBuffer")
+AudioPreparation = _module("AudioPreparation")
+Board = _module("Board")
+ConnectivityMonitor = _module("ConnectivityMonitor")
+EventStore = _module("EventStore")
+KeywordSpotter = _module("KeywordSpotter")
+LedAnimator = _module("LedAnimator")
+RecognizerBackend = _module("RecognizerBackend")
+Sound = _module("Sound")
+SpeechRecognition = _module("SpeechRecognition")
+Tracing = _module("Tracing")
+
+
+class Utterance:
+    """A corpus record.
+
+    Attributes:
+        letter (str): The verbal value of the letter said in the record.
+        samples (np.ndarray): 16 bit mono samples.
+        sample_rate (int): Sample rate of the samples.
+        transcript (Optional[str]): The transcript saved next to an archived record, None when unknown.
+        source (str): The record file, or "synthetic".
+    """
+
+    def __init__(self, letter: str, samples: np.ndarray, sample_rate: int, transcript: Optional[str], source: str) -> None:
+        self.letter = letter
+        self.samples = samples
+        self.sample_rate = sample_rate
+        self.transcript = transcript
+        self.source = source
+
+
+def load_corpus(folders: List[str]) -> Dict[str, List[Utterance]]:
+    """Load the archived records of folders, labeled by their _expected_<letter> filenames.
+
+    Args:
+        folders (List[str]): Archive folders.
+
+    Returns:
+        Dict[str, List[Utterance]]: key = letter, value = its records.
+    """
+    corpus = {}
+    for letter, filepaths in KeywordSpotter.template_files(os.devnull, folders).items():
+        for filepath in filepaths:
+            try:
+                samples, sample_rate = KeywordSpotter.load_audio_file(filepath)
+            except (ImportError, OSError, RuntimeError, ValueError, EOFError) as ex:
+                logging.warning(f"Skipping corpus record {filepath} - {ex}")
+                continue
+            transcript = None
+            sidecar = f"{os.path.splitext(filepath)[0]}.json"
+            if os.path.isfile(sidecar):
+                with open(sidecar, encoding="utf-8") as sidecar_file:
+                    transcript = json.load(sidecar_file).get("transcript")
+            corpus.setdefault(letter, []).append(
+                Utterance(letter, samples.astype(np.int16), sample_rate, transcript, filepath)
+            )
+    return corpus
+
+
+def synthetic_corpus(letters: List[str], per_letter: int, sample_rate: int, seed: int) -> Dict[str, List[Utterance]]:
+    """Generate voiced utterances - a harmonic tone per letter, with noise and a syllable envelope.
+
+    Args:
+        letters (List[str]): The letters.
+        per_letter (int): Utterances per letter.
+        sample_rate (int): Sample rate of the utterances.
+        seed (int): Random seed.
+
+    Returns:
+        Dict[str, List[Utterance]]: key = letter, value = its utterances.
+    """
+    rng = np.random.RandomState(seed)
+    corpus = {}
+    for index, letter in enumerate(letters):
+        for _ in range(per_letter):
+            duration = rng.uniform(0.4, 0.8)
+            t = np.arange(int(duration * sample_rate)) / sample_rate
+            pitch = 120 + 7 * index + rng.uniform(-5, 5)
+            voice = sum(np.sin(2 * np.pi * pitch * harmonic * t) / harmonic for harmonic in range(1, 6))
+            envelope = np.sin(np.pi * t / duration) ** 0.5
+            samples = 5000 * envelope * voice + rng.normal(0, 200, len(t))
+            corpus.setdefault(letter, []).append(
+                Utterance(letter, np.clip(samples, -32768, 32767).astype(np.int16), sample_rate, None, "synthetic")
+            )
+    return corpus
+
+
+class CorpusMicrophone:
+    """Audio source replaying corpus records as if they were said to the mic, at real time pace (or faster).
+
+    On every record the source picks a record of the letter the game expects, and plays it between lead / trail silence.
+    Records are resampled to the source sample rate.
+
+    Attributes:
+        SAMPLE_RATE (int): Sample rate of the source.
+        SAMPLE_WIDTH (int): 2 - 16 bit samples.
+        CHUNK (int): Samples per read.
+        current (Optional[Utterance]): The record being played.
+    """
+
+    SAMPLE_WIDTH = 2
+
+    def __init__(
+        self,
+        corpus: Dict[str, List[Utterance]],
+        expected_letter: Callable[[], str],
+        sample_rate: int,
+        chunk_size: int,
+        speed: float = 1.0,
+        lead_seconds: float = 0.3,
+        seed: int = 0,
+    ) -> None:
+        self.corpus = corpus
+        self.expected_letter = expected_letter
+        self.SAMPLE_RATE = sample_rate
+        self.CHUNK = chunk_size
+        self.speed = speed
+        self.lead_seconds = lead_seconds
+        self.current = None
+        self.stream = None
+        self._random = random.Random(seed)
+        self._audio = b""
+        self._position = 0
+        self._next_read = 0.0
+
+    def __enter__(self) -> "CorpusMicrophone":
+        self.current = self._random.choice(self.corpus[self.expected_letter()])
+        samples = self.current.samples
+        if self.current.sample_rate != self.SAMPLE_RATE:
+            samples = AudioPreparation.resample_poly(samples, self.SAMPLE_RATE, self.current.sample_rate)
+            samples = np.clip(samples, -32768, 32767).astype(np.int16)
+        lead = np.zeros(int(self.lead_seconds * self.SAMPLE_RATE), dtype=np.int16)
+        self._audio = np.concatenate([lead, samples]).tobytes()
+        self._position = 0
+        self._next_read = time.monotonic()
+        self.stream = self
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.stream = None
+
+    def read(self, size: int) -> bytes:
+        # Block like a mic would, until the chunk was "recorded"
+        self._next_read += size / self.SAMPLE_RATE / self.speed
+        delay = self._next_read - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        length = size * self.SAMPLE_WIDTH
+        chunk = self._audio[self._position : self._position + length]
+        self._position += length
+        # Silence after the record
+        return chunk + bytes(length - len(chunk))
+
+
+class SilentSound:
+    """Stands for Sound without an audio device - every clip "plays" for a fixed duration.
+
+    Attributes:
+        clip_seconds (float): Duration of every clip.
+        audio_files (Dict[str, str]): key = game sound, value = its name.
+        correct_answers_folders (str): Unused, the correct answers are named by their letter.
+        played (int): Amount of played clips.
+    """
+
+    def __init__(self, clip_seconds: float) -> None:
+        self.clip_seconds = clip_seconds
+        self.audio_files = {sound.value: sound.value for sound in Sound.GameSound}
+        self.correct_answers_folders = os.devnull
+        self.played = 0
+
+    def play_game_sound(self, sound: Any, wait: bool = True) -> Future:
+        return self.play_audio_file(self.audio_files[sound.value], wait)
+
+    def play_audio_file(self, filepath: str, wait: bool = True) -> Future:
+        future = self.play_async([filepath])
+        if wait:
+            future.result()
+        return future
+
+    def play_async(self, filepaths: List[str]) -> Future:
+        future = Future()
+        token = Tracing.tracer.begin("play:" + "+".join(os.path.basename(filepath) for filepath in filepaths))
+        future.add_done_callback(lambda _: Tracing.tracer.end(token))
+        self.played += len(filepaths)
+        timer = threading.Timer(self.clip_seconds * len(filepaths), future.set_result, (None,))
+        timer.daemon = True
+        timer.start()
+        return future
+
+    def stop(self) -> None:
+        pass
+
+    def correct_answer_file(self, letter: str) -> str:
+        return letter
+
+    def correct_answers_files(self) -> List[str]:
+        return []
+
+
+def distribution(values: List[float]) -> Dict[str, float]:
+    """Summarize latencies.
+
+    Args:
+        values (List[float]): Milliseconds.
+
+    Returns:
+        Dict[str, float]: count, mean, p50, p95, p99 and max.
+    """
+    values = sorted(values)
+    if not values:
+        return {"count": 0}
+    return {
+        "count": len(values),
+        "mean": round(sum(values) / len(values), 3),
+        "p50": round(Tracing.percentile(values, 50), 3),
+        "p95": round(Tracing.percentile(values, 95), 3),
+        "p99": round(Tracing.percentile(values, 99), 3),
+        "max": round(values[-1], 3),
+    }
+
+
+def wait_until(condition: Callable[[], bool], timeout: float) -> None:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise TimeoutError("The game didn't reach the expected state in time")
+        time.sleep(0.002)
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    """Run the benchmark.
+
+    Args:
+        args (argparse.Namespace): The command line arguments.
+
+    Returns:
+        Dict[str, Any]: The results.
+    """
+    config = configparser.ConfigParser()
+    config.read(os.path.join(REPO, "aleph_config.ini"))
+    letters_gpios = {int(pin): letter for pin, letter in config["Letters GPIOs"].items()}
+
+    if args.synthetic:
+        corpus = synthetic_corpus(sorted(set(letters_gpios.values())), args.synthetic, args.sample_rate, args.seed)
+    else:
+        corpus = load_corpus(args.corpus)
+    # Only letters with records can be selected
+    letters_gpios = {pin: letter for pin, letter in letters_gpios.items() if corpus.get(letter)}
+    if not letters_gpios:
+        raise SystemExit(f"No corpus records of the game letters in {args.corpus}, try --synthetic")
+
+    work_folder = tempfile.mkdtemp(prefix="aleph_benchmark_")
+    tracing_config = configparser.ConfigParser()
+    tracing_config["Tracing"] = {"trace_file": os.path.join(work_folder, "traces.jsonl")}
+    Tracing.tracer.configure(tracing_config["Tracing"])
+    tracing_config["Event Store"] = {"database": os.path.join(work_folder, "events.db")}
+    EventStore.store.configure(tracing_config["Event Store"])
+
+    # The recognizer answers the transcript saved with the record, or an alias of its letter - misrecognizing 1 - accuracy of the records
+    with open(os.path.join(REPO, "recognition_options.json"), encoding="utf-8") as options_file:
+        aliases = {}
+        for alias, letter in json.load(options_file).items():
+            aliases.setdefault(letter, []).append(alias)
+    answers = random.Random(args.seed)
+
+    def answer(audio_data) -> RecognizerBackend.RecognitionResult:
+        utterance = microphone.current
+        letter = utterance.letter
+        if answers.random() >= args.accuracy:
+            letter = answers.choice([other for other in aliases if other != letter])
+        elif utterance.transcript:
+            return RecognizerBackend.RecognitionResult(utterance.transcript, None, 0.9)
+        if letter not in aliases:
+            return RecognizerBackend.RecognitionResult(letter, letter, 0.9)
+        return RecognizerBackend.RecognitionResult(answers.choice(aliases[letter]), None, 0.9)
+
+    board = Board.SimulatedBoard()
+    led_animator = LedAnimator.LedAnimator(board)
+    sound = SilentSound(args.sound_seconds)
+    game = None
+    microphone = CorpusMicrophone(
+        corpus,
+        lambda: game.letters_gpio_dict[game._current_letter_gpio],
+        args.sample_rate,
+        int(config["Speech Recognition"].get("chunk_size", 2048)),
+        args.speed,
+        seed=args.seed,
+    )
+
+    sr_config = config["Speech Recognition"]
+    sr_config["recognition_options_file_path"] = os.path.join(REPO, "recognition_options.json")
+    sr_config["sample_rate"] = str(args.sample_rate)
+    sr_config["recognition_mode"] = "batch"
+    # The corpus mics start a new record every time they are opened
+    sr_config["persistent_capture"] = "False"
+    sr_config["unrecognized_folder"] = os.path.join(work_folder, "unrecognized")
+    sr_config["misdetection_folder"] = os.path.join(work_folder, "misdetection")
+    speech_recognition = SpeechRecognition.SpeechRecognition(
+        logging.getLogger(),
+        sound,
+        led_animator,
+        sr_config,
+        # Probes fail immediately, without leaving the machine
+        ConnectivityMonitor.ConnectivityMonitor(ConnectivityMonitor.create_session(), "http://127.0.0.1:9/", 0.1, 3600),
+        microphone,
+        RecognizerBackend.StubBackend(answer, args.latency, args.jitter, args.failure_rate, seed=args.seed),
+    )
+
+    start_pin = config["Operative GPIOs"].getint("start_button", 38)
+    game = AlephGame.AlephGame(
+        board,
+        led_animator,
+        sound,
+        speech_recognition,
+        letters_gpios,
+        start_pin,
+        config["Operative GPIOs"].getint("blink_record", 40),
+        args.lives,
+        None,
+        config["Game Properties"].getfloat("demo_sleep_timeout", 1),
+        config["Game Properties"].getfloat("blink_sleep_timeout", 0.1),
+    )
+    threading.Thread(target=game.run_game, daemon=True).start()
+
+    press_rng = random.Random(args.seed)
+    button = game.button_input
+    # Presses within the debounce time of the previous press are bounces
+    bounce_seconds = button.debounce_ms / 1000 + 0.01
+    turns = 0
+    last_press = 0.0
+    start = time.monotonic()
+    while turns < args.turns:
+        wait_until(lambda: button.waiting, args.timeout)
+        selecting = game.state == AlephGame.GameState.SELECTING
+        consumed = button.stats()["consumed"]
+        time.sleep(max(press_rng.uniform(0.5, 1.5) * args.press_delay, last_press + bounce_seconds - time.monotonic()))
+        last_press = time.monotonic()
+        board.press_button(start_pin)
+        # The press is queued even if the game isn't waiting yet, wait until the game took it
+        wait_until(lambda: button.stats()["consumed"] > consumed, args.timeout)
+        turns += selecting
+    # Let the last turn end
+    wait_until(lambda: button.waiting, args.timeout)
+    elapsed = time.monotonic() - start
+    speech_recognition.recording_archive.flush(5)
+    EventStore.store.flush(5)
+
+    traced = Tracing.load_turns([tracing_config["Tracing"]["trace_file"]])
+    results = {}
+    stages = {"turn": []}
+    for turn in traced:
+        results[turn["result"]] = results.get(turn["result"], 0) + 1
+        stages["turn"].append(turn["duration_ms"])
+        for span in turn["spans"]:
+            if "duration_ms" in span:
+                stages.setdefault(span["name"], []).append(span["duration_ms"])
+            else:
+                stages.setdefault(f"@{span['name']}", []).append(span["start_ms"])
+    answered = results.get("hit", 0) + results.get("miss", 0)
+
+    return {
+        "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "parameters": {
+            key: value for key, value in vars(args).items() if key not in ("output", "compare", "tolerance")
+        },
+        "corpus": {letter: len(utterances) for letter, utterances in corpus.items()},
+        "turns": len(traced),
+        "elapsed_seconds": round(elapsed, 3),
+        "turns_per_minute": round(len(traced) / elapsed * 60, 3),
+        "results": results,
+        "accuracy": round(results.get("hit", 0) / answered, 4) if answered else None,
+        "stages_ms": {name: distribution(values) for name, values in sorted(stages.items())},
+        "reaction_latency_ms": distribution(list(game.reaction_latencies_ms)),
+        "led_jitter": led_animator.jitter_stats(),
+        "button": game.button_input.stats(),
+        "event_store": EventStore.store.stats(),
+        "archive": speech_recognition.recording_archive.stats(),
+        # Breaker state of the recognizer backend, and the calls it failed fast
+        "circuit": speech_recognition.circuit_breaker.stats(),
+        # Audio buffers allocated (copies) and views taken by every pipeline stage
+        "audio_allocations": AudioBuffer.allocations.stats(),
+    }
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Compare a run to a baseline run.
+
+    Args:
+        current (Dict[str, Any]): The current results.
+        baseline (Dict[str, Any]): The baseline results.
+        tolerance (float): Allowed relative degradation.
+
+    Returns:
+        List[str]: The regressions, empty when there are none.
+    """
+    regressions = []
+    print(f"{'metric':28} {'baseline':>10} {'current':>10} {'change':>8}")
+
+    def check(name: str, old: Optional[float], new: Optional[float], higher_is_better: bool, min_delta: float = 0.0) -> None:
+        if old is None or new is None:
+            return
+        change = (new - old) / old if old else 0.0
+        worse = (old - new) if higher_is_better else (new - old)
+        regressed = worse > max(abs(old) * tolerance, min_delta)
+        print(f"{name:28} {old:>10.2f} {new:>10.2f} {change:>+8.1%}{'  REGRESSION' if regressed else ''}")
+        if regressed:
+            regressions.append(name)
+
+    check("turns_per_minute", baseline.get("turns_per_minute"), current.get("turns_per_minute"), True)
+    check("accuracy", baseline.get("accuracy"), current.get("accuracy"), True)
+    for stage in sorted(set(baseline["stages_ms"]) & set(current["stages_ms"])):
+        # Ignore sub-5ms wobbles of fast stages
+        check(f"{stage} p95", baseline["stages_ms"][stage].get("p95"), current["stages_ms"][stage].get("p95"), False, 5.0)
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=30, help="Turns to play.")
+    parser.add_argument("--corpus", nargs="*", default=["unrecognized", "misdetection"], help="Archive folders of the corpus.")
+    parser.add_argument("--synthetic", type=int, default=0, help="Generate this amount of utterances per letter instead of a corpus.")
+    parser.add_argument("--sample-rate", type=int, default=48000, help="Sample rate of the simulated mic.")
+    parser.add_argument("--speed", type=float, default=1.0, help="Replay the records this many times faster than real time.")
+    parser.add_argument("--latency", type=float, default=0.3, help="Stub recognizer latency, seconds.")
+    parser.add_argument("--jitter", type=float, default=0.05, help="Stub recognizer latency jitter, seconds.")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Share of failing recognition requests.")
+    parser.add_argument("--accuracy", type=float, default=0.9, help="Share of the records the stub recognizes correctly.")
+    parser.add_argument("--sound-seconds", type=float, default=0.1, help="Duration of every played clip.")
+    parser.add_argument("--press-delay", type=float, default=0.2, help="Mean seconds before every button press.")
+    parser.add_argument("--lives", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--timeout", type=float, default=30, help="Seconds to wait for the game before failing.")
+    parser.add_argument("--output", help="Write the results JSON to this file.")
+    parser.add_argument("--compare", help="Baseline results JSON, exit with 1 on regressions.")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="Allowed relative degradation when comparing.")
+    args = parser.parse_args()
+
+    results = run(args)
+    text = json.dumps(results, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output_file:
+            output_file.write(text)
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as baseline_file:
+            regressions = compare(results, json.load(baseline_file), args.tolerance)
+        if regressions:
+            print(f"Regressions: {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
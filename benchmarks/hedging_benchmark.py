@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""Hedged recognition benchmark with stub backends.
+
+Recognizes the same amount of records with the primary stub backend alone and with the primary hedged by a secondary stub,
+and compares their latency distributions. Both stubs answer an alias of the expected letter, the primary has a slow tail
+(tail_rate of its requests take tail_latency more) like a remote service, the secondary is slower on average but has no tail.
+
+Usage:
+    python benchmarks/hedging_benchmark.py --records 200 --delay 0.8
+    python benchmarks/hedging_benchmark.py --delay 0 --secondary-latency 0.3 --output run.json
+"""
+
+import os
+import json
+import time
+import random
+import argparse
+from typing import Any, Callable, Dict
+
+import speech_recognition as sr
+
+import game_benchmark
+from game_benchmark import distribution
+
+HedgedRecognition = game_benchmark._module("HedgedRecognition")
+RecognitionIndex = game_benchmark._module("RecognitionIndex")
+RecognizerBackend = game_benchmark._module("RecognizerBackend")
+
+
+def measure(
+    backend: RecognizerBackend.RecognizerBackend,
+    index: RecognitionIndex.RecognitionIndex,
+    records: int,
+    expected: Callable[[], str],
+) -> Dict[str, Any]:
+    """Recognize records, returning the latency distribution, the hits and the errors."""
+    latencies = []
+    hits = 0
+    errors = 0
+    audio = sr.AudioData(bytes(3200), 16000, 2)
+    for _ in range(records):
+        letter = expected()
+        start = time.monotonic()
+        try:
+            result = backend.recognize(audio)
+        except (sr.RequestError, sr.UnknownValueError):
+            errors += 1
+        else:
+            match = index.match(result.alternatives)
+            hits += bool(match and match.letter == letter)
+        latencies.append((time.monotonic() - start) * 1000)
+    return {"latency_ms": distribution(latencies), "hits": hits, "errors": errors}
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    """Run the benchmark.
+
+    Args:
+        args (argparse.Namespace): The command line arguments.
+
+    Returns:
+        Dict[str, Any]: The results.
+    """
+    options_path = os.path.join(game_benchmark.REPO, "recognition_options.json")
+    index = RecognitionIndex.RecognitionIndex(options_path)
+    with open(options_path, encoding="utf-8") as options_file:
+        aliases = {}
+        for alias, letter in json.load(options_file).items():
+            aliases.setdefault(letter, []).append(alias)
+
+    rng = random.Random(args.seed)
+    current = {}
+
+    def expected() -> str:
+        current["letter"] = rng.choice(sorted(aliases))
+        return current["letter"]
+
+    def answer(confidence: float):
+        return lambda audio_data: RecognizerBackend.RecognitionResult(
+            rng.choice(aliases[current["letter"]]), None, confidence
+        )
+
+    def primary() -> RecognizerBackend.StubBackend:
+        return RecognizerBackend.StubBackend(
+            answer(0.9),
+            args.latency,
+            args.jitter,
+            args.failure_rate,
+            name="primary",
+            seed=args.seed,
+            tail_rate=args.tail_rate,
+            tail_latency=args.tail_latency,
+        )
+
+    secondary = RecognizerBackend.StubBackend(
+        answer(0.8), args.secondary_latency, args.secondary_jitter, name="secondary", seed=args.seed + 1
+    )
+    hedged = HedgedRecognition.HedgedBackend([primary(), secondary], index, args.delay, args.min_confidence)
+
+    baseline = measure(primary(), index, args.records, expected)
+    result = measure(hedged, index, args.records, expected)
+    result["backends"] = hedged.stats()
+    return {
+        "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "parameters": {key: value for key, value in vars(args).items() if key != "output"},
+        "primary_only": baseline,
+        "hedged": result,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--records", type=int, default=100, help="Records to recognize in every mode.")
+    parser.add_argument("--delay", type=float, default=0.8, help="Seconds before hedging with the secondary backend.")
+    parser.add_argument("--min-confidence", type=float, default=0.5, help="Results at least this confident win right away.")
+    parser.add_argument("--latency", type=float, default=0.5, help="Primary latency, seconds.")
+    parser.add_argument("--jitter", type=float, default=0.15, help="Primary latency jitter, seconds.")
+    parser.add_argument("--tail-rate", type=float, default=0.1, help="Share of the primary requests in the slow tail.")
+    parser.add_argument("--tail-latency", type=float, default=2.5, help="Extra seconds of the primary slow tail.")
+    parser.add_argument("--failure-rate", type=float, default=0.02, help="Share of failing primary requests.")
+    parser.add_argument("--secondary-latency", type=float, default=0.6, help="Secondary latency, seconds.")
+    parser.add_argument("--secondary-jitter", type=float, default=0.1, help="Secondary latency jitter, seconds.")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="Write the results JSON to this file.")
+    args = parser.parse_args()
+
+    text = json.dumps(run(args), indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output_file:
+            output_file.write(text)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""Micro-benchmark of the per-call overhead of Logger.log_function.
+
+Compares the previous decorator (eager f-string of the arguments, synchronous RotatingFileHandler) with the current one
+(lazy formatting, sampling, QueueHandler / QueueListener), calling a decorated method with a large object argument - like the game objects.
+
+Usage:
+    python benchmarks/logger_overhead.py [--calls 20000]
+"""
+
+import os
+import sys
+import time
+import logging
+import argparse
+import tempfile
+import importlib
+import configparser
+import logging.handlers
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Imported through the package like the game does (see game_benchmark), without importing the other game modules
+sys.path.insert(0, os.path.dirname(REPO))
+PACKAGE = os.path.basename(REPO)
+
+
+def _module(name: str):
+    return importlib.import_module(f"{PACKAGE}.{name}")
+
+
+Logger = _module("Logger")
+
+
+def legacy_log_function(func):
+    """The decorator before the rewrite, kept for comparison."""
+
+    def wrapper(*args, **kwargs):
+        try:
+            logging.info(f"{func.__name__} started with parameters: {args} {kwargs}")
+            return func(*args, **kwargs)
+        except Exception as ex:
+            logging.exception(ex)
+            raise ex
+        finally:
+            logging.info(f"Function {func.__name__} exited")
+
+    return wrapper
+
+
+class Game:
+    """Stands for the game objects, whose repr is long."""
+
+    def __init__(self):
+        self.pins = {pin: f"letter_{pin}" for pin in range(40)}
+
+    def __repr__(self):
+        return f"Game({self.__dict__})"
+
+    def turn_all_letters_gpios(self, on):
+        return on
+
+
+def legacy_handler(log_path):
+    logger = logging.getLogger()
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+    logger.setLevel(logging.DEBUG)
+    handler = logging.handlers.RotatingFileHandler(log_path, maxBytes=500000, backupCount=4)
+    handler.setFormatter(logging.Formatter("%(asctime)s - %(levelname)s - %(message)s", "%Y-%m-%d %H:%M:%S"))
+    logger.addHandler(handler)
+
+
+def current_handler(log_path, **log_config):
+    logger = logging.getLogger()
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+    Logger.setup_logger(log_path)
+    config = configparser.ConfigParser()
+    config["Log"] = log_config
+    Logger.configure(config["Log"])
+
+
+def measure(func, game, calls):
+    start = time.perf_counter()
+    for i in range(calls):
+        func(game, i % 2 == 0)
+    return (time.perf_counter() - start) / calls * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=20000)
+    args = parser.parse_args()
+
+    game = Game()
+    undecorated = Game.turn_all_letters_gpios
+    legacy = legacy_log_function(undecorated)
+    current = Logger.log_function(undecorated)
+
+    results = []
+    with tempfile.TemporaryDirectory() as folder:
+        log_path = os.path.join(folder, "log.txt")
+        results.append(("undecorated", measure(undecorated, game, args.calls)))
+
+        legacy_handler(log_path)
+        results.append(("legacy, DEBUG", measure(legacy, game, args.calls)))
+        logging.getLogger().setLevel(logging.WARNING)
+        results.append(("legacy, WARNING", measure(legacy, game, args.calls)))
+
+        for title, log_config in [
+            ("current, DEBUG", {"log_level": "DEBUG"}),
+            ("current, DEBUG, sampled 1:50", {"log_level": "DEBUG", "sampled_functions": "turn_all_letters_gpios:50"}),
+            ("current, disabled function", {"log_level": "DEBUG", "disabled_functions": "turn_all_letters_gpios"}),
+            ("current, WARNING", {"log_level": "WARNING"}),
+        ]:
+            current_handler(log_path, **log_config)
+            results.append((title, measure(current, game, args.calls)))
+            # Includes draining the queue, but it's not part of the caller cost
+            Logger.shutdown()
+
+    width = max(len(title) for title, _ in results)
+    print(f"{'':{width}}  us per call")
+    for title, microseconds in results:
+        print(f"{title:{width}}  {microseconds:8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""Multi-station benchmark on simulated stations.
+
+Runs several games in one MultiStation host, each station a SimulatedBoard served over loopback TCP by a BoardServer
+(the same remote board protocol as real stations), replaying corpus records to its mic (see game_benchmark.py).
+All the stations share one stub recognizer through the recognition pool, while a busy station keeps the pool flooded with
+recognitions of its own. The results show how the pool splits the workers - per station turns, and the time recognitions
+waited for a worker. The stub answers random letters, recognition accuracy is measured by game_benchmark.py.
+
+Usage:
+    python benchmarks/multi_station_benchmark.py --stations 3 --turns 10 --workers 2
+    python benchmarks/multi_station_benchmark.py --stations 3 --max-in-flight 2 --output run.json
+"""
+
+import os
+import json
+import time
+import random
+import logging
+import argparse
+import tempfile
+import threading
+import configparser
+from typing import Any, Dict
+
+import speech_recognition as sr
+
+import game_benchmark
+from game_benchmark import CorpusMicrophone, SilentSound, distribution, wait_until
+
+AlephGame = game_benchmark._module("AlephGame")
+Board = game_benchmark._module("Board")
+ConnectivityMonitor = game_benchmark._module("ConnectivityMonitor")
+MultiStation = game_benchmark._module("MultiStation")
+RecognizerBackend = game_benchmark._module("RecognizerBackend")
+RemoteBoard = game_benchmark._module("RemoteBoard")
+
+BUSY_STATION = "busy"
+# AlephGame debounces the button presses by 200 ms (button_debounce_ms), the edges reach it over the network
+BOUNCE_SECONDS = 0.25
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    """Run the benchmark.
+
+    Args:
+        args (argparse.Namespace): The command line arguments.
+
+    Returns:
+        Dict[str, Any]: The results.
+    """
+    config = configparser.ConfigParser()
+    config.read(os.path.join(game_benchmark.REPO, "aleph_config.ini"))
+    letters = sorted(set(config["Letters GPIOs"].values()))
+    corpus = game_benchmark.synthetic_corpus(letters, args.synthetic, args.sample_rate, args.seed)
+
+    work_folder = tempfile.mkdtemp(prefix="aleph_multi_station_")
+    config["Stations"] = {
+        "recognition_workers": str(args.workers),
+        "max_in_flight_per_station": str(args.max_in_flight),
+    }
+    sr_config = config["Speech Recognition"]
+    sr_config["recognition_options_file_path"] = os.path.join(game_benchmark.REPO, "recognition_options.json")
+    sr_config["sample_rate"] = str(args.sample_rate)
+    sr_config["recognition_mode"] = "batch"
+    # The corpus mics start a new record every time they are opened
+    sr_config["persistent_capture"] = "False"
+    sr_config["unrecognized_folder"] = os.path.join(work_folder, "unrecognized")
+    sr_config["misdetection_folder"] = os.path.join(work_folder, "misdetection")
+    config["Game Properties"]["lives"] = str(args.lives)
+
+    answers = random.Random(args.seed)
+
+    def answer(audio_data: sr.AudioData) -> RecognizerBackend.RecognitionResult:
+        letter = answers.choice(letters)
+        return RecognizerBackend.RecognitionResult(letter, letter, 0.9)
+
+    backend = RecognizerBackend.StubBackend(
+        answer,
+        args.latency,
+        args.jitter,
+        seed=args.seed,
+    )
+    host = MultiStation.MultiStation(
+        config,
+        logging.getLogger(),
+        backend,
+        # Probes fail immediately, without leaving the machine
+        ConnectivityMonitor.ConnectivityMonitor(ConnectivityMonitor.create_session(), "http://127.0.0.1:9/", 0.1, 3600),
+    )
+
+    servers = {}
+    games = {}
+    for index in range(args.stations):
+        name = f"station{index + 1}"
+        server = RemoteBoard.BoardServer(Board.SimulatedBoard(), "127.0.0.1", 0)
+        server.start()
+        servers[name] = server
+        microphone = CorpusMicrophone(
+            corpus,
+            lambda name=name: games[name].letters_gpio_dict[games[name]._current_letter_gpio],
+            args.sample_rate,
+            sr_config.getint("chunk_size", 2048),
+            args.speed,
+            seed=args.seed + index,
+        )
+        station = host.add_station(
+            name, RemoteBoard.RemoteBoard(server.host, server.port), SilentSound(args.sound_seconds), microphone
+        )
+        games[name] = station.game
+
+    # The busy station keeps flood recognitions queued all the time
+    flood_audio = sr.AudioData(bytes(args.sample_rate), args.sample_rate, 2)
+    stop = threading.Event()
+
+    def flood() -> None:
+        outstanding = []
+        while not stop.is_set():
+            outstanding = [future for future in outstanding if not future.done()]
+            while len(outstanding) < args.flood:
+                outstanding.append(host.pool.submit(BUSY_STATION, lambda: backend.recognize(flood_audio)))
+            time.sleep(0.01)
+
+    start_pin = config["Operative GPIOs"].getint("start_button", 38)
+    turns = {name: 0 for name in servers}
+    turn_ms = {name: [] for name in servers}
+
+    def drive(index: int, station: MultiStation.Station) -> None:
+        name = station.name
+        board = servers[name].board
+        press_rng = random.Random(args.seed + index)
+        turn_start = None
+        last_press = 0.0
+        button = station.game.button_input
+        while turns[name] < args.turns:
+            wait_until(lambda: button.waiting, args.timeout)
+            selecting = station.game.state == AlephGame.GameState.SELECTING
+            if selecting and turn_start is not None:
+                turn_ms[name].append((time.monotonic() - turn_start) * 1000)
+            consumed = button.stats()["consumed"]
+            # Presses within the button debounce time of the previous press are ignored
+            time.sleep(max(press_rng.uniform(0.5, 1.5) * args.press_delay, last_press + BOUNCE_SECONDS - time.monotonic()))
+            turn_start = time.monotonic() if selecting else turn_start
+            last_press = time.monotonic()
+            board.press_button(start_pin)
+            # The press is queued even if the game isn't waiting yet, wait until the game took it
+            wait_until(lambda: button.stats()["consumed"] > consumed, args.timeout)
+            turns[name] += selecting
+
+    if args.flood:
+        threading.Thread(target=flood, daemon=True).start()
+    threading.Thread(target=host.run, daemon=True).start()
+    drivers = [
+        threading.Thread(target=drive, args=(index, station), daemon=True)
+        for index, station in enumerate(host.stations)
+    ]
+    start = time.monotonic()
+    for driver in drivers:
+        driver.start()
+    for driver in drivers:
+        driver.join()
+    elapsed = time.monotonic() - start
+    stop.set()
+
+    pool_stats = host.pool.stats()
+    # The games are still running, their failures on the closed boards are expected
+    logging.disable(logging.CRITICAL)
+    host.close()
+    for server in servers.values():
+        server.stop()
+
+    return {
+        "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "parameters": {key: value for key, value in vars(args).items() if key != "output"},
+        "elapsed_seconds": round(elapsed, 3),
+        "stations": {
+            name: {
+                "turns": turns[name],
+                "turns_per_minute": round(turns[name] / elapsed * 60, 3),
+                "select_to_select_ms": distribution(turn_ms[name]),
+                "pool": pool_stats.get(name, {}),
+            }
+            for name in servers
+        },
+        BUSY_STATION: pool_stats.get(BUSY_STATION, {}),
+        "circuit": host.circuit_breaker.stats(),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--stations", type=int, default=3, help="Simulated game stations.")
+    parser.add_argument("--turns", type=int, default=10, help="Turns to play on every station.")
+    parser.add_argument("--workers", type=int, default=2, help="Recognition pool workers.")
+    parser.add_argument("--max-in-flight", type=int, default=1, help="Recognitions of a single station running at the same time.")
+    parser.add_argument("--flood", type=int, default=8, help="Recognitions the busy station keeps queued, 0 - no busy station.")
+    parser.add_argument("--synthetic", type=int, default=2, help="Synthetic utterances per letter.")
+    parser.add_argument("--sample-rate", type=int, default=16000, help="Sample rate of the simulated mics.")
+    parser.add_argument("--speed", type=float, default=1.0, help="Replay the records this many times faster than real time.")
+    parser.add_argument("--latency", type=float, default=0.3, help="Stub recognizer latency, seconds.")
+    parser.add_argument("--jitter", type=float, default=0.05, help="Stub recognizer latency jitter, seconds.")
+    parser.add_argument("--sound-seconds", type=float, default=0.1, help="Duration of every played clip.")
+    parser.add_argument("--press-delay", type=float, default=0.2, help="Mean seconds before every button press.")
+    parser.add_argument("--lives", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--timeout", type=float, default=30, help="Seconds to wait for a game before failing.")
+    parser.add_argument("--output", help="Write the results JSON to this file.")
+    args = parser.parse_args()
+
+    text = json.dumps(run(args), indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output_file:
+            output_file.write(text)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -16,17 +16,54 @@
 #       AlephPi is a game built with RPi board for helping my kids recognizing alphabetical letters correctly in a more fun way.
 #       For high-level view & BOM please refer to: https://github.com/eladshabo/AlephPi
 
+import sys
+import argparse
 import configparser
 import logging
-import RPi.GPIO as GPIO
 
-from . import Logger, Sound, AlephGame, SpeechRecognition, SevenSegmentDisplay
+# Imported first, so --startup-profile times the imports of the game modules
+from . import Startup
+
+if Startup.PROFILE_FLAG in sys.argv:
+    Startup.profile.start_imports()
+
+from . import Board, EventStore, LedAnimator, Logger, MultiStation, Sound, AlephGame, SpeechRecognition, SevenSegmentDisplay, Tracing
 
 
 def main():
+    parser = argparse.ArgumentParser(description="AlephPi letters game")
+    parser.add_argument(
+        Startup.PROFILE_FLAG,
+        action="store_true",
+        help="Print the timing breakdown of the startup steps and imports, and exit without playing.",
+    )
+    args = parser.parse_args()
+    profile = Startup.profile
+    profile.stop_imports()
+
     try:
-        config = configparser.ConfigParser("aleph_config.ini")
+        with profile.step("config"):
+            config = configparser.ConfigParser()
+            config.read("aleph_config.ini")
         logger = Logger.setup_logger(config["Log"]["app_log_file"])
+        Logger.configure(config["Log"])
+        Tracing.tracer.configure(config["Tracing"])
+        if config.has_section("Event Store"):
+            EventStore.store.configure(config["Event Store"])
+
+        if config.has_section("Stations") and config["Stations"].getboolean("enabled", False):
+            stations = MultiStation.MultiStation(config, logger)
+            try:
+                stations.connect_stations()
+                profile.mark_ready()
+                if args.startup_profile:
+                    profile.wait_background()
+                    print(profile.report())
+                    return
+                stations.run()
+            finally:
+                stations.close()
+            return
 
         # Read GPIOs config
         start_button_gpio_pin = config["Operative GPIOs"].getint("start_button", 38)
@@ -37,20 +74,34 @@ def main():
             # Convert the key to int so we won't need to parse it evertime we're working with GPIOs
             letters_gpios_pins_dict[int(key)] = config["Letters GPIOs"][key]
 
-        sound = Sound(config["Audio Files"])
-        speech_recognition = SpeechRecognition(
-            logger, sound, config["Speech Recognition"]
-        )
+        # The board, the mixer and the serial port are independent, open them concurrently
+        board_future = profile.background("board", Board.create_board, config["Board"])
+        sound_future = profile.background("sound", Sound.Sound, config["Audio Files"])
         seven_seg_config = config["Seven Segments LEDs"]
-        seven_seg_display = None
+        seven_seg_future = Startup.completed(None)
         if seven_seg_config.getboolean("use_seven_seg", False):
-            seven_seg_display = SevenSegmentDisplay(
-                seven_seg_config.get("serial_port", "/dev/serial0"),
-                seven_seg_config.getint("serial_bandwidth", 9600),
+            seven_seg_future = profile.background(
+                "seven segment display",
+                lambda: SevenSegmentDisplay.SevenSegmentDisplay(
+                    board_future.result(),
+                    seven_seg_config.get("serial_port", "/dev/serial0"),
+                    seven_seg_config.getint("serial_bandwidth", 9600),
+                ),
+            )
+        board = board_future.result()
+        sound = sound_future.result()
+        seven_seg_display = seven_seg_future.result()
+
+        led_animator = LedAnimator.LedAnimator(board)
+        with profile.step("speech recognition"):
+            speech_recognition = SpeechRecognition.SpeechRecognition(
+                logger, sound, led_animator, config["Speech Recognition"]
             )
 
         # Init board and run game
-        aleph = AlephGame(
+        aleph = AlephGame.AlephGame(
+            board,
+            led_animator,
             sound,
             speech_recognition,
             letters_gpios_pins_dict,
@@ -60,7 +111,16 @@ def main():
             seven_seg_display,
             config["Game Properties"].getint("demo_sleep_timeout", 1),
             config["Game Properties"].getfloat("blink_sleep_timeout", 0.1),
+            config["Game Properties"].getfloat("button_debounce_ms", 200),
+            config["Game Properties"].getint("button_queue_size", 16),
         )
+        profile.mark_ready()
+        logging.info(f"Ready for the first button press after {(profile.ready - profile.start) * 1000:.0f} ms")
+        if args.startup_profile:
+            # Wait for the lazily initialized steps, so their time is reported too
+            profile.wait_background()
+            print(profile.report())
+            return
         aleph.run_game()
 
     except Exception as err:
@@ -69,7 +129,11 @@ def main():
         if "logger" in locals() and logger:
             logger.log(logging.ERROR, err, locals())
     finally:
-        GPIO.cleanup()
+        EventStore.store.close()
+        if "speech_recognition" in locals() and speech_recognition:
+            speech_recognition.close()
+        if "board" in locals() and board:
+            board.cleanup()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,44 @@
+import os
+import sys
+import time
+import importlib
+from typing import Callable
+
+import pytest
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# The game modules use package relative imports, import them through the repository folder name
+sys.path.insert(0, os.path.dirname(REPO))
+PACKAGE = os.path.basename(REPO)
+
+
+def game_module(name: str, *requirements: str):
+    """Import a game module, skipping the tests of the calling module when one of the modules it requires isn't installed.
+
+    Args:
+        name (str): The game module name.
+        requirements (str): Modules the game module imports, for example speech_recognition.
+
+    Returns:
+        module: The game module.
+    """
+    for requirement in requirements:
+        pytest.importorskip(requirement)
+    return importlib.import_module(f"{PACKAGE}.{name}")
+
+
+def wait_until(condition: Callable[[], bool], timeout: float = 5) -> None:
+    """Poll a condition until it's true, failing the test after timeout seconds."""
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            pytest.fail(f"Timed out after {timeout} seconds")
+        time.sleep(0.005)
+
+
+@pytest.fixture
+def simulated_board():
+    """A SimulatedBoard, cleaned up after the test."""
+    board = game_module("Board").SimulatedBoard()
+    yield board
+    board.cleanup()
@@ -0,0 +1,90 @@
+import time
+import asyncio
+
+import pytest
+
+from conftest import game_module
+
+ButtonInput = game_module("ButtonInput")
+
+PIN = 38
+
+
+@pytest.fixture
+def button(simulated_board):
+    simulated_board.setup_input(PIN)
+    button = ButtonInput.ButtonInput(simulated_board, PIN, debounce_ms=50, queue_size=3)
+    button.start()
+    yield button
+    button.close()
+
+
+def press(board) -> float:
+    """Press the button, returns the time.monotonic() just before the edge."""
+    before = time.monotonic()
+    board.press_button(PIN).join()
+    return before
+
+
+def next_press(button, since: float, timeout: float = 1):
+    async def wait():
+        return await asyncio.wait_for(button.next_press(since), timeout)
+
+    return asyncio.run(wait())
+
+
+def test_press_is_timestamped(button, simulated_board):
+    before = press(simulated_board)
+    event = next_press(button, 0)
+    assert event.pin == PIN
+    assert before <= event.timestamp <= time.monotonic()
+
+
+def test_bounces_are_ignored(button, simulated_board):
+    press(simulated_board)
+    press(simulated_board)
+    time.sleep(0.06)
+    press(simulated_board)
+
+    stats = button.stats()
+    assert stats["edges"] == 3
+    assert stats["bounces"] == 1
+    assert stats["queued"] == 2
+
+
+def test_presses_before_since_are_stale(button, simulated_board):
+    press(simulated_board)
+    since = time.monotonic()
+    time.sleep(0.06)
+    after = press(simulated_board)
+
+    event = next_press(button, since)
+
+    assert event.timestamp >= after
+    stats = button.stats()
+    assert stats["stale"] == 1
+    assert stats["consumed"] == 1
+    assert stats["queued"] == 0
+
+
+def test_waiting_for_a_press(button, simulated_board):
+    async def wait():
+        waiter = asyncio.ensure_future(button.next_press(time.monotonic()))
+        while not button.waiting:
+            await asyncio.sleep(0.001)
+        # Pressed from another thread, like a GPIO callback
+        await asyncio.get_event_loop().run_in_executor(None, press, simulated_board)
+        return await asyncio.wait_for(waiter, 1)
+
+    assert asyncio.run(wait()).pin == PIN
+    assert not button.waiting
+
+
+def test_full_queue_drops_the_oldest_press(button, simulated_board):
+    timestamps = []
+    for _ in range(4):
+        timestamps.append(press(simulated_board))
+        time.sleep(0.06)
+
+    assert button.stats()["dropped"] == 1
+    assert next_press(button, 0).timestamp >= timestamps[1]
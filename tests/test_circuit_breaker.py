@@ -0,0 +1,114 @@
+import math
+import time
+
+import pytest
+
+from conftest import game_module
+
+CircuitBreaker = game_module("CircuitBreaker", "speech_recognition")
+CircuitState = CircuitBreaker.CircuitState
+
+
+@pytest.fixture
+def breaker():
+    return CircuitBreaker.CircuitBreaker(
+        "stub", window=4, failure_threshold=2, slow_call_seconds=0.5, reset_timeout=0.05
+    )
+
+
+def open_circuit(breaker):
+    for _ in range(breaker.failure_threshold):
+        assert breaker.allow()
+        breaker.record(0.01, failed=True)
+    assert breaker.state == CircuitState.OPEN
+
+
+def test_opens_after_failure_threshold(breaker):
+    assert breaker.allow()
+    breaker.record(0.01, failed=True)
+    assert breaker.state == CircuitState.CLOSED
+    breaker.record(0.01, failed=False)
+    assert breaker.state == CircuitState.CLOSED
+    breaker.record(0.01, failed=True)
+    assert breaker.state == CircuitState.OPEN
+    assert breaker.is_open
+
+
+def test_slow_calls_count_as_failures(breaker):
+    breaker.record(1.0, failed=False)
+    breaker.record(1.0, failed=False)
+    assert breaker.state == CircuitState.OPEN
+    assert breaker.stats()["slow_calls"] == 2
+
+
+def test_failures_leaving_the_window_are_forgotten(breaker):
+    breaker.record(0.01, failed=True)
+    for _ in range(breaker.window):
+        breaker.record(0.01, failed=False)
+    breaker.record(0.01, failed=True)
+    assert breaker.state == CircuitState.CLOSED
+
+
+def test_open_circuit_rejects_calls(breaker):
+    open_circuit(breaker)
+    assert not breaker.allow()
+    assert not breaker.allow()
+    assert breaker.stats()["rejected"] == 2
+
+
+def test_half_open_allows_a_single_trial(breaker):
+    open_circuit(breaker)
+    time.sleep(breaker.reset_timeout)
+
+    assert breaker.allow()
+    assert breaker.state == CircuitState.HALF_OPEN
+    # The trial call is running
+    assert not breaker.allow()
+    assert not breaker.is_open
+
+
+def test_successful_trial_closes_the_circuit(breaker):
+    open_circuit(breaker)
+    time.sleep(breaker.reset_timeout)
+    assert breaker.allow()
+
+    breaker.record(0.01, failed=False)
+    assert breaker.state == CircuitState.CLOSED
+    # The failures before the circuit opened are forgotten
+    breaker.record(0.01, failed=True)
+    assert breaker.state == CircuitState.CLOSED
+
+
+@pytest.mark.parametrize("latency, failed", [(0.01, True), (1.0, False)])
+def test_failed_trial_reopens_the_circuit(breaker, latency, failed):
+    open_circuit(breaker)
+    time.sleep(breaker.reset_timeout)
+    assert breaker.allow()
+
+    breaker.record(latency, failed)
+    assert breaker.state == CircuitState.OPEN
+    assert not breaker.allow()
+    assert breaker.stats()["opened"] == 2
+
+
+def test_deadline_without_total_only_limits_the_stages():
+    deadline = CircuitBreaker.TurnDeadline(0)
+    assert deadline.remaining() == math.inf
+    assert deadline.stage("record", 2, reserve=5) == 2
+    assert deadline.stage("recognize", 10, minimum=1) == 10
+    assert deadline.budgets == {"record": 2, "recognize": 10}
+
+
+def test_deadline_splits_the_total():
+    deadline = CircuitBreaker.TurnDeadline(10)
+    record = deadline.stage("record", 20, reserve=4)
+    assert 5.9 < record <= 6
+    assert 9.9 < deadline.stage("recognize", 20) <= 10
+
+
+def test_late_stage_gets_its_minimum():
+    deadline = CircuitBreaker.TurnDeadline(0.01)
+    time.sleep(0.02)
+    assert deadline.remaining() == 0
+    assert deadline.stage("recognize", 10) == 0
+    assert deadline.stage("recognize", 10, minimum=2) == 2
@@ -0,0 +1,122 @@
+import threading
+
+import pytest
+
+from conftest import game_module, wait_until
+
+sr = pytest.importorskip("speech_recognition")
+HedgedRecognition = game_module("HedgedRecognition")
+RecognizerBackend = game_module("RecognizerBackend")
+
+AUDIO = sr.AudioData(bytes(320), 16000, 2)
+
+
+def backend(name, latency, letter="bet", confidence=0.9, failure_rate=0.0):
+    result = RecognizerBackend.RecognitionResult(letter, letter, confidence)
+    return RecognizerBackend.StubBackend(lambda audio: result, latency, name=name, failure_rate=failure_rate)
+
+
+def test_confident_primary_cancels_the_hedge():
+    hedged = HedgedRecognition.HedgedBackend([backend("primary", 0.01), backend("hedge", 0.01)], None, delay=0.5)
+
+    assert hedged.recognize(AUDIO).letter == "bet"
+
+    stats = hedged.stats()
+    assert stats["primary"]["wins"] == 1
+    # The hedge's time didn't come
+    assert stats["hedge"]["requests"] == 0
+    assert stats["hedge"]["cancelled"] == 1
+    assert hedged.last_report["backends"] == {"primary": "0.90", "hedge": "cancelled"}
+
+
+def test_hedge_wins_and_slow_primary_is_late():
+    hedged = HedgedRecognition.HedgedBackend(
+        [backend("primary", 0.5, "aleph"), backend("hedge", 0.01)], None, delay=0.05
+    )
+
+    result = hedged.recognize(AUDIO)
+
+    assert result.letter == "bet"
+    assert hedged.last_report["winner"] == "hedge"
+    assert hedged.last_report["elapsed_ms"] < 400
+    stats = hedged.stats()
+    assert stats["hedge"]["wins"] == 1
+    assert stats["primary"]["late"] == 1
+    assert stats["primary"]["cancelled"] == 0
+    # The saved time is counted once the abandoned primary answers
+    wait_until(lambda: hedged.stats()["hedge"]["saved_ms"] > 0)
+    assert hedged.stats()["hedge"]["saved_ms"] < 500
+
+
+def test_unconfident_results_wait_for_all_backends():
+    hedged = HedgedRecognition.HedgedBackend(
+        [backend("primary", 0.01, "aleph", 0.3), backend("hedge", 0.05, "bet", 0.4)], None, delay=5
+    )
+
+    # The hedge is requested as soon as the primary answered unconfidently, the most confident result wins
+    assert hedged.recognize(AUDIO).letter == "bet"
+    stats = hedged.stats()
+    assert stats["primary"]["unconfident"] == 1
+    assert stats["hedge"]["unconfident"] == 1
+    assert stats["hedge"]["wins"] == 1
+
+
+def test_failures_fall_through_to_the_next_backend():
+    hedged = HedgedRecognition.HedgedBackend(
+        [backend("primary", 0.01, failure_rate=1.0), backend("hedge", 0.01)], None, delay=5
+    )
+
+    assert hedged.recognize(AUDIO).letter == "bet"
+    assert hedged.stats()["primary"]["failures"] == 1
+    assert hedged.last_report["backends"]["primary"] == "RequestError"
+
+
+def test_unexpected_backend_exception_counts_as_failure():
+    class Broken(RecognizerBackend.RecognizerBackend):
+        name = "broken"
+
+        def recognize(self, audio_data):
+            raise KeyError("malformed response")
+
+    hedged = HedgedRecognition.HedgedBackend([Broken(), backend("hedge", 0.01)], None, delay=5)
+
+    assert hedged.recognize(AUDIO).letter == "bet"
+    assert hedged.stats()["broken"]["failures"] == 1
+
+
+def test_all_backends_failing_raises_request_error():
+    hedged = HedgedRecognition.HedgedBackend(
+        [backend("primary", 0.01, failure_rate=1.0), backend("hedge", 0.01, failure_rate=1.0)], None, delay=0
+    )
+
+    with pytest.raises(sr.RequestError):
+        hedged.recognize(AUDIO)
+
+
+def test_queued_request_is_cancelled_when_it_loses():
+    release = threading.Event()
+
+    class Blocking(RecognizerBackend.RecognizerBackend):
+        name = "blocking"
+
+        def recognize(self, audio_data):
+            release.wait(5)
+            raise sr.UnknownValueError()
+
+    hedged = HedgedRecognition.HedgedBackend(
+        [backend("primary", 0.05), backend("hedge", 0.5), backend("hedge2", 0.5)], None, delay=0
+    )
+    # Keep all the executor threads but one busy - the primary runs, the hedges are queued
+    blockers = [hedged._executor.submit(Blocking().recognize, AUDIO) for _ in range(hedged._executor._max_workers - 1)]
+    try:
+        assert hedged.recognize(AUDIO).letter == "bet"
+        stats = hedged.stats()
+        # The thread freed by the primary may have started the first hedge, the second one was still queued
+        assert stats["hedge"]["cancelled"] + stats["hedge"]["late"] == 1
+        assert stats["hedge2"]["cancelled"] == 1
+        assert stats["hedge2"]["requests"] == 0
+        assert stats["hedge2"]["late"] == 0
+    finally:
+        release.set()
+        for blocker in blockers:
+            blocker.exception(5)
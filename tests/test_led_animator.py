@@ -0,0 +1,71 @@
+from conftest import game_module, wait_until
+
+Board = game_module("Board")
+LedAnimator = game_module("LedAnimator")
+
+
+class RecordingBoard(Board.SimulatedBoard):
+    """SimulatedBoard keeping every batched write."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.writes = []
+
+    def output_many(self, states):
+        self.writes.append(dict(states))
+        super().output_many(states)
+
+
+def play_to_end(animator, animation):
+    animator.play(animation)
+    last_tag = animation.frames[-1][2]
+    wait_until(lambda: animator.current_tag == last_tag and animator._animation is None)
+
+
+def test_only_changed_pins_are_written():
+    board = RecordingBoard()
+    board.setup_output([1, 2, 3, 4])
+    animator = LedAnimator.LedAnimator(board)
+    animation = LedAnimator.Animation(
+        "steps",
+        [1, 2, 3],
+        [(0b0010, 0.01, 1), (0b0110, 0.01, 2), (0b0100, 0.01, 3)],
+        loop=False,
+    )
+
+    play_to_end(animator, animation)
+
+    assert board.writes == [
+        # The first frame writes all the animation pins
+        {1: True, 2: False, 3: False},
+        {2: True},
+        {1: False},
+    ]
+    # Pin 4 isn't an animation pin
+    assert all(4 not in states for states in board.writes)
+
+
+def test_switching_animation_writes_all_its_pins_again():
+    board = RecordingBoard()
+    board.setup_output([1, 2])
+    animator = LedAnimator.LedAnimator(board)
+    animation = LedAnimator.Animation("on", [1, 2], [(0b0110, 0.01, 1)], loop=False)
+
+    play_to_end(animator, animation)
+    # Pins may have been changed outside the animator meanwhile
+    board.output(1, False)
+    play_to_end(animator, animation)
+
+    assert board.writes == [{1: True, 2: True}, {1: False}, {1: True, 2: True}]
+    assert board.state(1) and board.state(2)
+
+
+def test_unchanged_frame_writes_nothing():
+    board = RecordingBoard()
+    board.setup_output([1])
+    animator = LedAnimator.LedAnimator(board)
+    animation = LedAnimator.Animation("hold", [1], [(0b0010, 0.01, 1), (0b0010, 0.01, 2)], loop=False)
+
+    play_to_end(animator, animation)
+
+    assert board.writes == [{1: True}, {}]
@@ -0,0 +1,71 @@
+import json
+
+import pytest
+
+from conftest import game_module
+
+RecognitionIndex = game_module("RecognitionIndex")
+
+OPTIONS = {
+    "אלף": "aleph",
+    "בית": "bet",
+    "בן": "bet",
+    "ו": "vav",
+    "וו": "vav",
+    "גימל": "gimel",
+    "למד": "lamed",
+}
+
+
+@pytest.fixture
+def index(tmp_path):
+    options_file = tmp_path / "recognition_options.json"
+    options_file.write_text(json.dumps(OPTIONS, ensure_ascii=False), encoding="utf-8")
+    return RecognitionIndex.RecognitionIndex(str(options_file))
+
+
+def test_exact_match(index):
+    match = index.match([("גימל", 0.9)])
+    assert (match.letter, match.alias, match.score) == ("gimel", "גימל", 0.9)
+
+
+def test_normalized_match(index):
+    # Niqqud, punctuation and final letters don't matter
+    assert index.match([("אָלֶף!", 0.8)]).letter == "aleph"
+    assert index.match([("לָמֵד.", 0.8)]).letter == "lamed"
+
+
+def test_short_aliases_match_exactly(index):
+    assert index.match([("ו", 0.9)]).letter == "vav"
+    assert index.match([("בן", 0.9)]).letter == "bet"
+
+
+def test_short_transcripts_dont_match_approximately(index):
+    # A single edit is 50% of a 2 letters word - below the minimal similarity
+    assert index.match([("בס", 0.9)]) is None
+    assert index.match([("ז", 0.9)]) is None
+
+
+def test_short_alias_inside_a_sentence(index):
+    match = index.match([("האות ו", 0.7)])
+    assert (match.letter, match.transcript) == ("vav", "האות ו")
+
+
+def test_approximate_match(index):
+    match = index.match([("גימלל", 0.9)])
+    assert match.letter == "gimel"
+    assert match.score == pytest.approx(0.9 * (1 - 1 / 5))
+
+
+def test_alternatives_are_weighted_by_confidence(index):
+    match = index.match([("גימלל", 0.5), ("אלף", 0.4)])
+    assert match.letter == "gimel"
+    assert match.scores == {"gimel": pytest.approx(0.4), "aleph": pytest.approx(0.4)}
+
+    # Without confidences, every alternative weighs half of the previous one
+    assert index.match([("שלום", 0.0), ("בית", 0.0)]).score == pytest.approx(0.5)
+
+
+def test_no_match(index):
+    assert index.match([]) is None
+    assert index.match([("שלום", 0.9)]) is None
@@ -0,0 +1,102 @@
+import threading
+
+import pytest
+
+from conftest import game_module, wait_until
+
+RecognitionPool = game_module("RecognitionPool", "speech_recognition")
+
+
+@pytest.fixture
+def pool():
+    pool = RecognitionPool.RecognitionPool(workers=2, max_in_flight_per_station=1)
+    yield pool
+    pool.close()
+
+
+def test_busy_station_doesnt_delay_the_others(pool):
+    release = threading.Event()
+    busy = [pool.submit("busy", lambda: release.wait(5)) for _ in range(5)]
+
+    # The second worker is free, but the busy station already has a recognition running
+    quiet = pool.submit("quiet", lambda: "done")
+    assert quiet.result(2) == "done"
+
+    # Counted right after the result is set
+    wait_until(lambda: pool.stats()["quiet"]["completed"] == 1)
+    stats = pool.stats()
+    assert stats["busy"]["in_flight"] == 1
+    assert stats["busy"]["queued"] == 4
+    release.set()
+    assert all(future.result(5) for future in busy)
+
+
+def test_stations_are_served_round_robin():
+    pool = RecognitionPool.RecognitionPool(workers=1, max_in_flight_per_station=1)
+    started = threading.Event()
+    release = threading.Event()
+    order = []
+    try:
+        pool.submit("a", lambda: started.set() or release.wait(5))
+        started.wait(5)
+        futures = [
+            pool.submit(station, lambda station=station: order.append(station))
+            for station in ("a", "a", "a", "b", "b", "c")
+        ]
+        release.set()
+        for future in futures:
+            future.result(5)
+    finally:
+        pool.close()
+
+    # Every station gets a job in turn, the backlog of station a doesn't go first
+    assert order == ["a", "b", "c", "a", "b", "a"]
+
+
+def test_max_in_flight_per_station(pool):
+    release = threading.Event()
+    running = []
+    lock = threading.Lock()
+    concurrent = []
+
+    def job():
+        with lock:
+            running.append(1)
+            concurrent.append(len(running))
+        release.wait(5)
+        with lock:
+            running.pop()
+
+    futures = [pool.submit("busy", job) for _ in range(3)]
+    release.set()
+    for future in futures:
+        future.result(5)
+    assert max(concurrent) == 1
+
+
+def test_close_cancels_queued_jobs():
+    pool = RecognitionPool.RecognitionPool(workers=1)
+    release = threading.Event()
+    running = pool.submit("a", lambda: release.wait(5))
+    queued = pool.submit("b", lambda: None)
+    threading.Timer(0.05, release.set).start()
+
+    pool.close()
+
+    assert running.result(5)
+    assert queued.cancelled()
+    with pytest.raises(RuntimeError):
+        pool.submit("a", lambda: None)
+
+
+def test_pooled_backend_runs_on_the_pool(pool):
+    sr = pytest.importorskip("speech_recognition")
+    RecognizerBackend = game_module("RecognizerBackend")
+    result = RecognizerBackend.RecognitionResult("bet", "bet", 0.9)
+    pooled = RecognitionPool.PooledBackend(
+        pool, "kitchen", RecognizerBackend.StubBackend(lambda audio: result, 0.01)
+    )
+
+    assert pooled.recognize(sr.AudioData(bytes(320), 16000, 2)) is result
+    assert pooled.name == "stub"
+    wait_until(lambda: pool.stats()["kitchen"]["completed"] == 1)
@@ -0,0 +1,136 @@
+import threading
+from concurrent.futures import Future
+
+import pytest
+
+from conftest import game_module, wait_until
+
+Board = game_module("Board")
+RemoteBoard = game_module("RemoteBoard")
+
+
+class StationSound:
+    """Stands for the station agent's Sound - the tests complete the playback futures."""
+
+    def __init__(self) -> None:
+        self.played = []
+        self.stopped = 0
+
+    def play_async(self, filepaths):
+        future = Future()
+        self.played.append((list(filepaths), future))
+        return future
+
+    def stop(self) -> None:
+        self.stopped += 1
+        for _, future in self.played:
+            future.cancel()
+
+
+@pytest.fixture
+def station(simulated_board):
+    server = RemoteBoard.BoardServer(simulated_board, "127.0.0.1", 0, StationSound())
+    server.start()
+    board = RemoteBoard.RemoteBoard(server.host, server.port)
+    yield server, board
+    board.cleanup()
+    server.stop()
+
+
+def test_outputs(station):
+    server, board = station
+    board.setup_output([3, 5])
+    board.output([3, 5], True)
+    board.output_many({5: False})
+    # Requests are served in order, a waited request follows the outputs
+    board.setup_input(7)
+
+    assert server.board.state(3)
+    assert not server.board.state(5)
+    assert [(pin, state) for _, pin, state in server.board.transitions] == [(3, True), (5, True), (5, False)]
+
+
+def test_edges_call_back_the_host(station):
+    server, board = station
+    board.setup_input(38)
+    pressed = threading.Event()
+    board.add_event_detect(38, Board.Edge.FALLING, lambda pin: pressed.set(), 0)
+    assert server.board.event_detect_enabled(38)
+
+    server.board.press_button(38)
+    assert pressed.wait(2)
+
+    board.remove_event_detect(38)
+    assert not server.board.event_detect_enabled(38)
+
+
+def test_serial(station):
+    server, board = station
+    serial = board.open_serial("/dev/serial0", 9600)
+    serial.write(b"\x01\x02")
+    serial.close()
+    board.setup_input(7)
+
+    connection = server.board.serial_ports["/dev/serial0"]
+    assert [data for _, data in connection.writes] == [b"\x01\x02"]
+    assert not connection.isOpen()
+
+
+def test_station_errors_are_raised(station):
+    _, board = station
+    with pytest.raises(EnvironmentError, match="wasn't set up as input"):
+        board.add_event_detect(9, Board.Edge.FALLING, lambda pin: None, 0)
+    with pytest.raises(EnvironmentError, match="Unknown remote board operation"):
+        board.request("reboot", [])
+
+
+def test_play_completes_when_the_station_finished_playing(station):
+    server, board = station
+    response = board.request_async("play", [["audio/start_game.mp3", "audio/correct_answer.mp3"]])
+    wait_until(lambda: server.sound.played)
+
+    # Setup requests are served while the sound plays
+    board.setup_input(7)
+    assert not response.done()
+
+    filepaths, playback = server.sound.played[0]
+    assert filepaths == ["audio/start_game.mp3", "audio/correct_answer.mp3"]
+    playback.set_result(None)
+    assert response.result(2) is True
+
+
+def test_stopped_play(station):
+    server, board = station
+    response = board.request_async("play", [["audio/start_game.mp3"]])
+    wait_until(lambda: server.sound.played)
+
+    board.request("stop_sound", [])
+
+    assert server.sound.stopped == 1
+    assert response.result(2) is False
+
+
+def test_station_without_sound(simulated_board):
+    server = RemoteBoard.BoardServer(simulated_board, "127.0.0.1", 0)
+    server.start()
+    board = RemoteBoard.RemoteBoard(server.host, server.port)
+    try:
+        with pytest.raises(EnvironmentError, match="doesn't play sounds"):
+            board.request_async("play", [["audio/start_game.mp3"]]).result(2)
+    finally:
+        board.cleanup()
+        server.stop()
+
+
+def test_disconnected_station(station):
+    server, board = station
+    response = board.request_async("play", [["audio/start_game.mp3"]])
+    wait_until(lambda: server.sound.played)
+
+    board.cleanup()
+
+    assert not board.connected
+    with pytest.raises(EnvironmentError, match="disconnected"):
+        response.result(2)
+    with pytest.raises(EnvironmentError, match="disconnected"):
+        board.output(3, True)